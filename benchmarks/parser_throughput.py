@@ -0,0 +1,112 @@
+"""
+benchmarks/parser_throughput.py
+
+Measures how many lines per second the Pylint and Mypy output parsers handle.
+The corpus is real tool output: captured from runs over testing/ (or read from
+files captured elsewhere) and replicated under distinct file names up to the
+requested size, so the parsers see as many files and issues as a large project.
+
+Run from the repository root:
+    python3 -m benchmarks.parser_throughput --lines 200000
+"""
+
+import subprocess
+import time
+from typing import Callable, List, Optional
+import typer
+from rich.console import Console
+from rich.table import Table
+from tool.pylint_runner import build_pylint_args, parse_pylint_output
+from tool.mypy_runner import build_mypy_args, parse_mypy_output
+
+SAMPLE_PATH = "testing"
+
+console = Console()
+app = typer.Typer()
+
+
+def capture_output(command: List[str]) -> str:
+    """Runs a tool and returns what it printed."""
+    return subprocess.run(command, capture_output=True, text=True, check=False).stdout
+
+
+def replicate_output(output: str, lines: int) -> str:
+    """
+    Repeats captured output until it has at least the given number of lines.
+    Every copy gets its own directory and package name, so the parsers see
+    distinct files instead of the same few over and over.
+
+    Args:
+        output (str): Output of a run over SAMPLE_PATH.
+        lines (int): Minimum number of lines of the corpus.
+
+    Returns:
+        str: The corpus.
+    """
+    sample_lines = output.count("\n") or 1
+    copies = []
+    for index in range(-(-lines // sample_lines)):
+        copies.append(
+            output.replace(f"{SAMPLE_PATH}/", f"corpus{index}/").replace(
+                "************* Module ", f"************* Module corpus{index}."
+            )
+        )
+    return "".join(copies)
+
+
+def measure(parse: Callable[[str], object], corpus: str, repeat: int) -> float:
+    """Returns the best wall time of parsing the corpus over the repetitions."""
+    best = float("inf")
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        parse(corpus)
+        best = min(best, time.perf_counter() - started_at)
+    return best
+
+
+@app.command()
+def main(
+    lines: int = typer.Option(200_000, "--lines", help="Minimum number of lines per corpus."),
+    repeat: int = typer.Option(5, "--repeat", help="Parse each corpus this many times, keep the best."),
+    pylint_output: Optional[str] = typer.Option(
+        None, "--pylint-output", help="Captured Pylint output to use instead of running Pylint."
+    ),
+    mypy_output: Optional[str] = typer.Option(
+        None, "--mypy-output", help="Captured Mypy output to use instead of running Mypy."
+    ),
+):
+    """Benchmark the throughput of the Pylint and Mypy output parsers."""
+    if pylint_output:
+        with open(pylint_output, encoding="utf-8") as captured:
+            pylint_sample = captured.read()
+    else:
+        pylint_sample = capture_output(["pylint", *build_pylint_args(SAMPLE_PATH)])
+    if mypy_output:
+        with open(mypy_output, encoding="utf-8") as captured:
+            mypy_sample = captured.read()
+    else:
+        mypy_sample = capture_output(["mypy", *build_mypy_args(SAMPLE_PATH)])
+
+    table = Table(title="Parser throughput", header_style="bold magenta")
+    table.add_column("Parser")
+    table.add_column("Lines", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Lines/sec", justify="right", style="bold green")
+
+    for name, parse, sample in (
+        ("pylint", parse_pylint_output, pylint_sample),
+        ("mypy", parse_mypy_output, mypy_sample),
+    ):
+        if not sample.strip():
+            console.print(f"[bold red]No {name} output to benchmark.[/bold red]")
+            raise typer.Exit(code=1)
+        corpus = replicate_output(sample, lines)
+        line_count = corpus.count("\n")
+        seconds = measure(parse, corpus, repeat)
+        table.add_row(name, f"{line_count:,}", f"{seconds:.3f}", f"{line_count / seconds:,.0f}")
+
+    console.print(table)
+
+
+if __name__ == "__main__":
+    app()
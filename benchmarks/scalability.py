@@ -0,0 +1,473 @@
+"""
+benchmarks/scalability.py
+
+Measures how pylens scales with the size of the analyzed tree.
+Synthetic repositories of growing size (with configurable package depth, import
+density and issue density) are generated, and the whole pipeline runs on each
+of them: discovery, the tool itself, parsing, aggregation and rendering/export
+(the summary table, the metrics and a snapshot). Every point of the resulting
+curves records the wall time, the peak RSS of pylens and of the tool, and the
+cost of every phase. Compared against a stored baseline, a point that got slower
+or bigger beyond the threshold fails the run.
+
+Run from the repository root:
+    python3 -m benchmarks.scalability run --sizes 100,1000,10000 --output scaling.json
+    python3 -m benchmarks.scalability run --sizes 100,1000,10000 --baseline scaling.json
+"""
+
+import contextlib
+import io
+import math
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional, Set, Union
+import typer
+from pydantic import BaseModel
+from rich.console import Console
+from rich.table import Table
+from menu.mypy_menu import MypyRun
+from menu.mypy_menu import analyze_run as analyze_mypy_run
+from menu.pylint_menu import PylintRun
+from menu.pylint_menu import analyze_run as analyze_pylint_run
+from tool.metrics import collect_metrics, render_metrics
+from tool.mypy_cache import MypyCacheSettings
+from tool.mypy_formatter import format_summary as format_mypy_summary
+from tool.project import discover_python_files
+from tool.pylint_formatter import format_summary as format_pylint_summary
+from tool.run_stats import RunStats, timed_phase
+from tool.snapshot import Snapshot, save_snapshot
+
+# The top-level package of every synthetic repository
+PACKAGE = "synthetic"
+
+# The phases of the pipeline, in the order they run
+PHASES = ["discovery", "graph", "cache", "run", "parse", "aggregate", "render"]
+
+# Differences below these are measurement noise, never regressions
+SECONDS_NOISE_FLOOR = 0.05
+RSS_NOISE_FLOOR_MB = 8.0
+
+console = Console()
+app = typer.Typer()
+
+
+class RepositoryShape(BaseModel):
+    """
+    Shape of the generated repositories, everything but their size.
+
+    - depth: Nesting depth of the packages below the top-level package.
+    - modules_per_package: Number of modules in each package.
+    - functions_per_module: Number of functions in each module.
+    - import_density: Average number of project modules each module imports.
+    - issue_density: Share of functions carrying an issue (0 to 1).
+    - seed: Seed of the generator, the same shape and size give the same files.
+    """
+
+    depth: int = 2
+    modules_per_package: int = 20
+    functions_per_module: int = 5
+    import_density: float = 2.0
+    issue_density: float = 0.3
+    seed: int = 0
+
+
+class ScalingPoint(BaseModel):
+    """
+    Measurements of one pipeline run.
+
+    - tool: The tool that was run.
+    - modules: Number of modules of the repository.
+    - wall_seconds: Wall time of the whole pipeline.
+    - pylens_rss_mb: Peak RSS of the pylens process.
+    - tool_rss_mb: Peak RSS of the largest tool process.
+    - phase_seconds: Wall time of each phase.
+    - issues: Number of issues found (a sanity check of the generator).
+    """
+
+    tool: str
+    modules: int
+    wall_seconds: float
+    pylens_rss_mb: float
+    tool_rss_mb: float
+    phase_seconds: Dict[str, float]
+    issues: int
+
+
+class ScalingReport(BaseModel):
+    """The scaling curves of a harness run, also used as the baseline of later runs."""
+
+    shape: RepositoryShape
+    mypy_jobs: int = 1
+    points: List[ScalingPoint] = []
+
+
+# Lines of the generated modules Pylint reports (unused import, undocumented function,
+# unused variable). Returning a str from an int function only shows up in MyPy.
+PYLINT_ISSUE_MARKERS = ("import os  # Unused", "(value):", "    unused = ")
+
+
+def _module_source(
+    index: int, imports: List[str], shape: RepositoryShape, rng: random.Random
+) -> str:
+    """The source of a module, calling into the modules it imports."""
+    lines = [f'"""Synthetic module {index}."""', ""]
+    if shape.issue_density and rng.random() < shape.issue_density:
+        lines.append("import os  # Unused")
+    lines.extend(f"import {name}" for name in imports)
+    for number in range(shape.functions_per_module):
+        issue = rng.randrange(3) if rng.random() < shape.issue_density else None
+        lines.extend(["", ""])
+        if issue == 0:  # Untyped and undocumented
+            lines.append(f"def function_{number}(value):")
+        else:
+            lines.append(f"def function_{number}(value: int) -> int:")
+            lines.append('    """Returns a value derived from the input."""')
+        lines.append(f"    total = value + {number}")
+        if number == 0:
+            lines.extend(f"    total += {name}.function_0(total)" for name in imports)
+        if issue == 1:  # Unused variable
+            lines.append("    unused = total * 2")
+        lines.append("    return str(total)" if issue == 2 else "    return total")
+    return "\n".join(lines) + "\n"
+
+
+def generate_repository(root: str, modules: int, shape: RepositoryShape) -> str:
+    """
+    Generates a synthetic repository.
+    Modules only import modules generated before them, like the layers of a real
+    project, so the import graph is acyclic. Packages nest `depth` levels deep.
+
+    Args:
+        root (str): Directory to generate the repository in.
+        modules (int): Number of modules.
+        shape (RepositoryShape): The shape of the repository.
+
+    Returns:
+        str: Path of the top-level package.
+    """
+    rng = random.Random(shape.seed)
+    packages = max(1, math.ceil(modules / shape.modules_per_package))
+    base = max(2, math.ceil(packages ** (1 / shape.depth))) if shape.depth else 1
+
+    names: List[str] = []
+    for index in range(modules):
+        package_index = index // shape.modules_per_package
+        parts = [PACKAGE]
+        for level in reversed(range(shape.depth)):
+            parts.append(f"p{package_index // base**level % base}")
+        package_dir = os.path.join(root, *parts)
+        if not os.path.isdir(package_dir):
+            os.makedirs(package_dir)
+            for depth in range(1, len(parts) + 1):
+                init = os.path.join(root, *parts[:depth], "__init__.py")
+                if not os.path.exists(init):
+                    with open(init, "w", encoding="utf-8") as package:
+                        package.write('"""Synthetic package."""\n')
+
+        # The fractional part of the density is the chance of one more import
+        count = int(shape.import_density) + (rng.random() < shape.import_density % 1)
+        imports = sorted(rng.sample(names, min(index, count)))
+        with open(os.path.join(package_dir, f"m{index}.py"), "w", encoding="utf-8") as module:
+            module.write(_module_source(index, imports, shape, rng))
+        names.append(".".join([*parts, f"m{index}"]))
+    return os.path.join(root, PACKAGE)
+
+
+def _pylint_issue_modules(files: List[str]) -> Set[str]:
+    """The generated modules Pylint has to report, it prints nothing for the others."""
+    flagged = set()
+    for file in files:
+        with open(file, encoding="utf-8") as module:
+            source = module.read()
+        if any(marker in source for marker in PYLINT_ISSUE_MARKERS):
+            flagged.add(os.path.normpath(file))
+    return flagged
+
+
+def _peak_rss_mb(who: int) -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def measure_pipeline(tool: str, root: str, modules: int, mypy_jobs: int) -> ScalingPoint:
+    """
+    Runs the whole pipeline once on a generated repository.
+    Meant to run in a fresh process, so the peak RSS belongs to this run only.
+
+    Args:
+        tool (str): The tool to run ("pylint" or "mypy").
+        root (str): The directory the repository was generated in.
+        modules (int): Number of modules of the repository.
+        mypy_jobs (int): Maximum number of parallel MyPy processes.
+
+    Returns:
+        ScalingPoint: The measurements.
+    """
+    os.chdir(root)
+    discovery = RunStats(tool=tool)
+    started_at = time.perf_counter()
+
+    with timed_phase(discovery, "discovery"):
+        files = discover_python_files(PACKAGE)
+
+    # The same entry path as `analyze --path synthetic`
+    analysis: Union[PylintRun, MypyRun]
+    if tool == "pylint":
+        analysis = analyze_pylint_run(PACKAGE, None, None)
+    else:
+        cache_settings = MypyCacheSettings(cache_dir=os.path.join(root, ".mypy_cache"))
+        analysis = analyze_mypy_run(PACKAGE, None, None, cache_settings, jobs=mypy_jobs)
+    run_stats = analysis.run_stats
+    run_stats.phase_seconds = {**discovery.phase_seconds, **run_stats.phase_seconds}
+
+    # Pylint's file count is the glob it was given, only its module headers show
+    # which modules it got to. MyPy counts the files it checked itself.
+    if isinstance(analysis, PylintRun):
+        reported = {
+            os.path.normpath(result.path or result.file) for result in analysis.results
+        }
+        missing = _pylint_issue_modules(files) - reported
+        if missing or not reported <= {os.path.normpath(file) for file in files}:
+            raise RuntimeError(
+                f"pylint reported {len(reported)} modules of {PACKAGE}, "
+                f"missing {len(missing)} with issues (e.g. {sorted(missing)[:3]})."
+            )
+    elif run_stats.files_analyzed != len(files):
+        raise RuntimeError(
+            f"{tool} checked {run_stats.files_analyzed} of the {len(files)} files in {PACKAGE}."
+        )
+
+    with timed_phase(run_stats, "render"):
+        snapshot = Snapshot(
+            tool=tool,
+            path=PACKAGE,
+            aggregates=analysis.aggregates,
+            run_stats=run_stats,
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            if isinstance(analysis, PylintRun):
+                format_pylint_summary(analysis.results, analysis.overall_score)
+                snapshot.pylint_results = analysis.results
+                snapshot.overall_score = analysis.overall_score
+            else:
+                format_mypy_summary(analysis.results)
+                snapshot.mypy_results = analysis.results
+        render_metrics(
+            [
+                collect_metrics(
+                    tool, PACKAGE, analysis.results, run_stats, snapshot.overall_score
+                )
+            ]
+        )
+        save_snapshot(os.path.join(root, f"{tool}.snap"), snapshot)
+
+    return ScalingPoint(
+        tool=tool,
+        modules=modules,
+        wall_seconds=time.perf_counter() - started_at,
+        pylens_rss_mb=_peak_rss_mb(resource.RUSAGE_SELF),
+        tool_rss_mb=_peak_rss_mb(resource.RUSAGE_CHILDREN),
+        phase_seconds=run_stats.phase_seconds,
+        issues=sum(len(result.issues) for result in analysis.results),
+    )
+
+
+def find_regressions(
+    report: ScalingReport, baseline: ScalingReport, threshold: float
+) -> List[str]:
+    """
+    Compares every point with the baseline's point of the same tool and size.
+    A measurement regresses when it grew by more than the threshold (relative) and
+    by more than the noise floor (absolute). Points missing from either side are skipped.
+
+    Args:
+        report (ScalingReport): The current curves.
+        baseline (ScalingReport): The stored curves.
+        threshold (float): Allowed relative growth, e.g. 0.25 for 25%.
+
+    Returns:
+        List[str]: A description of every regression.
+    """
+    previous = {(point.tool, point.modules): point for point in baseline.points}
+    regressions = []
+    for point in report.points:
+        base = previous.get((point.tool, point.modules))
+        if base is None:
+            continue
+        measurements = [
+            ("wall time", point.wall_seconds, base.wall_seconds, SECONDS_NOISE_FLOOR, "s"),
+            ("pylens RSS", point.pylens_rss_mb, base.pylens_rss_mb, RSS_NOISE_FLOOR_MB, "MiB"),
+            ("tool RSS", point.tool_rss_mb, base.tool_rss_mb, RSS_NOISE_FLOOR_MB, "MiB"),
+        ]
+        measurements.extend(
+            (f"{phase} phase", seconds, base.phase_seconds[phase], SECONDS_NOISE_FLOOR, "s")
+            for phase, seconds in point.phase_seconds.items()
+            if phase in base.phase_seconds
+        )
+        for name, value, base_value, noise_floor, unit in measurements:
+            if value > base_value * (1 + threshold) and value - base_value > noise_floor:
+                regressions.append(
+                    f"{point.tool} at {point.modules} modules: {name} "
+                    f"{base_value:.2f}{unit} -> {value:.2f}{unit} "
+                    f"(+{(value / base_value - 1) * 100 if base_value else math.inf:.0f}%)"
+                )
+    return regressions
+
+
+def format_curves(report: ScalingReport):
+    """
+    Displays the curves of each tool: the totals, then the cost of every phase.
+    The exponent is the slope of the wall time over the size on a log-log scale
+    since the previous point (1 is linear, 2 quadratic).
+    """
+    for tool in sorted({point.tool for point in report.points}):
+        points = sorted(
+            (point for point in report.points if point.tool == tool),
+            key=lambda p: p.modules,
+        )
+        table = Table(title=f"{tool} scaling", header_style="bold magenta")
+        for column in [
+            "Modules", "Wall (s)", "ms/module", "Exponent", "pylens RSS", "Tool RSS", "Issues"
+        ]:
+            table.add_column(column, justify="right")
+        previous: Optional[ScalingPoint] = None
+        for point in points:
+            exponent = "-"
+            if previous is not None and previous.wall_seconds > 0 and previous.modules > 0:
+                slope = math.log(point.wall_seconds / previous.wall_seconds) / math.log(
+                    point.modules / previous.modules
+                )
+                exponent = f"{slope:.2f}"
+            table.add_row(
+                f"{point.modules:,}",
+                f"{point.wall_seconds:.2f}",
+                f"{point.wall_seconds / point.modules * 1000:.2f}",
+                exponent,
+                f"{point.pylens_rss_mb:.0f} MiB",
+                f"{point.tool_rss_mb:.0f} MiB",
+                f"{point.issues:,}",
+            )
+            previous = point
+        console.print(table)
+
+        phases = [
+            phase
+            for phase in PHASES
+            if any(phase in point.phase_seconds for point in points)
+        ]
+        phase_table = Table(title=f"{tool} phases (s)", header_style="bold magenta")
+        phase_table.add_column("Modules", justify="right")
+        for phase in phases:
+            phase_table.add_column(phase, justify="right", style="cyan")
+        for point in points:
+            phase_table.add_row(
+                f"{point.modules:,}",
+                *(f"{point.phase_seconds.get(phase, 0.0):.3f}" for phase in phases),
+            )
+        console.print(phase_table)
+
+
+def _parse_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+@app.command()
+def generate(
+    root: str = typer.Argument(..., help="Directory to generate the repository in."),
+    modules: int = typer.Option(1000, "--modules", help="Number of modules."),
+    depth: int = typer.Option(2, "--depth", help="Nesting depth of the packages."),
+    import_density: float = typer.Option(
+        2.0, "--import-density", help="Average number of project modules each module imports."
+    ),
+    issue_density: float = typer.Option(
+        0.3, "--issue-density", help="Share of functions carrying an issue (0 to 1)."
+    ),
+    seed: int = typer.Option(0, "--seed", help="Seed of the generator."),
+):
+    """Generate a single synthetic repository, e.g. to try pylens on by hand."""
+    shape = RepositoryShape(
+        depth=depth, import_density=import_density, issue_density=issue_density, seed=seed
+    )
+    path = generate_repository(root, modules, shape)
+    console.print(f"[bold green]Generated {modules} modules in {path}[/bold green]")
+
+
+@app.command()
+def run(
+    sizes: str = typer.Option(
+        "100,300,1000", "--sizes", help="Comma-separated repository sizes, in modules."
+    ),
+    tools: str = typer.Option("pylint,mypy", "--tools", help="Comma-separated tools to run."),
+    depth: int = typer.Option(2, "--depth", help="Nesting depth of the packages."),
+    import_density: float = typer.Option(
+        2.0, "--import-density", help="Average number of project modules each module imports."
+    ),
+    issue_density: float = typer.Option(
+        0.3, "--issue-density", help="Share of functions carrying an issue (0 to 1)."
+    ),
+    seed: int = typer.Option(0, "--seed", help="Seed of the generator."),
+    mypy_jobs: int = typer.Option(
+        1, "--mypy-jobs", help="Maximum number of parallel MyPy processes."
+    ),
+    output: Optional[str] = typer.Option(
+        None, "--output", help="Save the curves as JSON (usable as a later baseline)."
+    ),
+    baseline: Optional[str] = typer.Option(
+        None, "--baseline", help="Curves of an earlier run to compare with."
+    ),
+    threshold: float = typer.Option(
+        0.25, "--threshold", help="Allowed relative growth of every measurement over the baseline."
+    ),
+):
+    """Run the pipeline at several repository sizes and record the scaling curves."""
+    shape = RepositoryShape(
+        depth=depth, import_density=import_density, issue_density=issue_density, seed=seed
+    )
+    previous_report = None
+    if baseline:
+        with open(baseline, encoding="utf-8") as baseline_file:
+            previous_report = ScalingReport.model_validate_json(baseline_file.read())
+        if previous_report.shape != shape or previous_report.mypy_jobs != mypy_jobs:
+            console.print(
+                "[bold red]The baseline was recorded with a different repository shape "
+                "or MyPy jobs, its curves can't be compared.[/bold red]"
+            )
+            raise typer.Exit(code=1)
+
+    report = ScalingReport(shape=shape, mypy_jobs=mypy_jobs)
+    # A fresh process per point, the peak RSS never carries over from a larger run
+    context = multiprocessing.get_context("spawn")
+    for modules in sorted({int(size) for size in _parse_list(sizes)}):
+        root = tempfile.mkdtemp(prefix="pylens-scale-")
+        try:
+            generate_repository(root, modules, shape)
+            for tool in _parse_list(tools):
+                console.print(f"Running {tool} on {modules:,} modules...")
+                with context.Pool(1) as pool:
+                    point = pool.apply(measure_pipeline, (tool, root, modules, mypy_jobs))
+                report.points.append(point)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    format_curves(report)
+    if output:
+        with open(output, "w", encoding="utf-8") as output_file:
+            output_file.write(report.model_dump_json(indent=2))
+
+    if previous_report is not None:
+        regressions = find_regressions(report, previous_report, threshold)
+        if regressions:
+            console.print("[bold red]Regressions against the baseline:[/bold red]")
+            for regression in regressions:
+                console.print(f"- {regression}")
+            raise typer.Exit(code=1)
+        console.print("[bold green]No regression against the baseline.[/bold green]")
+
+
+if __name__ == "__main__":
+    app()
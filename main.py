@@ -4,40 +4,390 @@ main.py
 A CLI tool for running code quality tools interactively with optional configuration files.
 """
 
+import tempfile
+from typing import Optional
 import typer
 from menu.pylint_menu import run_pylint_menu
 from menu.mypy_menu import run_mypy_menu
+from tool.protocol import DEFAULT_SOCKET_PATH
+from tool.mypy_cache import MypyCacheSettings
+from tool.mypy_formatter import format_cache_stats
+from tool.mypy_runner import run_mypy
+from tool.mypy_parallel import run_mypy_parallel
+from tool.run_stats import RunStats
+from tool.pylint_runner import pylint_files, run_pylint_in_process
+from tool.profiling import (
+    CostProfile,
+    bisect_costs,
+    load_cost_profile,
+    measure_pylint_overhead,
+    order_by_cost,
+    save_cost_profile,
+    time_pylint_shard,
+)
+from tool.profile_formatter import format_slowest_files
+from tool.snapshot import load_snapshot
+from tool.metrics import MetricsRegistry, start_metrics_server
+from tool.governor import ResourceLimits, set_default_limits
 
 app = typer.Typer()
 
+CACHE_DIR_OPTION = typer.Option(
+    None,
+    "--cache-dir",
+    help="MyPy cache directory (default: .pylens_cache/mypy at the project root, or a per-project directory under $PYLENS_CACHE_DIR).",
+)
+SQLITE_CACHE_OPTION = typer.Option(
+    False, "--mypy-sqlite-cache", help="Use MyPy's SQLite cache backend."
+)
+FINE_GRAINED_CACHE_OPTION = typer.Option(
+    False,
+    "--mypy-fine-grained-cache",
+    help="Also write MyPy's fine-grained dependency cache (used by dmypy).",
+)
+MYPY_JOBS_OPTION = typer.Option(
+    1,
+    "--mypy-jobs",
+    "-j",
+    help="Type-check independent parts of the project in parallel MyPy processes (0: one per CPU).",
+)
+METRICS_FILE_OPTION = typer.Option(
+    None,
+    "--metrics-file",
+    help="Write OpenMetrics text to this file after every run (e.g. for node-exporter's textfile collector).",
+)
+METRICS_PORT_OPTION = typer.Option(
+    None,
+    "--metrics-port",
+    help="Serve OpenMetrics text on http://127.0.0.1:<port>/metrics.",
+)
+MEMORY_LIMIT_OPTION = typer.Option(
+    None,
+    "--memory-limit",
+    help="Maximum memory of each analysis process in MiB (a cgroup limit if $PYLENS_CGROUP is set).",
+)
+NICE_OPTION = typer.Option(
+    0, "--nice", help="Lower the CPU priority of the analysis processes by this niceness."
+)
+IDLE_IO_OPTION = typer.Option(
+    False, "--idle-io", help="Only give the analysis processes disk time when the disk is idle."
+)
+TIMEOUT_OPTION = typer.Option(
+    None,
+    "--timeout",
+    help="Kill an analysis process after this many seconds (its results are incomplete).",
+)
+MAX_PROCESSES_OPTION = typer.Option(
+    None,
+    "--max-processes",
+    help="Maximum number of analysis processes running at the same time.",
+)
+
+
+def set_resource_limits(
+    memory_limit: Optional[int],
+    nice: int,
+    idle_io: bool,
+    timeout: Optional[float],
+    max_processes: Optional[int],
+):
+    """Sets the limits every analysis process of this command runs with."""
+    set_default_limits(
+        ResourceLimits(
+            memory_mb=memory_limit,
+            nice=nice,
+            idle_io=idle_io,
+            timeout=timeout,
+            max_processes=max_processes,
+        )
+    )
+
+
+def reject_in_process_limits(memory_limit: Optional[int], timeout: Optional[float]):
+    """
+    Exits if a memory limit or a timeout was requested for an in-process Pylint run
+    (profiling), they only apply to the analysis subprocesses.
+    """
+    if memory_limit is not None or timeout is not None:
+        typer.echo(
+            "Error: Pylint is profiled in-process, where --memory-limit and --timeout "
+            "can't be enforced (`profile --bisect` times it in subprocesses)."
+        )
+        raise typer.Exit(code=1)
+
+
+def create_metrics_registry(
+    metrics_file: Optional[str], metrics_port: Optional[int]
+) -> Optional[MetricsRegistry]:
+    """Creates the metrics registry (and its HTTP endpoint) if any export was requested."""
+    if not metrics_file and metrics_port is None:
+        return None
+    registry = MetricsRegistry(textfile=metrics_file)
+    if metrics_port is not None:
+        try:
+            start_metrics_server(registry, metrics_port)
+        except OSError as error:
+            typer.echo(f"Error: Could not serve metrics on port {metrics_port}: {error}")
+            raise typer.Exit(code=1)
+    return registry
+
 
 @app.command()
 def analyze(
-    path: str = typer.Option(
-        ..., "--path", "-p", help="Path to the directory or file to analyze."
+    path: Optional[str] = typer.Option(
+        None,
+        "--path",
+        "-p",
+        help="Path to the directory or file to analyze (defaults to the snapshot's when loading one).",
     ),
     tool: str = typer.Option(
         "pylint", "--tool", "-t", help="The code quality tool to use (default: pylint)."
     ),
-    configuration: str = typer.Option(
+    configuration: Optional[str] = typer.Option(
         None,
         "--configuration",
         "-c",
         help="Optional configuration file path for the tool (e.g., .pylintrc for Pylint, mypy.ini for MyPy).",
     ),
+    save_snapshot_file: str = typer.Option(
+        None, "--save-snapshot", help="Save the results of every run into a binary snapshot file."
+    ),
+    load_snapshot_file: str = typer.Option(
+        None,
+        "--load-snapshot",
+        help="Browse the results saved in a snapshot file instead of running the tool.",
+    ),
+    server: bool = typer.Option(
+        False,
+        "--server",
+        "-s",
+        help="Analyze through a running `serve` instance instead of starting the tools from scratch.",
+    ),
+    socket_path: str = typer.Option(
+        DEFAULT_SOCKET_PATH, "--socket", help="Unix socket of the pylens server."
+    ),
+    cache_dir: str = CACHE_DIR_OPTION,
+    sqlite_cache: bool = SQLITE_CACHE_OPTION,
+    fine_grained_cache: bool = FINE_GRAINED_CACHE_OPTION,
+    mypy_jobs: int = MYPY_JOBS_OPTION,
+    profile: bool = typer.Option(
+        False,
+        "--profile",
+        help="Time every file and show the slowest ones in the summary (runs locally).",
+    ),
+    metrics_file: str = METRICS_FILE_OPTION,
+    metrics_port: int = METRICS_PORT_OPTION,
+    memory_limit: int = MEMORY_LIMIT_OPTION,
+    nice: int = NICE_OPTION,
+    idle_io: bool = IDLE_IO_OPTION,
+    timeout: float = TIMEOUT_OPTION,
+    max_processes: int = MAX_PROCESSES_OPTION,
 ):
     """
     Analyze code using the specified tool and display results interactively.
     Allows optional configuration file for custom settings.
     """
+    set_resource_limits(memory_limit, nice, idle_io, timeout, max_processes)
+    snapshot = None
+    if load_snapshot_file:
+        try:
+            snapshot = load_snapshot(load_snapshot_file)
+        except (OSError, ValueError) as error:
+            typer.echo(f"Error: Could not load the snapshot: {error}")
+            raise typer.Exit(code=1)
+        # The snapshot tells which tool produced it, and what to rerun
+        tool = snapshot.tool
+        path = path or snapshot.path
+        configuration = configuration or snapshot.configuration
+    if not path:
+        typer.echo("Error: Missing option '--path' (required unless a snapshot is loaded).")
+        raise typer.Exit(code=1)
+    if profile and tool == "pylint":
+        reject_in_process_limits(memory_limit, timeout)
+
+    metrics = create_metrics_registry(metrics_file, metrics_port)
+    server_socket = socket_path if server else None
     if tool == "pylint":
-        run_pylint_menu(path=path, configuration=configuration)
+        run_pylint_menu(
+            path=path,
+            configuration=configuration,
+            socket_path=server_socket,
+            profile=profile,
+            snapshot=snapshot,
+            snapshot_file=save_snapshot_file,
+            metrics=metrics,
+        )
+    elif tool == "mypy":
+        run_mypy_menu(
+            path=path,
+            configuration=configuration,
+            socket_path=server_socket,
+            cache_settings=MypyCacheSettings(
+                cache_dir=cache_dir, sqlite=sqlite_cache, fine_grained=fine_grained_cache
+            ),
+            profile=profile,
+            snapshot=snapshot,
+            snapshot_file=save_snapshot_file,
+            metrics=metrics,
+            jobs=mypy_jobs,
+        )
+    else:
+        typer.echo(
+            f"Error: Unsupported tool '{tool}'. Currently supported tools are 'pylint' and 'mypy'."
+        )
+
+
+
+@app.command("warm-cache")
+def warm_cache(
+    path: str = typer.Option(
+        ..., "--path", "-p", help="Path to the directory or file to analyze."
+    ),
+    configuration: str = typer.Option(
+        None, "--configuration", "-c", help="Optional MyPy configuration file path."
+    ),
+    cache_dir: str = CACHE_DIR_OPTION,
+    sqlite_cache: bool = SQLITE_CACHE_OPTION,
+    fine_grained_cache: bool = FINE_GRAINED_CACHE_OPTION,
+    mypy_jobs: int = MYPY_JOBS_OPTION,
+    memory_limit: int = MEMORY_LIMIT_OPTION,
+    nice: int = NICE_OPTION,
+    idle_io: bool = IDLE_IO_OPTION,
+    timeout: float = TIMEOUT_OPTION,
+    max_processes: int = MAX_PROCESSES_OPTION,
+):
+    """
+    Prebuild the managed MyPy cache without the interactive menu (e.g. in a CI cache step).
+    Later `analyze --tool mypy` runs with the same options start from it.
+    """
+    set_resource_limits(memory_limit, nice, idle_io, timeout, max_processes)
+    run_stats = RunStats(tool="mypy")
+    try:
+        results = run_mypy_parallel(
+            path=path,
+            configuration=configuration,
+            cache_settings=MypyCacheSettings(
+                cache_dir=cache_dir, sqlite=sqlite_cache, fine_grained=fine_grained_cache
+            ),
+            run_stats=run_stats,
+            jobs=mypy_jobs or None,
+        )
+    except (OSError, RuntimeError) as error:
+        typer.echo(f"Error: {error}")
+        raise typer.Exit(code=1)
+    if run_stats.cache is None:
+        typer.echo("Error: MyPy didn't report its cache.")
+        raise typer.Exit(code=1)
+
+    typer.echo(f"MyPy cache warmed up, {len(results)} file(s) with issues.")
+    format_cache_stats(run_stats.cache)
+
+
+@app.command("profile")
+def profile_costs(
+    path: str = typer.Option(
+        ..., "--path", "-p", help="Path to the directory or file to analyze."
+    ),
+    tool: str = typer.Option(
+        "pylint", "--tool", "-t", help="The code quality tool to use (default: pylint)."
+    ),
+    configuration: str = typer.Option(
+        None, "--configuration", "-c", help="Optional configuration file path for the tool."
+    ),
+    bisect: bool = typer.Option(
+        False,
+        "--bisect",
+        help="Pylint only: derive costs from timed subprocess runs over bisected shards.",
+    ),
+    limit: int = typer.Option(20, "--limit", help="Number of slowest files to show."),
+    memory_limit: int = MEMORY_LIMIT_OPTION,
+    nice: int = NICE_OPTION,
+    idle_io: bool = IDLE_IO_OPTION,
+    timeout: float = TIMEOUT_OPTION,
+    max_processes: int = MAX_PROCESSES_OPTION,
+):
+    """
+    Measure how long each file takes to analyze and save the project's cost profile.
+    Later runs use the profile to schedule expensive files first.
+    """
+    set_resource_limits(memory_limit, nice, idle_io, timeout, max_processes)
+    run_stats = RunStats(tool=tool)
+    method = "timed"
+    if tool == "pylint" and bisect:
+        files = order_by_cost(
+            pylint_files(path),
+            load_cost_profile(path, "pylint"),
+        )
+        run_stats.file_seconds = bisect_costs(
+            files,
+            lambda shard: time_pylint_shard(shard, configuration),
+            overhead=measure_pylint_overhead(configuration),
+        )
+        method = "bisected"
+    elif tool == "pylint":
+        reject_in_process_limits(memory_limit, timeout)
+        run_pylint_in_process(
+            [path], configuration, run_stats=run_stats, time_files=True
+        )
     elif tool == "mypy":
-        run_mypy_menu(path=path, configuration=configuration)
+        # Start from an empty cache, otherwise cached modules would look free
+        with tempfile.TemporaryDirectory(prefix="pylens-mypy-") as cold_cache:
+            try:
+                run_mypy(
+                    path=path,
+                    configuration=configuration,
+                    cache_settings=MypyCacheSettings(cache_dir=cold_cache),
+                    run_stats=run_stats,
+                    time_files=True,
+                )
+            except (OSError, RuntimeError) as error:
+                typer.echo(f"Error: {error}")
+                raise typer.Exit(code=1)
     else:
         typer.echo(
             f"Error: Unsupported tool '{tool}'. Currently supported tools are 'pylint' and 'mypy'."
         )
+        raise typer.Exit(code=1)
+
+    if not run_stats.file_seconds:
+        typer.echo("Error: No file could be timed.")
+        raise typer.Exit(code=1)
+
+    save_cost_profile(
+        path, CostProfile(tool=tool, file_seconds=run_stats.file_seconds, method=method)
+    )
+    format_slowest_files(run_stats.file_seconds, limit=limit)
+
+
+@app.command()
+def serve(
+    socket_path: str = typer.Option(
+        DEFAULT_SOCKET_PATH, "--socket", help="Unix socket to listen on."
+    ),
+    metrics_file: str = METRICS_FILE_OPTION,
+    metrics_port: int = METRICS_PORT_OPTION,
+    memory_limit: int = MEMORY_LIMIT_OPTION,
+    nice: int = NICE_OPTION,
+    idle_io: bool = IDLE_IO_OPTION,
+    timeout: float = TIMEOUT_OPTION,
+):
+    """
+    Start a persistent pylens server with warm Pylint/MyPy workers.
+    `analyze --server` then reuses it instead of starting the tools from scratch.
+    The resource limits apply to the workers, a request exceeding the timeout restarts its worker.
+    """
+    set_resource_limits(memory_limit, nice, idle_io, timeout, None)
+    # Imported here so plain `analyze` runs don't pay for multiprocessing/socketserver
+    from tool.server import serve as run_server  # pylint: disable=import-outside-toplevel
+
+    try:
+        run_server(
+            socket_path=socket_path,
+            metrics=create_metrics_registry(metrics_file, metrics_port),
+        )
+    except RuntimeError as error:
+        typer.echo(f"Error: {error}")
+        raise typer.Exit(code=1)
 
 
 if __name__ == "__main__":
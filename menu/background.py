@@ -0,0 +1,157 @@
+"""
+background.py
+
+Runs analyses on a background thread so the menus can keep showing the last
+completed results while a rerun is in progress (stale-while-revalidate).
+New results are swapped in atomically once the run finishes.
+"""
+
+import threading
+import time
+from typing import Callable, Generic, Optional, Tuple, TypeVar
+from rich.markup import escape
+
+T = TypeVar("T")
+
+
+class BackgroundAnalysis(Generic[T]):
+    """
+    Owns the latest completed results of an analysis and at most one run in progress.
+
+    Args:
+        analyze (Callable[[], T]): Runs the analysis and returns its results.
+        initial (Optional[T]): Results to start with (e.g. from a snapshot) instead of running.
+        initial_time (float): When the initial results were produced (Unix time).
+    """
+
+    def __init__(
+        self,
+        analyze: Callable[[], T],
+        initial: Optional[T] = None,
+        initial_time: float = 0.0,
+    ):
+        self._analyze = analyze
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._latest: Optional[T] = initial
+        self._generation = 0 if initial is None else 1
+        self._started_at = 0.0
+        self._finished_at = initial_time
+        self._error: Optional[str] = None
+        self._notice: Optional[str] = None
+
+    def start(self) -> bool:
+        """
+        Starts a run in the background, unless one is already in progress.
+
+        Returns:
+            bool: True if a new run was started.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._error = None
+            self._notice = None
+            self._started_at = time.monotonic()
+            self._thread = threading.Thread(
+                target=self._run, name="pylens-analysis", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _run(self):
+        try:
+            results = self._analyze()
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            # Keep the previous results, the menu reports the failure
+            with self._lock:
+                self._error = f"{type(error).__name__}: {error}"
+            return
+
+        with self._lock:
+            self._latest = results
+            self._generation += 1
+            self._finished_at = time.time()
+
+    def notify(self, notice: str):
+        """
+        Records a notice about the current run (e.g. a fallback it took), shown with
+        the status. Printed from the analysis thread, it would garble the menu's prompt.
+        """
+        with self._lock:
+            self._notice = notice
+
+    def wait(self):
+        """Blocks until the run in progress (if any) finishes."""
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    @property
+    def running(self) -> bool:
+        """Whether a run is in progress."""
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def latest(self) -> Tuple[int, Optional[T], float]:
+        """
+        Returns the latest completed results together with their generation,
+        which increases by one every time new results are swapped in, and the
+        time the analysis producing them finished (Unix time). Results swapped in
+        with replace_latest keep the time of the analysis they were derived from.
+        """
+        with self._lock:
+            return self._generation, self._latest, self._finished_at
+
+    def replace_latest(self, generation: int, results: T) -> bool:
+        """
+        Swaps in results derived from the latest ones (e.g. after rechecking a single file).
+        Refused if newer results landed in the meantime, they already supersede the change.
+
+        Args:
+            generation (int): The generation the new results were derived from.
+            results (T): The new results.
+
+        Returns:
+            bool: True if the results were swapped in.
+        """
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._latest = results
+            self._generation += 1
+            return True
+
+    def status(self) -> str:
+        """
+        A rich-formatted status of the analysis for the menus, followed by the
+        notice of the last run on a second line, if it left one.
+        """
+        with self._lock:
+            error = self._error
+            notice = self._notice
+            finished_at = self._finished_at
+        if self.running:
+            elapsed = time.monotonic() - self._started_at
+            status = (
+                f"[bold yellow]Reanalysis running ({elapsed:.0f}s), "
+                "showing the previous results[/bold yellow]"
+            )
+        elif error:
+            status = f"[bold red]Reanalysis failed, showing the previous results: {error}[/bold red]"
+        else:
+            # Loaded results (e.g. from a snapshot) may be days old
+            finished = time.localtime(finished_at)
+            same_day = finished[:3] == time.localtime()[:3]
+            stamp = time.strftime(
+                "%H:%M:%S" if same_day else "%Y-%m-%d %H:%M:%S", finished
+            )
+            status = f"[dim]Results from {stamp}[/dim]"
+        if notice:
+            status += f"\n[yellow]{escape(notice)}[/yellow]"
+        return status
+
+    def error(self) -> Optional[str]:
+        """The error of the last run, if it failed."""
+        with self._lock:
+            return self._error
@@ -4,11 +4,28 @@ mypy_menu.py
 Handles the interactive menu for running and viewing MyPy results.
 """
 
-from typing import Optional
+import tempfile
+from typing import Callable, Dict, List, Optional
+from pydantic import BaseModel
 from rich.console import Console
 from rich.prompt import Prompt
 from tool.mypy_formatter import format_summary, format_detailed_results
-from tool.mypy_runner import run_mypy
+from tool.mypy_runner import MypyResult, run_mypy
+from tool.mypy_parallel import run_mypy_parallel
+from tool.mypy_cache import MypyCacheSettings, MypyCacheStats, resolve_cache_dir
+from tool.run_stats import RunStats, timed_phase
+from tool.aggregation import IssueAggregates, aggregate_mypy, update_aggregates
+from tool.aggregate_formatter import (
+    format_top_codes,
+    format_worst_files,
+    format_worst_directories,
+)
+from tool.profile_formatter import format_slowest_files
+from tool.client import run_mypy_remote
+from tool.recheck import find_result, splice_results
+from tool.snapshot import Snapshot, save_snapshot
+from tool.metrics import MetricsRegistry, collect_metrics
+from menu.background import BackgroundAnalysis
 
 console = Console()
 
@@ -18,42 +35,308 @@ def clear_screen():
     console.clear()
 
 
-def run_mypy_menu(path: str, configuration: Optional[str] = None):
+def analyze_path(
+    path: str,
+    configuration: Optional[str],
+    socket_path: Optional[str],
+    cache_settings: MypyCacheSettings,
+    run_stats: RunStats,
+    profile: bool = False,
+    jobs: int = 1,
+    notify: Callable[[str], None] = console.print,
+) -> List[MypyResult]:
+    """
+    Runs MyPy through the pylens server if one was requested, locally otherwise.
+    Falls back to a local run when the server can't be reached, and tells `notify`.
+    Profiling always runs locally, with MyPy's per-module timings enabled, against
+    an empty temporary cache: modules loaded from the cache would look free.
+    Local runs with more than one job check independent parts of the project in parallel.
+    """
+    if profile:
+        with tempfile.TemporaryDirectory(prefix="pylens-mypy-") as cold_cache:
+            return _analyze_locally(
+                path,
+                configuration,
+                cache_settings.model_copy(update={"cache_dir": cold_cache}),
+                run_stats,
+                profile,
+                jobs,
+            )
+    if socket_path:
+        try:
+            return run_mypy_remote(
+                path,
+                configuration,
+                cache_settings=cache_settings,
+                run_stats=run_stats,
+                socket_path=socket_path,
+            )
+        except (OSError, RuntimeError) as error:
+            notify(f"pylens server unavailable ({error}), ran locally.")
+    return _analyze_locally(
+        path, configuration, cache_settings, run_stats, profile, jobs
+    )
+
+
+def _analyze_locally(
+    path: str,
+    configuration: Optional[str],
+    cache_settings: MypyCacheSettings,
+    run_stats: RunStats,
+    profile: bool,
+    jobs: int,
+) -> List[MypyResult]:
+    if jobs != 1:
+        return run_mypy_parallel(
+            path=path,
+            configuration=configuration,
+            cache_settings=cache_settings,
+            run_stats=run_stats,
+            time_files=profile,
+            jobs=jobs or None,
+        )
+    return run_mypy(
+        path=path,
+        configuration=configuration,
+        cache_settings=cache_settings,
+        run_stats=run_stats,
+        time_files=profile,
+    )
+
+
+class MypyRun(BaseModel):
+    """
+    The outcome of one MyPy run, swapped into the menu as a whole.
+
+    - results: The MyPy results.
+    - run_stats: Statistics of the run (cache hit rate, ...).
+    - aggregates: The precomputed "top offenders" histograms.
+    """
+
+    results: List[MypyResult]
+    run_stats: RunStats
+    aggregates: IssueAggregates
+
+
+def analyze_run(
+    path: str,
+    configuration: Optional[str],
+    socket_path: Optional[str],
+    cache_settings: MypyCacheSettings,
+    profile: bool = False,
+    jobs: int = 1,
+    notify: Callable[[str], None] = console.print,
+) -> MypyRun:
+    """Runs MyPy and precomputes everything the menu views need."""
+    run_stats = RunStats(tool="mypy")
+    results = analyze_path(
+        path,
+        configuration,
+        socket_path,
+        cache_settings,
+        run_stats,
+        profile,
+        jobs,
+        notify,
+    )
+    with timed_phase(run_stats, "aggregate"):
+        aggregates = aggregate_mypy(results)
+    return MypyRun(results=results, run_stats=run_stats, aggregates=aggregates)
+
+
+def recheck_file(
+    run: MypyRun,
+    selected_file: str,
+    configuration: Optional[str],
+    socket_path: Optional[str],
+    cache_settings: MypyCacheSettings,
+) -> MypyRun:
+    """
+    Reruns MyPy on a single file and splices its results into the run.
+    The managed cache keeps the file's dependencies warm, so only the file itself
+    is checked again. Issues MyPy reports in other files are ignored.
+
+    Args:
+        run (MypyRun): The run to update.
+        selected_file (str): The file to check again.
+        configuration (Optional[str]): Optional configuration file path.
+        socket_path (Optional[str]): Unix socket of a pylens server to analyze through.
+        cache_settings (MypyCacheSettings): Cache options naming the cache directory
+            of the full run, resolving it from the file could pick a cold one.
+
+    Raises:
+        OSError, RuntimeError: If MyPy failed or timed out, the run is left untouched.
+    """
+    old = next(res for res in run.results if res.file == selected_file)
+    fresh_results = analyze_path(
+        selected_file, configuration, socket_path, cache_settings, RunStats(tool="mypy")
+    )
+    new = find_result(fresh_results, selected_file)
+    return MypyRun(
+        results=splice_results(run.results, old, new),
+        run_stats=run.run_stats,
+        aggregates=update_aggregates(
+            run.aggregates,
+            aggregate_mypy([old]),
+            aggregate_mypy([new] if new else []),
+        ),
+    )
+
+
+def save_run_snapshot(
+    snapshot_file: str,
+    run: MypyRun,
+    path: str,
+    configuration: Optional[str],
+    finished_at: float,
+):
+    """Saves the run into a snapshot file, reporting (but surviving) failures."""
+    try:
+        save_snapshot(
+            snapshot_file,
+            Snapshot(
+                tool="mypy",
+                path=path,
+                configuration=configuration,
+                created_at=finished_at,
+                mypy_results=run.results,
+                aggregates=run.aggregates,
+                run_stats=run.run_stats,
+            ),
+        )
+    except (OSError, ValueError) as error:
+        console.print(f"[bold red]Could not save the snapshot: {error}[/bold red]")
+
+
+def run_mypy_menu(
+    path: str,
+    configuration: Optional[str] = None,
+    socket_path: Optional[str] = None,
+    cache_settings: Optional[MypyCacheSettings] = None,
+    profile: bool = False,
+    snapshot: Optional[Snapshot] = None,
+    snapshot_file: Optional[str] = None,
+    metrics: Optional[MetricsRegistry] = None,
+    jobs: int = 1,
+):
     """
     Handles the interactive menu for MyPy analysis.
 
     Args:
         path (str): Path to analyze with MyPy.
+        configuration (Optional[str]): Optional configuration file path.
+        socket_path (Optional[str]): Unix socket of a pylens server to analyze through.
+        cache_settings (Optional[MypyCacheSettings]): Options for the managed MyPy cache.
+        profile (bool): Whether to time every file and show the slowest ones in the summary.
+        snapshot (Optional[Snapshot]): Previously saved results to browse instead of running MyPy.
+        snapshot_file (Optional[str]): File to save the results of every run to.
+        metrics (Optional[MetricsRegistry]): Registry to export the metrics of every run to.
+        jobs (int): Number of parallel MyPy processes for local runs, 0 for one per CPU.
     """
-    while True:
-        clear_screen()
+    cache_settings = cache_settings or MypyCacheSettings()
+    # Rechecks of single files reuse the cache the analyzed path resolves to
+    recheck_cache_settings = cache_settings.model_copy(
+        update={"cache_dir": resolve_cache_dir(path, cache_settings)}
+    )
+    initial = None
+    if snapshot is not None:
+        initial = MypyRun.model_construct(
+            results=snapshot.mypy_results,
+            run_stats=snapshot.run_stats,
+            aggregates=snapshot.aggregates,
+        )
+    analysis = BackgroundAnalysis(
+        lambda: analyze_run(
+            path,
+            configuration,
+            socket_path,
+            cache_settings,
+            profile,
+            jobs,
+            notify=analysis.notify,
+        ),
+        initial=initial,
+        initial_time=snapshot.created_at if snapshot else 0.0,
+    )
+
+    clear_screen()
+    if snapshot is not None:
+        console.print(f"[bold green]Loaded MyPy snapshot of: {path}[/bold green]")
+    else:
         console.print(f"[bold green]Running MyPy on: {path}[/bold green]")
+    if configuration:
+        console.print(f"Using configuration file: {configuration}")
+    if initial is None:
+        analysis.start()
+        analysis.wait()
 
-        # Run MyPy and get results
-        results = run_mypy(path=path, configuration=configuration)
+    # Interactive menu, browses the latest completed results while reruns happen in the background
+    seen_generation = 0
+    recorded_at = None
+    # Filled in from the first run below, the loop returns before using them otherwise
+    results: List[MypyResult] = []
+    cache_stats: Optional[MypyCacheStats] = None
+    aggregates = IssueAggregates(tool="mypy")
+    file_seconds: Dict[str, float] = {}
+    file_mapping: Dict[int, str] = {}
+    while True:
+        generation, run, finished_at = analysis.latest()
+        if run is None:
+            console.print(f"[bold red]MyPy analysis failed: {analysis.error()}[/bold red]")
+            return
 
-        # Check if no issues were found
-        if not results or all(len(res.issues) == 0 for res in results):
-            console.print(
-                "[bold green]No issues detected! Type annotations are in good shape![/bold green]"
-            )
-            break
+        if generation != seen_generation:
+            # New results landed, swap them in as a whole
+            seen_generation = generation
+            results = run.results
+            cache_stats = run.run_stats.cache
+            aggregates = run.aggregates
+            file_seconds = run.run_stats.file_seconds
+            if snapshot_file and (snapshot is None or generation > 1):
+                save_run_snapshot(snapshot_file, run, path, configuration, finished_at)
+            # A recheck keeps the time of its run, it isn't a run of its own
+            if metrics is not None and finished_at != recorded_at:
+                recorded_at = finished_at
+                metrics.record(
+                    collect_metrics(
+                        "mypy", path, results, run.run_stats, finished_at=finished_at
+                    )
+                )
 
-        # Display only the summary and overall score initially
-        console.print("\n[bold cyan]MyPy Summary[/bold cyan]")
-        file_mapping = format_summary(results, with_numbering=True)
+            # Check if no issues were found
+            if not results or all(len(res.issues) == 0 for res in results):
+                console.print(
+                    "[bold green]No issues detected! Type annotations are in good shape![/bold green]"
+                )
+                return
+
+            if generation > 1:
+                console.print("\n[bold green]New results loaded.[/bold green]")
+
+            # Display only the summary and overall score initially
+            console.print("\n[bold cyan]MyPy Summary[/bold cyan]")
+            file_mapping = format_summary(
+                results, with_numbering=True, cache_stats=cache_stats
+            )
+            if file_seconds:
+                format_slowest_files(file_seconds)
 
-        # Interactive menu
+        console.print(f"\n{analysis.status()}")
         console.print("\n[bold cyan]Options:[/bold cyan]")
         console.print(
             "[bold magenta]1.[/bold magenta] Show detailed results for a specific file"
         )
         console.print("[bold magenta]2.[/bold magenta] Show summary again")
         console.print("[bold magenta]3.[/bold magenta] Show all detailed results")
-        console.print("[bold magenta]4.[/bold magenta] Rerun analysis")
+        console.print(
+            "[bold magenta]4.[/bold magenta] Rerun analysis (in the background)"
+        )
         console.print("[bold magenta]5.[/bold magenta] Quit")
+        console.print("[bold magenta]6.[/bold magenta] Show top 20 codes")
+        console.print("[bold magenta]7.[/bold magenta] Show worst 20 files")
+        console.print("[bold magenta]8.[/bold magenta] Show worst 20 directories")
 
-        choice = Prompt.ask("\nEnter your choice", choices=["1", "2", "3", "4", "5"])
+        choice = Prompt.ask("\nEnter your choice", choices=[str(i) for i in range(1, 9)])
 
         if choice == "1":
             file_choice = Prompt.ask(
@@ -68,12 +351,37 @@ def run_mypy_menu(path: str, configuration: Optional[str] = None):
                     f"\n[bold cyan]Detailed Results for {selected_file}[/bold cyan]"
                 )
                 format_detailed_results(detailed_result)
-            input("\nPress Enter to return to the menu...")
+            action = Prompt.ask(
+                "\nPress Enter to return to the menu, or 'r' to recheck this file",
+                default="",
+                show_default=False,
+            )
+            if action.strip().lower() == "r":
+                console.print(f"[bold green]Rechecking {selected_file}...[/bold green]")
+                try:
+                    rechecked = recheck_file(
+                        run,
+                        selected_file,
+                        configuration,
+                        socket_path,
+                        recheck_cache_settings,
+                    )
+                except (OSError, RuntimeError) as error:
+                    console.print(
+                        f"[bold red]Recheck failed, the results are unchanged: {error}[/bold red]"
+                    )
+                    continue
+                if not analysis.replace_latest(generation, rechecked):
+                    console.print(
+                        "[bold yellow]Newer results landed in the meantime, the recheck was discarded.[/bold yellow]"
+                    )
 
         elif choice == "2":
             clear_screen()
             console.print("\n[bold cyan]MyPy Summary[/bold cyan]")
-            format_summary(results, with_numbering=True)
+            format_summary(results, with_numbering=True, cache_stats=cache_stats)
+            if file_seconds:
+                format_slowest_files(file_seconds)
 
         elif choice == "3":
             clear_screen()
@@ -82,8 +390,26 @@ def run_mypy_menu(path: str, configuration: Optional[str] = None):
             input("\nPress Enter to return to the menu...")
 
         elif choice == "4":
-            continue  # Rerun the analysis
+            # Keep browsing the current results while the rerun is in progress
+            if analysis.start():
+                console.print(
+                    "[bold green]Reanalysis started in the background.[/bold green]"
+                )
+            else:
+                console.print("[bold yellow]A reanalysis is already running.[/bold yellow]")
 
         elif choice == "5":
             console.print("[bold green]Exiting...[/bold green]")
-            break
+            return
+
+        elif choice == "6":
+            clear_screen()
+            format_top_codes(aggregates)
+
+        elif choice == "7":
+            clear_screen()
+            format_worst_files(aggregates)
+
+        elif choice == "8":
+            clear_screen()
+            format_worst_directories(aggregates)
@@ -4,11 +4,25 @@ pylint_menu.py
 Handles the interactive menu for running and viewing Pylint results.
 """
 
-from typing import Optional
+from typing import Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel
 from rich.console import Console
 from rich.prompt import Prompt
 from tool.pylint_formatter import format_summary, format_detailed_results
-from tool.pylint_runner import run_pylint
+from tool.pylint_runner import PylintResult, run_pylint, run_pylint_in_process
+from tool.run_stats import RunStats, timed_phase
+from tool.aggregation import IssueAggregates, aggregate_pylint, update_aggregates
+from tool.aggregate_formatter import (
+    format_top_codes,
+    format_worst_files,
+    format_worst_directories,
+)
+from tool.profile_formatter import format_slowest_files
+from tool.client import run_pylint_remote
+from tool.recheck import find_result, rescore_pylint, splice_results
+from tool.snapshot import Snapshot, save_snapshot
+from tool.metrics import MetricsRegistry, collect_metrics
+from menu.background import BackgroundAnalysis
 
 console = Console()
 
@@ -18,42 +32,257 @@ def clear_screen():
     console.clear()
 
 
-def run_pylint_menu(path: str, configuration: Optional[str] = None):
+def analyze_path(
+    path: str,
+    configuration: Optional[str],
+    socket_path: Optional[str],
+    run_stats: RunStats,
+    profile: bool = False,
+    notify: Callable[[str], None] = console.print,
+) -> Tuple[List[PylintResult], Optional[float]]:
+    """
+    Runs Pylint through the pylens server if one was requested, locally otherwise.
+    Falls back to a local run when the server can't be reached, and tells `notify`.
+    Profiling runs Pylint in-process, where every module can be timed.
+    """
+    if profile:
+        return run_pylint_in_process(
+            [path], configuration, run_stats=run_stats, time_files=True
+        )
+    if socket_path:
+        try:
+            return run_pylint_remote(
+                [path], configuration, run_stats=run_stats, socket_path=socket_path
+            )
+        except (OSError, RuntimeError) as error:
+            notify(f"pylens server unavailable ({error}), ran locally.")
+    return run_pylint(paths=[path], configuration=configuration, run_stats=run_stats)
+
+
+class PylintRun(BaseModel):
+    """
+    The outcome of one Pylint run, swapped into the menu as a whole.
+
+    - results: The Pylint results.
+    - overall_score: The overall score from Pylint, None if the run timed out before it.
+    - aggregates: The precomputed "top offenders" histograms.
+    - run_stats: Statistics of the run (per-file timings, ...).
+    """
+
+    results: List[PylintResult]
+    overall_score: Optional[float]
+    aggregates: IssueAggregates
+    run_stats: RunStats
+
+
+def analyze_run(
+    path: str,
+    configuration: Optional[str],
+    socket_path: Optional[str],
+    profile: bool = False,
+    notify: Callable[[str], None] = console.print,
+) -> PylintRun:
+    """Runs Pylint and precomputes everything the menu views need."""
+    run_stats = RunStats(tool="pylint")
+    results, overall_score = analyze_path(
+        path, configuration, socket_path, run_stats, profile, notify
+    )
+    with timed_phase(run_stats, "aggregate"):
+        aggregates = aggregate_pylint(results)
+    return PylintRun(
+        results=results,
+        overall_score=overall_score,
+        aggregates=aggregates,
+        run_stats=run_stats,
+    )
+
+
+def recheck_file(
+    run: PylintRun,
+    selected_file: str,
+    configuration: Optional[str],
+    socket_path: Optional[str],
+) -> Optional[PylintRun]:
+    """
+    Reruns Pylint on a single file and splices its results into the run.
+    The aggregates are updated incrementally and the overall score is estimated,
+    only a full rerun gives the exact score.
+
+    Returns:
+        Optional[PylintRun]: The updated run, None if the file's path is unknown.
+
+    Raises:
+        OSError, RuntimeError: If Pylint failed or timed out, the run is left untouched.
+    """
+    old = next(res for res in run.results if (res.path or res.file) == selected_file)
+    if not old.path:
+        return None
+
+    recheck_stats = RunStats(tool="pylint")
+    fresh_results, _ = analyze_path(old.path, configuration, socket_path, recheck_stats)
+    # A partial recheck would drop issues Pylint simply didn't get to
+    if recheck_stats.timed_out:
+        raise RuntimeError(f"Pylint timed out on {old.path}.")
+    new = find_result(fresh_results, old.path)
+    return PylintRun(
+        results=splice_results(run.results, old, new),
+        overall_score=rescore_pylint(run.overall_score, run.results, old, new),
+        aggregates=update_aggregates(
+            run.aggregates,
+            aggregate_pylint([old]),
+            aggregate_pylint([new] if new else []),
+        ),
+        run_stats=run.run_stats,
+    )
+
+
+def save_run_snapshot(
+    snapshot_file: str,
+    run: PylintRun,
+    path: str,
+    configuration: Optional[str],
+    finished_at: float,
+):
+    """Saves the run into a snapshot file, reporting (but surviving) failures."""
+    try:
+        save_snapshot(
+            snapshot_file,
+            Snapshot(
+                tool="pylint",
+                path=path,
+                configuration=configuration,
+                created_at=finished_at,
+                pylint_results=run.results,
+                overall_score=run.overall_score,
+                aggregates=run.aggregates,
+                run_stats=run.run_stats,
+            ),
+        )
+    except (OSError, ValueError) as error:
+        console.print(f"[bold red]Could not save the snapshot: {error}[/bold red]")
+
+
+def run_pylint_menu(
+    path: str,
+    configuration: Optional[str] = None,
+    socket_path: Optional[str] = None,
+    profile: bool = False,
+    snapshot: Optional[Snapshot] = None,
+    snapshot_file: Optional[str] = None,
+    metrics: Optional[MetricsRegistry] = None,
+):
     """
     Handles the interactive menu for Pylint analysis.
 
     Args:
         path (str): Path to analyze with Pylint.
+        configuration (Optional[str]): Optional rcfile path.
+        socket_path (Optional[str]): Unix socket of a pylens server to analyze through.
+        profile (bool): Whether to time every file and show the slowest ones in the summary.
+        snapshot (Optional[Snapshot]): Previously saved results to browse instead of running Pylint.
+        snapshot_file (Optional[str]): File to save the results of every run to.
+        metrics (Optional[MetricsRegistry]): Registry to export the metrics of every run to.
     """
-    while True:
-        clear_screen()
+    initial = None
+    if snapshot is not None:
+        initial = PylintRun.model_construct(
+            results=snapshot.pylint_results,
+            overall_score=snapshot.overall_score,
+            aggregates=snapshot.aggregates,
+            run_stats=snapshot.run_stats,
+        )
+    analysis = BackgroundAnalysis(
+        lambda: analyze_run(
+            path, configuration, socket_path, profile, notify=analysis.notify
+        ),
+        initial=initial,
+        initial_time=snapshot.created_at if snapshot else 0.0,
+    )
+
+    clear_screen()
+    if snapshot is not None:
+        console.print(f"[bold green]Loaded Pylint snapshot of: {path}[/bold green]")
+    else:
         console.print(f"[bold green]Running Pylint on: {path}[/bold green]")
+    if configuration:
+        console.print(f"Using configuration file: {configuration}")
+    if initial is None:
+        analysis.start()
+        analysis.wait()
 
-        # Run pylint and get the results
-        results, overall_score = run_pylint(paths=[path], configuration=configuration)
+    # Interactive menu, browses the latest completed results while reruns happen in the background
+    seen_generation = 0
+    recorded_at = None
+    # Filled in from the first run below, the loop returns before using them otherwise
+    results: List[PylintResult] = []
+    overall_score: Optional[float] = None
+    aggregates = IssueAggregates(tool="pylint")
+    file_seconds: Dict[str, float] = {}
+    file_mapping: Dict[int, str] = {}
+    while True:
+        generation, run, finished_at = analysis.latest()
+        if run is None:
+            console.print(f"[bold red]Pylint analysis failed: {analysis.error()}[/bold red]")
+            return
 
-        # Check for no issues
-        if not results:
-            console.print(
-                f"[bold green]No issues detected! Code quality looks perfect![/bold green]"
-            )
-            break
+        if generation != seen_generation:
+            # New results landed, swap them in as a whole
+            seen_generation = generation
+            results = run.results
+            overall_score = run.overall_score
+            aggregates = run.aggregates
+            file_seconds = run.run_stats.file_seconds
+            if snapshot_file and (snapshot is None or generation > 1):
+                save_run_snapshot(snapshot_file, run, path, configuration, finished_at)
+            # A recheck keeps the time of its run, it isn't a run of its own
+            if metrics is not None and finished_at != recorded_at:
+                recorded_at = finished_at
+                metrics.record(
+                    collect_metrics(
+                        "pylint",
+                        path,
+                        results,
+                        run.run_stats,
+                        overall_score,
+                        finished_at=finished_at,
+                    )
+                )
+
+            if run.run_stats.timed_out:
+                console.print(
+                    "[bold red]Pylint timed out, the results (and score) are incomplete.[/bold red]"
+                )
+
+            # Check for no issues
+            if not results:
+                console.print(
+                    "[bold green]No issues detected! Code quality looks perfect![/bold green]"
+                )
+                return
 
-        # Display only the summary and overall score initially
-        console.print("\n[bold cyan]Pylint Summary[/bold cyan]")
-        file_mapping = format_summary(results, overall_score, with_numbering=True)
+            if generation > 1:
+                console.print("\n[bold green]New results loaded.[/bold green]")
 
-        # Interactive menu
+            # Display only the summary and overall score initially
+            console.print("\n[bold cyan]Pylint Summary[/bold cyan]")
+            file_mapping = format_summary(results, overall_score, with_numbering=True)
+            if file_seconds:
+                format_slowest_files(file_seconds)
+
+        console.print(f"\n{analysis.status()}")
         console.print("\n[bold cyan]Options:[/bold cyan]")
         console.print(
             "[bold magenta]1.[/bold magenta] Show detailed results for a specific file"
         )
         console.print("[bold magenta]2.[/bold magenta] Show summary again")
         console.print("[bold magenta]3.[/bold magenta] Show all detailed results")
-        console.print("[bold magenta]4.[/bold magenta] Rerun analysis")
+        console.print("[bold magenta]4.[/bold magenta] Rerun analysis (in the background)")
         console.print("[bold magenta]5.[/bold magenta] Quit")
+        console.print("[bold magenta]6.[/bold magenta] Show top 20 codes")
+        console.print("[bold magenta]7.[/bold magenta] Show worst 20 files")
+        console.print("[bold magenta]8.[/bold magenta] Show worst 20 directories")
 
-        choice = Prompt.ask("\nEnter your choice", choices=["1", "2", "3", "4", "5"])
+        choice = Prompt.ask("\nEnter your choice", choices=[str(i) for i in range(1, 9)])
 
         if choice == "1":
             file_choice = Prompt.ask(
@@ -62,18 +291,50 @@ def run_pylint_menu(path: str, configuration: Optional[str] = None):
             )
             clear_screen()
             selected_file = file_mapping[int(file_choice)]
-            detailed_result = [res for res in results if res.file == selected_file]
+            detailed_result = [
+                res for res in results if (res.path or res.file) == selected_file
+            ]
             if detailed_result:
                 console.print(
                     f"\n[bold cyan]Detailed Results for {selected_file}[/bold cyan]"
                 )
                 format_detailed_results(detailed_result)
-            input("\nPress Enter to return to the menu...")
+            action = Prompt.ask(
+                "\nPress Enter to return to the menu, or 'r' to recheck this file",
+                default="",
+                show_default=False,
+            )
+            if action.strip().lower() == "r":
+                console.print(f"[bold green]Rechecking {selected_file}...[/bold green]")
+                try:
+                    rechecked = recheck_file(
+                        run, selected_file, configuration, socket_path
+                    )
+                except (OSError, RuntimeError) as error:
+                    console.print(
+                        f"[bold red]Recheck failed, the results are unchanged: {error}[/bold red]"
+                    )
+                    continue
+                if rechecked is None:
+                    console.print(
+                        "[bold yellow]The file's path is unknown, rerun the analysis instead.[/bold yellow]"
+                    )
+                elif analysis.replace_latest(generation, rechecked):
+                    console.print(
+                        "[dim]The overall score was updated incrementally, "
+                        "rerun the analysis for the exact value.[/dim]"
+                    )
+                else:
+                    console.print(
+                        "[bold yellow]Newer results landed in the meantime, the recheck was discarded.[/bold yellow]"
+                    )
 
         elif choice == "2":
             clear_screen()
             console.print("\n[bold cyan]Pylint Summary[/bold cyan]")
             format_summary(results, overall_score, with_numbering=True)
+            if file_seconds:
+                format_slowest_files(file_seconds)
 
         elif choice == "3":
             clear_screen()
@@ -82,8 +343,26 @@ def run_pylint_menu(path: str, configuration: Optional[str] = None):
             input("\nPress Enter to return to the menu...")
 
         elif choice == "4":
-            continue  # Rerun the analysis
+            # Keep browsing the current results while the rerun is in progress
+            if analysis.start():
+                console.print(
+                    "[bold green]Reanalysis started in the background.[/bold green]"
+                )
+            else:
+                console.print("[bold yellow]A reanalysis is already running.[/bold yellow]")
 
         elif choice == "5":
             console.print("[bold green]Exiting...[/bold green]")
-            break
+            return
+
+        elif choice == "6":
+            clear_screen()
+            format_top_codes(aggregates)
+
+        elif choice == "7":
+            clear_screen()
+            format_worst_files(aggregates)
+
+        elif choice == "8":
+            clear_screen()
+            format_worst_directories(aggregates)
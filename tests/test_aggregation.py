@@ -0,0 +1,73 @@
+"""
+tests/test_aggregation.py
+
+Tests of the "top offenders" histograms, built from scratch and updated incrementally.
+"""
+
+from tool.aggregation import (
+    aggregate_mypy,
+    aggregate_pylint,
+    top_entries,
+    update_aggregates,
+)
+from tool.mypy_runner import parse_mypy_output
+from tool.pylint_runner import parse_pylint_output
+
+PYLINT_OUTPUT = "\n".join(
+    [
+        "************* Module a",
+        "pkg/a.py:1:0: C0114: Missing module docstring (missing-module-docstring)",
+        "pkg/a.py:5:4: W0702: No exception type(s) specified (bare-except)",
+        "************* Module b",
+        "pkg/sub/b.py:1:0: C0114: Missing module docstring (missing-module-docstring)",
+        "",
+        "Your code has been rated at 8.00/10",
+    ]
+)
+
+MYPY_OUTPUT = "\n".join(
+    [
+        'pkg/a.py:3:5:3:9: error: Name "nope" is not defined  [name-defined]',
+        'pkg/a.py:3:5:3:9: note: Did you mean "none"?',
+        "pkg/b.py:7:1:7:4: error: Missing return statement  [return]",
+        "Found 2 errors in 2 files (checked 2 source files)",
+    ]
+)
+
+
+def test_aggregate_pylint():
+    results, _ = parse_pylint_output(PYLINT_OUTPUT)
+    aggregates = aggregate_pylint(results)
+
+    assert aggregates.total == 3
+    assert aggregates.by_code == {"C0114": 2, "W0702": 1}
+    assert aggregates.code_labels["W0702"] == "bare-except"
+    assert aggregates.by_directory == {"pkg": 2, "pkg/sub": 1}
+    assert top_entries(aggregates.by_code, limit=1) == [("C0114", 2)]
+
+
+def test_aggregate_mypy_counts_notes_apart():
+    aggregates = aggregate_mypy(parse_mypy_output(MYPY_OUTPUT))
+
+    assert aggregates.total == 3
+    assert aggregates.by_code == {"name-defined": 1, "note": 1, "return": 1}
+    assert aggregates.by_file == {"pkg/a.py": 2, "pkg/b.py": 1}
+
+
+def test_top_entries_breaks_ties_by_name():
+    assert top_entries({"b": 2, "a": 2, "c": 5}) == [("c", 5), ("a", 2), ("b", 2)]
+
+
+def test_update_aggregates_matches_a_full_aggregation():
+    results, _ = parse_pylint_output(PYLINT_OUTPUT)
+    aggregates = aggregate_pylint(results)
+    # pkg/a.py got its docstring, the bare except is still there
+    fixed = results[0].model_copy(update={"issues": results[0].issues[1:]})
+
+    updated = update_aggregates(
+        aggregates, aggregate_pylint([results[0]]), aggregate_pylint([fixed])
+    )
+
+    assert updated == aggregate_pylint([fixed, results[1]])
+    # The given histograms are left untouched
+    assert aggregates.by_code["C0114"] == 2
@@ -0,0 +1,73 @@
+"""
+tests/test_governor.py
+
+Tests of running the analysis subprocesses within resource limits.
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import pytest
+from tool import governor
+from tool.governor import ResourceLimits, apply_limits, run_governed
+
+
+@pytest.fixture(name="sleeper")
+def fixture_sleeper():
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    yield process
+    process.kill()
+    process.wait()
+
+
+def test_run_governed_captures_the_output():
+    result = run_governed(
+        [sys.executable, "-c", "import sys; print('out'); sys.exit(3)"],
+        ResourceLimits(),
+    )
+
+    assert (result.returncode, result.stdout, result.timed_out) == (3, "out\n", False)
+
+
+def test_run_governed_kills_processes_that_time_out():
+    result = run_governed(
+        [sys.executable, "-c", "import time; print('started', flush=True); time.sleep(30)"],
+        ResourceLimits(timeout=0.5),
+    )
+
+    assert result.timed_out
+    assert result.returncode is None
+    # What was written before the timeout is kept
+    assert result.stdout == "started\n"
+    assert result.seconds < 10
+
+
+def test_apply_limits_limits_the_address_space(sleeper):
+    apply_limits(sleeper.pid, ResourceLimits(memory_mb=4096))
+    assert resource.prlimit(sleeper.pid, resource.RLIMIT_AS)[0] == 4096 * 1024 * 1024
+
+
+def test_apply_limits_leaves_the_address_space_to_the_cgroup(sleeper):
+    before = resource.prlimit(sleeper.pid, resource.RLIMIT_AS)
+
+    apply_limits(sleeper.pid, ResourceLimits(memory_mb=4096), address_space=False)
+
+    assert resource.prlimit(sleeper.pid, resource.RLIMIT_AS) == before
+
+
+def test_processes_in_a_cgroup_get_no_address_space_limit(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setenv("PYLENS_CGROUP", str(tmp_path))
+    monkeypatch.setattr(governor, "_remove_cgroup", lambda cgroup: None)
+    monkeypatch.setattr(
+        governor, "apply_limits", lambda pid, limits, address_space: calls.append(address_space)
+    )
+
+    result = run_governed([sys.executable, "-c", "pass"], ResourceLimits(memory_mb=512))
+
+    (cgroup,) = os.listdir(tmp_path)
+    assert (tmp_path / cgroup / "memory.max").read_text() == str(512 * 1024 * 1024)
+    assert (tmp_path / cgroup / "cgroup.procs").read_text().isdigit()
+    assert result.returncode == 0
+    assert calls == [False]
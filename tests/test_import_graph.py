@@ -0,0 +1,98 @@
+"""
+tests/test_import_graph.py
+
+Tests of the static import graph and of splitting it into groups that Mypy
+processes can check in parallel.
+"""
+
+import os
+from tool.import_graph import balance_groups, build_import_graph, connected_components
+from tool.mypy_cache import MypyCacheStats, merge_cache_stats
+from tool.mypy_parallel import is_excluded, plan_mypy_groups
+
+SOURCES = {
+    "svc_a/__init__.py": "",
+    "svc_a/a.py": "from . import b\n",
+    "svc_a/b.py": "import json\n",
+    "svc_b/__init__.py": "from svc_b.settings import DEBUG\n",
+    "svc_b/c.py": "VALUE = 1\n",
+    "svc_b/settings.py": "DEBUG = False\n",
+    "tools/script.py": "from svc_a import a\n",
+    "build/generated.py": "import svc_b\n",
+}
+
+
+def _write_project(root):
+    for file, source in SOURCES.items():
+        os.makedirs(os.path.join(root, os.path.dirname(file)), exist_ok=True)
+        with open(os.path.join(root, file), "w", encoding="utf-8") as source_file:
+            source_file.write(source)
+
+
+def test_modules_depend_on_their_package(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write_project(".")
+    files = [os.path.join(*file.split("/")) for file in SOURCES]
+
+    graph = build_import_graph(files)
+
+    assert graph[os.path.join("svc_a", "a.py")] == {
+        os.path.join("svc_a", "__init__.py"),
+        os.path.join("svc_a", "b.py"),
+    }
+    # c.py imports nothing, yet its package's __init__ runs first
+    assert graph[os.path.join("svc_b", "c.py")] == {os.path.join("svc_b", "__init__.py")}
+    assert graph[os.path.join("tools", "script.py")] == {
+        os.path.join("svc_a", "__init__.py"),
+        os.path.join("svc_a", "a.py"),
+    }
+    assert [len(component) for component in connected_components(graph)] == [4, 4]
+
+
+def test_balance_groups_never_splits_components():
+    components = [["a1", "a2"], ["b1"], ["c1", "c2", "c3"], ["d1"]]
+    costs = {"a1": 3.0, "a2": 3.0, "b1": 5.0, "c1": 1.0, "c2": 1.0, "c3": 1.0, "d1": 1.0}
+
+    # a (6) and b (5) start the groups, c (3) joins the cheaper b, then d (1) joins a
+    assert balance_groups(components, costs, 2) == [
+        ["b1", "c1", "c2", "c3"],
+        ["a1", "a2", "d1"],
+    ]
+    # More jobs than components leaves no empty group
+    assert len(balance_groups(components, costs, 8)) == 4
+    assert balance_groups(components, costs, 1) == [sorted(costs)]
+
+
+def test_plan_mypy_groups_leaves_excluded_files_out(tmp_path, monkeypatch):
+    monkeypatch.delenv("PYLENS_CACHE_DIR", raising=False)
+    monkeypatch.chdir(tmp_path)
+    _write_project("project")
+
+    assert is_excluded("project", "project/build/generated.py", ["^project/build/$"])
+    assert not is_excluded("project", "project/svc_b/c.py", ["^project/build/$"])
+
+    groups = plan_mypy_groups("project", 4, ["/build/", r"script\.py$"])
+
+    assert sorted(len(group) for group in groups) == [3, 3]
+    assert all("build" not in file and "script" not in file for g in groups for file in g)
+
+
+def test_merge_cache_stats_counts_shared_modules_once():
+    first = MypyCacheStats(
+        cache_dir="cache",
+        modules=3,
+        reused=2,
+        graph_modules=frozenset({"builtins", "os", "svc_a"}),
+        stale_modules=frozenset({"svc_a"}),
+    )
+    second = MypyCacheStats(
+        cache_dir="cache",
+        modules=3,
+        reused=3,
+        graph_modules=frozenset({"builtins", "os", "svc_b"}),
+    )
+
+    merged = merge_cache_stats("cache", [first, second])
+
+    assert (merged.modules, merged.reused) == (4, 3)
+    assert "graph_modules" not in merged.model_dump()
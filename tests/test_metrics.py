@@ -0,0 +1,75 @@
+"""
+tests/test_metrics.py
+
+Tests of the run summaries and their OpenMetrics exposition.
+"""
+
+from tool.metrics import MetricsRegistry, collect_metrics, render_metrics
+from tool.mypy_cache import MypyCacheStats
+from tool.pylint_runner import parse_pylint_output
+from tool.run_stats import RunStats
+
+PYLINT_OUTPUT = "\n".join(
+    [
+        "************* Module a",
+        "src/a.py:1:0: C0114: Missing module docstring (missing-module-docstring)",
+        "src/a.py:5:4: W0702: No exception type(s) specified (bare-except)",
+        "",
+        "Your code has been rated at 8.00/10",
+    ]
+)
+
+
+def test_collect_metrics_normalizes_the_path():
+    results, overall_score = parse_pylint_output(PYLINT_OUTPUT)
+    metrics = collect_metrics("pylint", "./src/", results, None, overall_score, 5.0)
+
+    assert metrics.path == "src"
+    assert metrics.issues["Convention"] == 1
+    assert metrics.issues["Warning"] == 1
+    assert metrics.files_with_issues == 1
+    assert metrics.finished_at == 5.0
+
+
+def test_render_metrics():
+    results, overall_score = parse_pylint_output(PYLINT_OUTPUT)
+    run_stats = RunStats(
+        tool="mypy",
+        files_analyzed=3,
+        phase_seconds={"run": 1.5, "parse": 0.25},
+        cache=MypyCacheStats(cache_dir="/tmp/cache", modules=4, reused=3),
+    )
+    text = render_metrics(
+        [
+            collect_metrics("pylint", 'odd "dir"', results, None, overall_score, 10.0),
+            collect_metrics("mypy", "src", [], run_stats, finished_at=20.0),
+        ]
+    )
+    lines = text.splitlines()
+
+    assert 'pylens_issues{tool="pylint",path="odd \\"dir\\"",category="Warning"} 1' in lines
+    assert 'pylens_pylint_score{tool="pylint",path="odd \\"dir\\""} 8.0' in lines
+    assert 'pylens_run_duration_seconds{tool="mypy",path="src"} 1.75' in lines
+    assert 'pylens_phase_duration_seconds{tool="mypy",path="src",phase="parse"} 0.25' in lines
+    assert 'pylens_cache_hit_ratio{tool="mypy",path="src"} 0.75' in lines
+    assert 'pylens_run_timed_out{tool="mypy",path="src"} 0' in lines
+    # Every family is announced once, before its samples
+    assert lines.count("# TYPE pylens_files_with_issues gauge") == 1
+    assert lines.index("# UNIT pylens_run_duration_seconds seconds") < lines.index(
+        'pylens_run_duration_seconds{tool="mypy",path="src"} 1.75'
+    )
+    assert lines[-1] == "# EOF"
+
+
+def test_registry_keeps_the_latest_run_per_tool_and_path(tmp_path):
+    textfile = tmp_path / "pylens.prom"
+    registry = MetricsRegistry(textfile=str(textfile))
+    results, _ = parse_pylint_output(PYLINT_OUTPUT)
+
+    registry.record(collect_metrics("pylint", "src", results, None, 8.0, 1.0))
+    registry.record(collect_metrics("pylint", "./src", [], None, 10.0, 2.0))
+
+    text = textfile.read_text(encoding="utf-8")
+    assert text == registry.render()
+    assert 'pylens_pylint_score{tool="pylint",path="src"} 10.0' in text
+    assert "pylens_issues{" not in text
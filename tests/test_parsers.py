@@ -0,0 +1,220 @@
+"""
+tests/test_parsers.py
+
+Regression tests of the Pylint and Mypy output parsers, on output captured from
+real runs (mostly over testing/), and of the models they build.
+"""
+
+from tool.mypy_runner import CodeLocation, parse_mypy_output
+from tool.pylint_runner import parse_pylint_output, run_pylint
+
+PYLINT_OUTPUT = "\n".join(
+    [
+        "************* Module bad_code1",
+        "testing/bad_code1.py:3:0: C0410: Multiple imports on one line (os, sys) (multiple-imports)",
+        "testing/bad_code1.py:25:4: W0702: No exception type(s) specified (bare-except)",
+        "testing/bad_code1.py:1:0: C0114: Missing module docstring (missing-module-docstring)",
+        "************* Module bad_code3",
+        "testing/bad_code3.py:27:0: R0903: Too few public methods (1/2) (too-few-public-methods)",
+        "",
+        "------------------------------------------------------------------",
+        "Your code has been rated at 7.80/10 (previous run: 7.80/10, +0.00)",
+        "",
+    ]
+)
+
+# Linting src/ recursively: outside packages both util.py files are module "util",
+# and Pylint lists them under a single header.
+PYLINT_SAME_MODULE_OUTPUT = "\n".join(
+    [
+        "************* Module util",
+        "src/d2/util.py:1:0: C0114: Missing module docstring (missing-module-docstring)",
+        "src/d2/util.py:1:0: C0116: Missing function or method docstring (missing-function-docstring)",
+        "src/d1/util.py:1:0: C0114: Missing module docstring (missing-module-docstring)",
+        "src/d1/util.py:1:0: W0611: Unused import os (unused-import)",
+        "",
+        "------------------------------------------------------------------",
+        "Your code has been rated at 0.00/10 (previous run: 0.00/10, +0.00)",
+        "",
+    ]
+)
+
+# `mypy --pretty` wraps long messages, sometimes leaving the error code alone on
+# the next line (with a trailing space on the previous one), and prints the
+# source line with a caret below an issue.
+MYPY_OUTPUT = "\n".join(
+    [
+        'testing/bad_code3.py: note: In function "unsafe_casting":',
+        'testing/bad_code3.py:19:26:19:26: error: Function "builtins.any" is not valid',
+        "as a type  [valid-type]",
+        '    def unsafe_casting(data: any) -> str:  # "any" used carelessly',
+        "                             ^",
+        'testing/bad_code3.py:19:26:19:26: note: Perhaps you meant "typing.Any" instead of "any"?',
+        'testing/bad_code3.py:20:12:20:21: error: any? has no attribute "upper" ',
+        "[attr-defined]",
+        "        return data.upper()  # Assumes data is a string, but no check",
+        "               ^~~~~~~~~~",
+        'testing/bad_code1.py: note: In member "__init__" of class "Circle":',
+        "testing/bad_code1.py:7:5:8:28: error: Function is missing a type annotation ",
+        "[no-untyped-def]",
+        "        def __init__(self, radius):",
+        "        ^",
+        "Found 3 errors in 2 files (checked 3 source files)",
+        "",
+    ]
+)
+
+
+# Captured from `MYPY_FORCE_TERMINAL_WIDTH=78 mypy --strict --pretty ...` (the
+# MYPY_FLAGS): a message that fills the width exactly wraps the space before its
+# error code too, leaving an indented " [valid-type]" line.
+MYPY_WRAPPED_CODE_OUTPUT = "\n".join(
+    [
+        'vt.py: note: In function "handler":',
+        'vt.py:6:29:6:32: error: Missing type arguments for generic type "Dict" ',
+        "[type-arg]",
+        "    def handler(callbacks: List[Dict], value: alias_for_something_else) ...",
+        "                                ^~~~",
+        'vt.py:6:43:6:66: error: Name "alias_for_something_else" is not defined; did',
+        'you mean "alias_for_something"?  [name-defined]',
+        "    def handler(callbacks: List[Dict], value: alias_for_something_else) ...",
+        "                                              ^~~~~~~~~~~~~~~~~~~~~~~~",
+        'vt.py:6:72:6:75: error: Missing type arguments for generic type "List" ',
+        "[type-arg]",
+        "    ...ler(callbacks: List[Dict], value: alias_for_something_else) -> List:",
+        "                                                                      ^~~~",
+        'vt.py: note: In function "convert":',
+        'vt.py:10:43:10:43: error: Function "builtins.int.real" is not valid as a type',
+        " [valid-type]",
+        '    def convert(item: alias_for_something) -> "alias_for_something.real"...',
+        "                                              ^",
+        'vt.py:10:43:10:43: note: Perhaps you need "Callable[...]" or a callback protocol?',
+        'vt.py: note: In function "use":',
+        'vt.py:17:14:17:14: error: Variable "vt.variable_not_a_type" is not valid as a',
+        "type  [valid-type]",
+        "    def use(arg: variable_not_a_type) -> None:",
+        "                 ^",
+        "vt.py:17:14:17:14: note: See https://mypy.readthedocs.io/en/stable/common_issues.html#variables-vs-type-aliases",
+        "Found 5 errors in 1 file (checked 1 source file)",
+    ]
+)
+
+
+def test_pylint_output():
+    results, overall_score = parse_pylint_output(PYLINT_OUTPUT)
+
+    assert overall_score == 7.8
+    assert [result.file for result in results] == ["bad_code1.py", "bad_code3.py"]
+    assert [result.path for result in results] == [
+        "testing/bad_code1.py",
+        "testing/bad_code3.py",
+    ]
+
+    issues = results[0].issues
+    assert [issue.line for issue in issues] == [1, 3, 25]
+    # Parentheses inside the message don't end it, only the trailing symbol does
+    assert issues[1].message == "Multiple imports on one line (os, sys)"
+    assert issues[1].symbol == "multiple-imports"
+    assert issues[2].category == "Warning"
+    assert issues[2].code == "W0702"
+    assert results[0].message_counts["Convention"] == 2
+    assert results[1].issues[0].message == "Too few public methods (1/2)"
+
+
+def test_pylint_results_are_keyed_by_path():
+    results, _ = parse_pylint_output(PYLINT_SAME_MODULE_OUTPUT)
+
+    assert [(result.file, result.path) for result in results] == [
+        ("util.py", "src/d2/util.py"),
+        ("util.py", "src/d1/util.py"),
+    ]
+    assert results[0].message_counts["Convention"] == 2
+    assert [issue.symbol for issue in results[1].issues] == [
+        "missing-module-docstring",
+        "unused-import",
+    ]
+
+
+def test_recursive_pylint_run_keeps_modules_of_the_same_name_apart(tmp_path, monkeypatch):
+    monkeypatch.delenv("PYLENS_CACHE_DIR", raising=False)
+    monkeypatch.chdir(tmp_path)
+    for directory, source in (("d1", "import os\n"), ("d2", "def f():\n    pass\n")):
+        (tmp_path / "src" / directory).mkdir(parents=True)
+        (tmp_path / "src" / directory / "util.py").write_text(source, encoding="utf-8")
+
+    results, _ = run_pylint(["src"])
+
+    assert sorted(result.path for result in results) == ["src/d1/util.py", "src/d2/util.py"]
+    by_path = {result.path: result for result in results}
+    assert by_path["src/d1/util.py"].message_counts["Warning"] == 1
+    assert by_path["src/d2/util.py"].message_counts["Warning"] == 0
+
+
+def test_mypy_pretty_output():
+    results = parse_mypy_output(MYPY_OUTPUT)
+
+    assert [result.file for result in results] == [
+        "testing/bad_code3.py",
+        "testing/bad_code1.py",
+    ]
+
+    error, note, wrapped = results[0].issues
+    assert error.message == 'error: Function "builtins.any" is not valid as a type'
+    assert error.error_code == "valid-type"
+    assert error.issue_location_start == CodeLocation(line=19, column=26)
+    # The source line is dedented, the caret keeps pointing at the same column
+    assert error.code_expression == (
+        'def unsafe_casting(data: any) -> str:  # "any" used carelessly\n'
+        "                         ^"
+    )
+    assert note.category == "Note"
+    assert note.message == 'note: Perhaps you meant "typing.Any" instead of "any"?'
+    assert note.code_expression is None
+    assert note.error_code is None
+    assert wrapped.message == 'error: any? has no attribute "upper"'
+    assert wrapped.error_code == "attr-defined"
+    assert wrapped.issue_location_end == CodeLocation(line=20, column=21)
+
+    # The "In member ..." context line isn't an issue of its own
+    (issue,) = results[1].issues
+    assert issue.issue_location_end == CodeLocation(line=8, column=28)
+    assert issue.code_expression == "def __init__(self, radius):\n^"
+    assert results[1].message_counts == {"Error": 1, "Note": 0, "Unknown": 0}
+
+
+def test_mypy_wrapped_error_codes():
+    (result,) = parse_mypy_output(MYPY_WRAPPED_CODE_OUTPUT)
+
+    assert [issue.error_code for issue in result.issues] == [
+        "type-arg",
+        "name-defined",
+        "type-arg",
+        "valid-type",
+        None,
+        "valid-type",
+        None,
+    ]
+    valid_type = result.issues[3]
+    assert valid_type.message == (
+        'error: Function "builtins.int.real" is not valid as a type'
+    )
+    # The caret stays aligned, the code line didn't become part of the source
+    assert valid_type.code_expression == (
+        'def convert(item: alias_for_something) -> "alias_for_something.real"...\n'
+        "                                          ^"
+    )
+    assert result.issues[0].message == (
+        'error: Missing type arguments for generic type "Dict"'
+    )
+    assert result.message_counts == {"Error": 5, "Note": 2, "Unknown": 0}
+
+def test_parsed_models_are_mutable():
+    pylint_issue = parse_pylint_output(PYLINT_OUTPUT)[0][0].issues[0]
+    pylint_issue.message = "Edited"
+    assert pylint_issue.message == "Edited"
+    assert pylint_issue.model_copy(update={"line": 2}).line == 2
+
+    mypy_issue = parse_mypy_output(MYPY_OUTPUT)[0].issues[0]
+    mypy_issue.message = "error: Edited"
+    assert mypy_issue.model_copy(update={"category": "Note"}).category == "Note"
+    assert "message" in mypy_issue.model_fields_set
@@ -0,0 +1,88 @@
+"""
+tests/test_profiling.py
+
+Tests of the per-file cost attribution and of how cost profiles are used.
+"""
+
+import os
+import pytest
+from tool import pylint_runner
+from tool.profiling import (
+    CostProfile,
+    bisect_costs,
+    load_cost_profile,
+    order_by_cost,
+    save_cost_profile,
+)
+from tool.pylint_runner import pylint_targets
+
+COSTS = {"a.py": 0.1, "b.py": 6.0, "c.py": 0.1, "d.py": 0.2}
+
+
+def _run_shard(shard):
+    return 0.5 + sum(COSTS[file] for file in shard)
+
+
+def test_bisect_costs_isolates_the_expensive_file():
+    file_seconds = bisect_costs(list(COSTS), _run_shard, overhead=0.5)
+
+    assert file_seconds["b.py"] == 6.0
+    # Cheap shards aren't split further, their cost is spread evenly
+    assert file_seconds["c.py"] == file_seconds["d.py"] == pytest.approx(0.15)
+    assert sum(file_seconds.values()) == pytest.approx(sum(COSTS.values()))
+
+
+def test_bisect_costs_stops_at_the_run_budget():
+    runs = []
+    file_seconds = bisect_costs(
+        list(COSTS), lambda shard: runs.append(shard) or 8.0, max_runs=1
+    )
+
+    # The halves left untimed inherit the average of their parent
+    assert len(runs) == 1
+    assert file_seconds == {file: 2.0 for file in COSTS}
+
+
+def test_order_by_cost_puts_unknown_files_at_the_average():
+    profile = CostProfile(tool="pylint", file_seconds={"a.py": 3.0, "b.py": 1.0})
+
+    assert order_by_cost(["b.py", "new.py", "./a.py"], profile) == [
+        "./a.py",
+        "new.py",
+        "b.py",
+    ]
+    assert order_by_cost(["b.py", "a.py"], None) == ["b.py", "a.py"]
+
+
+def test_profiles_are_only_written_when_saved(tmp_path, monkeypatch):
+    monkeypatch.delenv("PYLENS_CACHE_DIR", raising=False)
+    monkeypatch.chdir(tmp_path)
+    open("pyproject.toml", "w", encoding="utf-8").close()
+    os.mkdir("pkg")
+
+    assert load_cost_profile("pkg", "pylint") is None
+    assert pylint_targets("pkg") == ["pkg/**/*.py"]
+    assert not os.path.exists(".pylens_cache")
+
+    save_cost_profile("pkg", CostProfile(tool="pylint", file_seconds={"pkg/a.py": 1.0}))
+    assert load_cost_profile("pkg", "pylint").file_seconds == {"pkg/a.py": 1.0}
+
+
+def test_pylint_targets_lists_only_the_most_expensive_files(tmp_path, monkeypatch):
+    monkeypatch.delenv("PYLENS_CACHE_DIR", raising=False)
+    monkeypatch.setattr(pylint_runner, "EXPENSIVE_FILES_FIRST", 2)
+    monkeypatch.chdir(tmp_path)
+    open("pyproject.toml", "w", encoding="utf-8").close()
+    os.makedirs("pkg/sub")
+    for file in ("pkg/a.py", "pkg/b.py", "pkg/sub/c.py"):
+        open(file, "w", encoding="utf-8").close()
+    save_cost_profile(
+        "pkg",
+        CostProfile(
+            tool="pylint",
+            file_seconds={"pkg/a.py": 1.0, "pkg/b.py": 0.1, "pkg/sub/c.py": 2.0},
+        ),
+    )
+
+    assert pylint_targets("pkg") == ["pkg/sub/c.py", "pkg/a.py", "pkg/**/*.py"]
+    assert pylint_targets("pkg/b.py") == ["pkg/b.py"]
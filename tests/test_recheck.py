@@ -0,0 +1,59 @@
+"""
+tests/test_recheck.py
+
+Tests of splicing a rechecked file into the results of a run, and of the
+incremental Pylint score.
+"""
+
+from tool.pylint_runner import PylintIssue, PylintResult
+from tool.recheck import find_result, rescore_pylint, splice_results
+
+
+def _result(file, path, categories):
+    issues = [
+        PylintIssue(line=line, category=category, message="Message")
+        for line, category in enumerate(categories, start=1)
+    ]
+    counts = {
+        category: categories.count(category)
+        for category in ("Convention", "Refactor", "Warning", "Error", "Fatal")
+    }
+    return PylintResult(file=file, path=path, issues=issues, message_counts=counts)
+
+
+def test_find_and_splice_keep_the_order_of_the_files():
+    first = _result("a", "pkg/a.py", ["Convention"])
+    second = _result("b", "pkg/b.py", ["Warning"])
+    third = _result("c", "pkg/c.py", ["Error"])
+    results = [first, second, third]
+
+    assert find_result(results, "./pkg/b.py") is second
+    assert find_result(results, "pkg/d.py") is None
+
+    fixed = _result("b", "pkg/b.py", ["Convention"])
+    assert splice_results(results, second, fixed) == [first, fixed, third]
+    # A file without issues left drops out of the results
+    assert splice_results(results, second, None) == [first, third]
+    assert results == [first, second, third]
+
+
+def test_rescore_pylint_derives_the_statement_count_from_the_score():
+    old = _result("a", "pkg/a.py", ["Convention", "Convention"])
+    results = [old, _result("b", "pkg/b.py", ["Warning"])]
+
+    # A penalty of 3 for a score of 7.0: 10 statements
+    one_left = _result("a", "pkg/a.py", ["Convention"])
+    assert rescore_pylint(7.0, results, old, one_left) == 8.0
+    assert rescore_pylint(7.0, results, old, None) == 9.0
+    worse = _result("a", "pkg/a.py", ["Error", "Error"])
+    assert rescore_pylint(7.0, results, old, worse) == 0.0
+
+
+def test_rescore_pylint_keeps_scores_it_cannot_estimate():
+    old = _result("a", "pkg/a.py", ["Convention"])
+    fatal = _result("b", "pkg/b.py", ["Fatal"])
+
+    # The score of a run with a fatal message, or a clamped one, hides the statement count
+    assert rescore_pylint(6.5, [old, fatal], old, None) == 6.5
+    assert rescore_pylint(0.0, [old], old, None) == 0.0
+    assert rescore_pylint(10.0, [], old, None) == 10.0
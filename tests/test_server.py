@@ -0,0 +1,75 @@
+"""
+tests/test_server.py
+
+Tests of the server's memo: when a warm worker answers from memory, and when
+it runs the tool again.
+"""
+
+import os
+from tool.protocol import AnalysisRequest, AnalysisResponse
+from tool.server import MEMO_SIZE, _Analyzer
+
+
+class CountingAnalyzer(_Analyzer):
+    """Counts the runs, and reports a fixed set of files as loaded by the tool."""
+
+    def __init__(self, loaded_files):
+        super().__init__()
+        self.loaded_files = loaded_files
+        self.runs = 0
+        self.invalidated = []
+
+    def invalidate(self, changed_files, layout_changed):
+        self.invalidated.append((changed_files, layout_changed))
+
+    def run(self, request):
+        self.runs += 1
+        return AnalysisResponse(ok=True, overall_score=float(self.runs)), self.loaded_files
+
+
+def _touch(path, content):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(content)
+
+
+def test_memo_follows_files_loaded_outside_the_tree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("project")
+    os.mkdir("library")
+    _touch("project/main.py", "import lib\n")
+    _touch("library/lib.py", "VALUE = 1\n")
+    analyzer = CountingAnalyzer([str(tmp_path / "library" / "lib.py")])
+    request = AnalysisRequest(tool="pylint", path="project", cwd=str(tmp_path))
+
+    assert not analyzer.analyze(request).cached
+    assert analyzer.analyze(request).cached
+
+    # An edit outside the analyzed path still reaches the tool
+    _touch("library/lib.py", "VALUE = 'one'\n")
+    assert not analyzer.analyze(request).cached
+    assert analyzer.invalidated[-1] == ({str(tmp_path / "library" / "lib.py")}, False)
+
+    # So does any other field of the request
+    assert not analyzer.analyze(request.model_copy(update={"configuration": "rc"})).cached
+
+    _touch("project/new.py", "")
+    analyzer.analyze(request)
+    assert analyzer.invalidated[-1][1]
+    assert analyzer.runs == 4
+
+
+def test_memo_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    analyzer = CountingAnalyzer([])
+    requests = []
+    for index in range(MEMO_SIZE + 1):
+        os.mkdir(f"project{index}")
+        requests.append(
+            AnalysisRequest(tool="mypy", path=f"project{index}", cwd=str(tmp_path))
+        )
+        analyzer.analyze(requests[-1])
+
+    # The least recently used path was dropped, the most recent one is still there
+    assert analyzer.analyze(requests[-1]).cached
+    assert not analyzer.analyze(requests[0]).cached
+    assert analyzer.runs == MEMO_SIZE + 2
@@ -0,0 +1,128 @@
+"""
+tests/test_snapshot.py
+
+Tests of saving results into a binary snapshot and loading them back.
+"""
+
+import struct
+import zlib
+import pytest
+from tool.aggregation import aggregate_mypy, aggregate_pylint
+from tool.mypy_runner import parse_mypy_output
+from tool.pylint_runner import parse_pylint_output
+from tool.run_stats import RunStats
+from tool.snapshot import HEADER, Snapshot, load_snapshot, save_snapshot
+
+PYLINT_OUTPUT = "\n".join(
+    [
+        "************* Module a",
+        "pkg/a.py:1:0: C0114: Missing module docstring (missing-module-docstring)",
+        "pkg/a.py:5:4: W0702: No exception type(s) specified (bare-except)",
+        "************* Module b",
+        "pkg/b.py:3:0: E0401: Unable to import 'nope' (import-error)",
+        "",
+        "Your code has been rated at 5.00/10",
+    ]
+)
+
+MYPY_OUTPUT = "\n".join(
+    [
+        'pkg/a.py:3:5:3:9: error: Name "nope" is not defined  [name-defined]',
+        "    nope()",
+        "    ^~~~",
+        'pkg/a.py:3:5:3:9: note: Did you mean "none"?',
+        "pkg/b.py:7:1:7:4: error: Missing return statement  [return]",
+        "Found 2 errors in 2 files (checked 2 source files)",
+    ]
+)
+
+
+def _pylint_snapshot():
+    results, overall_score = parse_pylint_output(PYLINT_OUTPUT)
+    return Snapshot(
+        tool="pylint",
+        path="pkg",
+        configuration=".pylintrc",
+        created_at=1700000000.0,
+        pylint_results=results,
+        overall_score=overall_score,
+        aggregates=aggregate_pylint(results),
+        run_stats=RunStats(tool="pylint", files_analyzed=2),
+    )
+
+
+def test_pylint_round_trip(tmp_path):
+    snapshot = _pylint_snapshot()
+    save_snapshot(str(tmp_path / "run.snap"), snapshot)
+
+    loaded = load_snapshot(str(tmp_path / "run.snap"))
+
+    assert loaded.model_dump() == snapshot.model_dump()
+    # The lazily built issues dump like any other
+    assert loaded.pylint_results[0].model_dump_json() == (
+        snapshot.pylint_results[0].model_dump_json()
+    )
+
+
+def test_mypy_round_trip(tmp_path):
+    results = parse_mypy_output(MYPY_OUTPUT)
+    snapshot = Snapshot(
+        tool="mypy",
+        path="pkg",
+        created_at=1700000000.0,
+        mypy_results=results,
+        aggregates=aggregate_mypy(results),
+        run_stats=RunStats(tool="mypy"),
+    )
+    save_snapshot(str(tmp_path / "run.snap"), snapshot)
+
+    loaded = load_snapshot(str(tmp_path / "run.snap"))
+
+    assert loaded.mypy_results == results
+    assert loaded.mypy_results[0].issues[0].code_expression == "nope()\n^~~~"
+    assert loaded.model_dump_json() == snapshot.model_dump_json()
+
+
+def _rewrite_body(file, edit):
+    with open(file, "rb") as snapshot_file:
+        data = snapshot_file.read()
+    body = edit(bytearray(zlib.decompress(data[HEADER.size :])))
+    with open(file, "wb") as snapshot_file:
+        snapshot_file.write(data[: HEADER.size] + zlib.compress(bytes(body)))
+
+
+def _drop_last_record(body):
+    return body[:-4]
+
+
+def _reference_a_missing_string(body):
+    body[-4:] = struct.pack("<i", 10**6)
+    return body
+
+
+def _break_the_metadata(body):
+    return body.replace(b'"run_stats"', b'"run_stat_"')
+
+
+@pytest.mark.parametrize(
+    "edit", [_drop_last_record, _reference_a_missing_string, _break_the_metadata]
+)
+def test_corrupted_snapshots_raise_value_errors(tmp_path, edit):
+    file = str(tmp_path / "run.snap")
+    save_snapshot(file, _pylint_snapshot())
+    _rewrite_body(file, edit)
+
+    with pytest.raises(ValueError, match="Corrupted snapshot"):
+        load_snapshot(file)
+
+
+def test_truncated_snapshots_raise_value_errors(tmp_path):
+    file = str(tmp_path / "run.snap")
+    save_snapshot(file, _pylint_snapshot())
+    with open(file, "rb") as snapshot_file:
+        data = snapshot_file.read()
+    with open(file, "wb") as snapshot_file:
+        snapshot_file.write(data[: len(data) // 2])
+
+    with pytest.raises(ValueError, match="Corrupted snapshot"):
+        load_snapshot(file)
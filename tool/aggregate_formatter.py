@@ -0,0 +1,86 @@
+"""
+tool/aggregate_formatter.py
+
+Displays the "top offenders" views (codes, files, directories) of a run,
+based on the precomputed IssueAggregates of aggregation.py.
+"""
+
+from typing import Dict
+from rich.table import Table, box
+from rich.console import Console
+from tool.aggregation import IssueAggregates, top_entries
+
+console = Console()
+
+
+def _format_histogram(
+    title: str,
+    column: str,
+    histogram: Dict[str, int],
+    total: int,
+    labels: Dict[str, str],
+    limit: int,
+):
+    table = Table(
+        title=title, show_header=True, header_style="bold magenta", box=box.ROUNDED
+    )
+    table.add_column("#", justify="right", style="dim")
+    table.add_column(column, style="bold white")
+    table.add_column("Issues", justify="center")
+    table.add_column("Share", justify="center")
+
+    for idx, (key, count) in enumerate(top_entries(histogram, limit), start=1):
+        label = f"{key} ({labels[key]})" if key in labels else key
+        share = f"{count / total:.1%}" if total else "N/A"
+        table.add_row(str(idx), label, str(count), share)
+
+    console.print(table)
+
+
+def format_top_codes(aggregates: IssueAggregates, limit: int = 20):
+    """
+    Displays the message codes with the most issues.
+
+    Args:
+        aggregates (IssueAggregates): The precomputed histograms of the run.
+        limit (int): Number of codes to show.
+    """
+    _format_histogram(
+        f"Top {limit} Codes",
+        "Code",
+        aggregates.by_code,
+        aggregates.total,
+        aggregates.code_labels,
+        limit,
+    )
+
+
+def format_worst_files(aggregates: IssueAggregates, limit: int = 20):
+    """
+    Displays the files with the most issues.
+
+    Args:
+        aggregates (IssueAggregates): The precomputed histograms of the run.
+        limit (int): Number of files to show.
+    """
+    _format_histogram(
+        f"Worst {limit} Files", "File", aggregates.by_file, aggregates.total, {}, limit
+    )
+
+
+def format_worst_directories(aggregates: IssueAggregates, limit: int = 20):
+    """
+    Displays the directories with the most issues.
+
+    Args:
+        aggregates (IssueAggregates): The precomputed histograms of the run.
+        limit (int): Number of directories to show.
+    """
+    _format_histogram(
+        f"Worst {limit} Directories",
+        "Directory",
+        aggregates.by_directory,
+        aggregates.total,
+        {},
+        limit,
+    )
@@ -0,0 +1,165 @@
+"""
+tool/aggregation.py
+
+Computes per-code, per-file and per-directory issue histograms of a run in a
+single pass over the results. The menus compute them once per run, so
+switching between the "top offenders" views doesn't touch the results again.
+"""
+
+import heapq
+import os
+from typing import Dict, List, Tuple
+from pydantic import BaseModel
+from tool.pylint_runner import PylintResult
+from tool.mypy_runner import MypyResult
+
+
+class IssueAggregates(BaseModel):
+    """
+    Issue histograms of a single run.
+
+    - tool: The tool that produced the results ("pylint" or "mypy").
+    - total: The total number of issues.
+    - by_code: Number of issues per message code (e.g. "C0114" or "arg-type").
+    - code_labels: A human-readable label per code (the Pylint symbol), if any.
+    - by_file: Number of issues per file.
+    - by_directory: Number of issues per directory.
+    """
+
+    tool: str
+    total: int = 0
+    by_code: Dict[str, int] = {}
+    code_labels: Dict[str, str] = {}
+    by_file: Dict[str, int] = {}
+    by_directory: Dict[str, int] = {}
+
+
+def _directory_of(path: str) -> str:
+    return os.path.dirname(path) or "."
+
+
+def aggregate_pylint(results: List[PylintResult]) -> IssueAggregates:
+    """
+    Builds the issue histograms of a Pylint run.
+
+    Args:
+        results (List[PylintResult]): List of Pylint results.
+
+    Returns:
+        IssueAggregates: The histograms.
+    """
+    by_code: Dict[str, int] = {}
+    code_labels: Dict[str, str] = {}
+    by_file: Dict[str, int] = {}
+    by_directory: Dict[str, int] = {}
+
+    for result in results:
+        count = len(result.issues)
+        # Module names aren't unique outside packages, paths are
+        file = result.path or result.file
+        by_file[file] = by_file.get(file, 0) + count
+        directory = _directory_of(file)
+        by_directory[directory] = by_directory.get(directory, 0) + count
+
+        for issue in result.issues:
+            code = issue.code or "unknown"
+            by_code[code] = by_code.get(code, 0) + 1
+            if issue.symbol:
+                code_labels[code] = issue.symbol
+
+    return IssueAggregates(
+        tool="pylint",
+        total=sum(by_file.values()),
+        by_code=by_code,
+        code_labels=code_labels,
+        by_file=by_file,
+        by_directory=by_directory,
+    )
+
+
+def aggregate_mypy(results: List[MypyResult]) -> IssueAggregates:
+    """
+    Builds the issue histograms of a Mypy run.
+    Notes don't carry an error code and are counted under "note".
+
+    Args:
+        results (List[MypyResult]): List of Mypy results.
+
+    Returns:
+        IssueAggregates: The histograms.
+    """
+    by_code: Dict[str, int] = {}
+    by_file: Dict[str, int] = {}
+    by_directory: Dict[str, int] = {}
+
+    for result in results:
+        count = len(result.issues)
+        by_file[result.file] = by_file.get(result.file, 0) + count
+        directory = _directory_of(result.file)
+        by_directory[directory] = by_directory.get(directory, 0) + count
+
+        for issue in result.issues:
+            code = issue.error_code or (
+                "note" if issue.category == "Note" else "unknown"
+            )
+            by_code[code] = by_code.get(code, 0) + 1
+
+    return IssueAggregates(
+        tool="mypy",
+        total=sum(by_file.values()),
+        by_code=by_code,
+        by_file=by_file,
+        by_directory=by_directory,
+    )
+
+
+def top_entries(histogram: Dict[str, int], limit: int = 20) -> List[Tuple[str, int]]:
+    """
+    Returns the largest entries of a histogram, ties broken by name.
+
+    Args:
+        histogram (Dict[str, int]): One of the IssueAggregates histograms.
+        limit (int): Maximum number of entries to return.
+
+    Returns:
+        List[Tuple[str, int]]: (key, count) pairs, largest first.
+    """
+    return heapq.nsmallest(limit, histogram.items(), key=lambda e: (-e[1], e[0]))
+
+
+def _shift(histogram: Dict[str, int], delta: Dict[str, int], sign: int):
+    for key, count in delta.items():
+        updated = histogram.get(key, 0) + sign * count
+        if updated > 0:
+            histogram[key] = updated
+        else:
+            histogram.pop(key, None)
+
+
+def update_aggregates(
+    aggregates: IssueAggregates, removed: IssueAggregates, added: IssueAggregates
+) -> IssueAggregates:
+    """
+    Updates the histograms incrementally, e.g. after a single file was rechecked,
+    instead of aggregating every result again.
+
+    Args:
+        aggregates (IssueAggregates): The histograms of the whole run.
+        removed (IssueAggregates): The histograms of the results that were replaced.
+        added (IssueAggregates): The histograms of the replacing results.
+
+    Returns:
+        IssueAggregates: The updated histograms (the given ones are left untouched).
+    """
+    updated = aggregates.model_copy(deep=True)
+    for field in ("by_code", "by_file", "by_directory"):
+        _shift(getattr(updated, field), getattr(removed, field), -1)
+        _shift(getattr(updated, field), getattr(added, field), 1)
+    updated.code_labels.update(added.code_labels)
+    updated.code_labels = {
+        code: label
+        for code, label in updated.code_labels.items()
+        if code in updated.by_code
+    }
+    updated.total += added.total - removed.total
+    return updated
@@ -0,0 +1,136 @@
+"""
+tool/client.py
+
+Thin client for the pylens server (server.py).
+The functions here return results in the same shape as `run_pylint` and `run_mypy`,
+so callers can switch between local and server-backed analysis freely.
+"""
+
+import os
+import socket
+from typing import List, Optional, Tuple
+from tool.protocol import (
+    DEFAULT_SOCKET_PATH,
+    AnalysisRequest,
+    AnalysisResponse,
+    receive_line,
+    send_line,
+)
+from tool.pylint_runner import PylintResult
+from tool.mypy_runner import MypyResult
+from tool.mypy_cache import MypyCacheSettings
+from tool.run_stats import RunStats
+
+
+def request_analysis(
+    request: AnalysisRequest, socket_path: str = DEFAULT_SOCKET_PATH
+) -> AnalysisResponse:
+    """
+    Sends one analysis request to the server and waits for the response.
+
+    Args:
+        request (AnalysisRequest): The request to send.
+        socket_path (str): Path of the server's Unix socket.
+
+    Returns:
+        AnalysisResponse: The server's response.
+
+    Raises:
+        OSError: If the server can't be reached.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        send_line(connection, request.model_dump_json())
+        return AnalysisResponse.model_validate_json(receive_line(connection))
+
+
+def _checked_request(request: AnalysisRequest, socket_path: str) -> AnalysisResponse:
+    """Sends the request and raises if the server failed to answer it."""
+    response = request_analysis(request, socket_path=socket_path)
+    if not response.ok:
+        raise RuntimeError(response.error or "The pylens server reported a failure.")
+    return response
+
+
+def _copy_run_stats(run_stats: Optional[RunStats], response: AnalysisResponse):
+    """Fills in the caller's statistics from the server's, if both exist."""
+    if run_stats is None or response.run_stats is None:
+        return  # Memoized responses don't carry statistics, nothing ran
+    run_stats.cache = response.run_stats.cache
+    for phase, seconds in response.run_stats.phase_seconds.items():
+        run_stats.phase_seconds[phase] = run_stats.phase_seconds.get(phase, 0.0) + seconds
+    if response.run_stats.files_analyzed is not None:
+        run_stats.files_analyzed = (
+            run_stats.files_analyzed or 0
+        ) + response.run_stats.files_analyzed
+
+
+def run_pylint_remote(
+    paths: List[str],
+    configuration: Optional[str] = None,
+    run_stats: Optional[RunStats] = None,
+    socket_path: str = DEFAULT_SOCKET_PATH,
+) -> Tuple[List[PylintResult], float]:
+    """
+    Runs Pylint through the pylens server.
+
+    Args:
+        paths (List[str]): List of paths to inspect.
+        configuration (Optional[str]): Optional rcfile path.
+        run_stats (Optional[RunStats]): If given, filled in with the server's statistics.
+        socket_path (str): Path of the server's Unix socket.
+
+    Returns:
+        Tuple[List[PylintResult], float]: A list of Pylint results and the overall score.
+    """
+    results: List[PylintResult] = []
+    overall_score = None
+    for path in paths:
+        response = _checked_request(
+            AnalysisRequest(
+                tool="pylint", path=path, configuration=configuration, cwd=os.getcwd()
+            ),
+            socket_path,
+        )
+        results.extend(response.pylint_results)
+        _copy_run_stats(run_stats, response)
+        if response.overall_score is not None:
+            overall_score = response.overall_score
+
+    assert overall_score is not None, "Overall score must be calculated."
+
+    return results, overall_score
+
+
+def run_mypy_remote(
+    path: str,
+    configuration: Optional[str] = None,
+    cache_settings: Optional[MypyCacheSettings] = None,
+    run_stats: Optional[RunStats] = None,
+    socket_path: str = DEFAULT_SOCKET_PATH,
+) -> List[MypyResult]:
+    """
+    Runs Mypy through the pylens server.
+
+    Args:
+        path (str): Path to analyze with Mypy.
+        configuration (Optional[str]): Optional configuration file path.
+        cache_settings (Optional[MypyCacheSettings]): Cache options, defaults if None.
+        run_stats (Optional[RunStats]): If given, filled in with the server's statistics.
+        socket_path (str): Path of the server's Unix socket.
+
+    Returns:
+        List[MypyResult]: A list of structured Mypy results.
+    """
+    response = _checked_request(
+        AnalysisRequest(
+            tool="mypy",
+            path=path,
+            configuration=configuration,
+            cwd=os.getcwd(),
+            mypy_cache=cache_settings or MypyCacheSettings(),
+        ),
+        socket_path,
+    )
+    _copy_run_stats(run_stats, response)
+    return response.mypy_results
@@ -0,0 +1,35 @@
+"""
+tool/fast_construct.py
+
+Builds pydantic models in bulk from field values, e.g. coming out of the output
+tokenizers or a snapshot, where building hundreds of thousands of issues one by
+one would dominate the run time.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List
+from pydantic import TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: type) -> TypeAdapter:
+    return TypeAdapter(List[model])  # type: ignore[valid-type]
+
+
+def construct_all(model: type, values: Iterable[Dict[str, Any]]) -> List[Any]:
+    """
+    Builds instances of the model from their field values.
+    The whole batch is validated by a single pydantic-core call, which costs about
+    as much as `model_construct` without its per-call overhead, and the instances
+    are regular models (assignable, copyable with `model_copy`).
+
+    Args:
+        model (type): The pydantic model.
+        values (Iterable[Dict[str, Any]]): The fields of each instance.
+
+    Returns:
+        List[Any]: The instances.
+    """
+    return _list_adapter(model).validate_python(
+        values if isinstance(values, list) else list(values)
+    )
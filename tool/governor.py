@@ -0,0 +1,244 @@
+"""
+tool/governor.py
+
+Runs the analysis subprocesses within resource limits, so pylens can share
+build hosts with other services: memory limits, CPU and IO priorities, a
+timeout per process and a cap on concurrently running processes.
+
+The limits are applied from the parent right after the process starts
+(`prlimit`, `setpriority`), instead of in a `preexec_fn`, which isn't safe
+once threads are involved (e.g. parallel Mypy groups). Processes the tool
+starts later (e.g. Pylint's `--jobs` workers) inherit them.
+A cgroup v2 memory limit, which also covers those workers, is used instead
+of the address space limit when PYLENS_CGROUP points to a cgroup delegated
+to the user.
+"""
+
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+# Delegated cgroup v2 directory pylens may create per-process child cgroups in
+CGROUP_ENVIRONMENT_VARIABLE = "PYLENS_CGROUP"
+
+
+class ResourceLimits(BaseModel):
+    """
+    Limits for every analysis subprocess.
+
+    - memory_mb: Maximum memory of a process in MiB (address space, or cgroup memory.max).
+    - nice: Niceness added to the processes (0 keeps the current priority).
+    - idle_io: Whether the processes only get disk time when no one else needs it.
+    - timeout: Seconds after which a process (and everything it started) is killed.
+    - max_processes: Maximum number of analysis subprocesses running at the same time.
+    """
+
+    memory_mb: Optional[int] = None
+    nice: int = 0
+    idle_io: bool = False
+    timeout: Optional[float] = None
+    max_processes: Optional[int] = None
+
+
+class GovernedRun(BaseModel):
+    """
+    The outcome of a governed subprocess.
+
+    - returncode: The exit status, None if the process was killed after timing out.
+    - stdout / stderr: The output of the process (what was written before a timeout).
+    - timed_out: Whether the process was killed for exceeding the timeout.
+    - seconds: The wall time of the process, without the time spent waiting for a slot.
+    """
+
+    returncode: Optional[int] = None
+    stdout: str = ""
+    stderr: str = ""
+    timed_out: bool = False
+    seconds: float = 0.0
+
+
+_default_limits = ResourceLimits()
+_slots: Optional[threading.BoundedSemaphore] = None
+_slots_lock = threading.Lock()
+
+
+def set_default_limits(limits: ResourceLimits):
+    """
+    Sets the limits every analysis subprocess of this pylens process runs with.
+
+    Args:
+        limits (ResourceLimits): The limits.
+    """
+    global _default_limits, _slots  # pylint: disable=global-statement
+    with _slots_lock:
+        _default_limits = limits
+        _slots = (
+            threading.BoundedSemaphore(limits.max_processes)
+            if limits.max_processes
+            else None
+        )
+
+
+def get_default_limits() -> ResourceLimits:
+    """Returns the limits set with `set_default_limits`."""
+    return _default_limits
+
+
+def apply_limits(pid: int, limits: ResourceLimits, address_space: bool = True):
+    """
+    Applies the memory limit and CPU priority to a running process.
+    Limits the platform doesn't support are skipped.
+
+    Args:
+        pid (int): The process.
+        limits (ResourceLimits): The limits.
+        address_space (bool): Whether to limit the address space to the memory limit.
+            Off for processes in a memory-limited cgroup: the address space counts
+            mappings that never use memory, it would only make them fail earlier.
+    """
+    if limits.memory_mb and address_space:
+        try:
+            import resource  # pylint: disable=import-outside-toplevel
+
+            limit = limits.memory_mb * 1024 * 1024
+            resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, AttributeError, OSError, ValueError):
+            pass
+    if limits.nice:
+        try:
+            current = os.getpriority(os.PRIO_PROCESS, pid)
+            os.setpriority(os.PRIO_PROCESS, pid, min(19, current + limits.nice))
+        except (AttributeError, OSError):
+            pass
+
+
+def set_idle_io(pid: int):
+    """
+    Moves a running process into the idle IO class, for processes that can't be
+    started through `ionice` (e.g. multiprocessing workers). Skipped if unavailable.
+
+    Args:
+        pid (int): The process.
+    """
+    if not shutil.which("ionice"):
+        return
+    try:
+        subprocess.run(
+            ["ionice", "-c", "3", "-p", str(pid)], capture_output=True, check=False
+        )
+    except OSError:
+        pass
+
+
+def _io_prefix(limits: ResourceLimits) -> List[str]:
+    """The command prefix putting a process into the idle IO class, if possible."""
+    if limits.idle_io and shutil.which("ionice"):
+        return ["ionice", "-c", "3"]
+    return []
+
+
+def _create_cgroup(limits: ResourceLimits) -> Optional[str]:
+    """Creates a child cgroup with the memory limit in the delegated cgroup, if any."""
+    parent = os.environ.get(CGROUP_ENVIRONMENT_VARIABLE)
+    if not parent or not limits.memory_mb:
+        return None
+    cgroup = os.path.join(parent, f"pylens-{os.getpid()}-{threading.get_ident()}")
+    try:
+        os.makedirs(cgroup, exist_ok=True)
+        with open(os.path.join(cgroup, "memory.max"), "w", encoding="utf-8") as limit:
+            limit.write(str(limits.memory_mb * 1024 * 1024))
+    except OSError:
+        _remove_cgroup(cgroup)
+        return None
+    return cgroup
+
+
+def _join_cgroup(cgroup: str, pid: int) -> bool:
+    """Moves the process into the cgroup, returns whether it worked."""
+    try:
+        with open(os.path.join(cgroup, "cgroup.procs"), "w", encoding="utf-8") as procs:
+            procs.write(str(pid))
+    except OSError:
+        return False
+    return True
+
+
+def _remove_cgroup(cgroup: Optional[str]):
+    if cgroup:
+        try:
+            os.rmdir(cgroup)
+        except OSError:
+            pass
+
+
+def _kill_group(process: subprocess.Popen):
+    """Kills the process and everything it started (it leads its own session)."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, OSError):
+        process.kill()
+
+
+def run_governed(
+    command: List[str],
+    limits: Optional[ResourceLimits] = None,
+    env: Optional[Dict[str, str]] = None,
+) -> GovernedRun:
+    """
+    Runs a command within the resource limits and captures its output.
+    Waits for a free slot first if the number of concurrent processes is capped.
+
+    Args:
+        command (List[str]): The command to run.
+        limits (Optional[ResourceLimits]): The limits, the default ones if None.
+        env (Optional[Dict[str, str]]): Environment of the process, the current one if None.
+
+    Returns:
+        GovernedRun: The outcome of the process.
+
+    Raises:
+        FileNotFoundError: If the executable doesn't exist.
+    """
+    limits = limits or _default_limits
+    slots = _slots
+    if slots is not None:
+        slots.acquire()
+    cgroup = _create_cgroup(limits)
+    try:
+        started_at = time.perf_counter()
+        process = subprocess.Popen(  # pylint: disable=consider-using-with
+            [*_io_prefix(limits), *command],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=env,
+            # A session of its own lets a timeout kill the workers the tool started too
+            start_new_session=True,
+        )
+        in_cgroup = cgroup is not None and _join_cgroup(cgroup, process.pid)
+        apply_limits(process.pid, limits, address_space=not in_cgroup)
+
+        try:
+            stdout, stderr = process.communicate(timeout=limits.timeout)
+            timed_out = False
+        except subprocess.TimeoutExpired:
+            _kill_group(process)
+            stdout, stderr = process.communicate()
+            timed_out = True
+
+        return GovernedRun(
+            returncode=None if timed_out else process.returncode,
+            stdout=stdout or "",
+            stderr=stderr or "",
+            timed_out=timed_out,
+            seconds=time.perf_counter() - started_at,
+        )
+    finally:
+        _remove_cgroup(cgroup)
+        if slots is not None:
+            slots.release()
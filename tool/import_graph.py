@@ -0,0 +1,196 @@
+"""
+tool/import_graph.py
+
+Builds the static import graph of a project from a fast AST scan and splits
+it into independent groups of files, so each group can be type-checked by its
+own Mypy process without the groups ever following imports into one another.
+"""
+
+import ast
+import heapq
+import os
+from typing import Dict, List, Optional, Set
+from tool.project import module_name_for
+from tool.profiling import CostProfile
+
+
+def scan_imports(file: str, module: Optional[str] = None) -> Set[str]:
+    """
+    Lists the modules a file imports, relative imports resolved to absolute names.
+    Only the syntax tree is looked at, nothing is imported or executed.
+
+    Args:
+        file (str): Path of a Python file.
+        module (Optional[str]): The file's module name, derived from the path if None.
+
+    Returns:
+        Set[str]: The imported module names. For `from a import b`, both "a" and "a.b"
+        are listed, since b may be a submodule. Empty if the file can't be parsed.
+    """
+    try:
+        with open(file, "rb") as source:
+            tree = ast.parse(source.read(), filename=file)
+    except (OSError, SyntaxError, ValueError):
+        return set()
+
+    package = module if module is not None else module_name_for(file)
+    if os.path.basename(file) != "__init__.py":
+        package = package.rpartition(".")[0]
+
+    imported: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imported.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                # One dot is the current package, every further dot goes one level up
+                parts = package.split(".") if package else []
+                parts = parts[: len(parts) - (node.level - 1)]
+                base = ".".join(parts + ([node.module] if node.module else []))
+            else:
+                base = node.module or ""
+            if base:
+                imported.add(base)
+            imported.update(
+                f"{base}.{alias.name}" if base else alias.name for alias in node.names
+            )
+    return imported
+
+
+def build_import_graph(files: List[str]) -> Dict[str, Set[str]]:
+    """
+    Builds the graph of imports between the given files.
+    Importing "a.b.c" depends on a.b.c as well as on the packages a and a.b,
+    whose __init__ modules run (and get checked) first. For the same reason every
+    module depends on the __init__ modules of its own enclosing packages.
+    Imports of modules outside the files (stdlib, dependencies) are left out.
+    Like Mypy's namespace package support, a file is also found under its dotted
+    path relative to the working directory (e.g. "shared.util" for shared/util.py).
+
+    Args:
+        files (List[str]): The project's Python files.
+
+    Returns:
+        Dict[str, Set[str]]: Each file mapped to the files it imports.
+    """
+    names = {file: module_name_for(file) for file in files}
+    modules: Dict[str, str] = {}
+    for file in files:
+        relative = os.path.splitext(os.path.relpath(file))[0]
+        if not relative.startswith(os.pardir):
+            modules[relative.replace(os.sep, ".").removesuffix(".__init__")] = file
+    modules.update({name: file for file, name in names.items()})
+    graph: Dict[str, Set[str]] = {file: set() for file in files}
+    for file in files:
+        # Its own module name brings in the enclosing packages, the module itself is skipped
+        for name in (names[file], *scan_imports(file, names[file])):
+            parts = name.split(".")
+            for end in range(1, len(parts) + 1):
+                target = modules.get(".".join(parts[:end]))
+                if target is not None and target != file:
+                    graph[file].add(target)
+    return graph
+
+
+def connected_components(graph: Dict[str, Set[str]]) -> List[List[str]]:
+    """
+    Splits the graph into weakly connected components (import direction ignored).
+    Files of different components never import each other, directly or not.
+
+    Args:
+        graph (Dict[str, Set[str]]): Each file mapped to the files it imports.
+
+    Returns:
+        List[List[str]]: The components, each sorted, largest first.
+    """
+    parent = {file: file for file in graph}
+
+    def find(file: str) -> str:
+        while parent[file] != file:
+            parent[file] = parent[parent[file]]  # Path halving
+            file = parent[file]
+        return file
+
+    for file, imports in graph.items():
+        for target in imports:
+            root, target_root = find(file), find(target)
+            if root != target_root:
+                parent[target_root] = root
+
+    components: Dict[str, List[str]] = {}
+    for file in graph:
+        components.setdefault(find(file), []).append(file)
+    return sorted(
+        (sorted(component) for component in components.values()),
+        key=lambda c: (-len(c), c[0]),
+    )
+
+
+def estimate_costs(files: List[str], profile: Optional[CostProfile]) -> Dict[str, float]:
+    """
+    Estimates how expensive each file is to type-check.
+    Measured costs come from the Mypy cost profile. Without a profile, the file size
+    stands in, which is only meaningful relative to the other files.
+
+    Args:
+        files (List[str]): The files to estimate.
+        profile (Optional[CostProfile]): The project's Mypy cost profile, if any.
+
+    Returns:
+        Dict[str, float]: The estimated cost of each file.
+    """
+    if profile and profile.file_seconds:
+        average = profile.total_seconds / len(profile.file_seconds)
+        costs = {
+            os.path.normpath(file): seconds
+            for file, seconds in profile.file_seconds.items()
+        }
+        return {file: costs.get(os.path.normpath(file), average) for file in files}
+
+    sizes = {}
+    for file in files:
+        try:
+            sizes[file] = float(max(os.path.getsize(file), 1))
+        except OSError:
+            sizes[file] = 1.0
+    return sizes
+
+
+def balance_groups(
+    components: List[List[str]], costs: Dict[str, float], jobs: int
+) -> List[List[str]]:
+    """
+    Distributes whole components over at most `jobs` groups of similar cost,
+    assigning the most expensive component to the cheapest group first (LPT).
+    Components are never split, tightly coupled packages stay together.
+
+    Args:
+        components (List[List[str]]): The independent components.
+        costs (Dict[str, float]): The estimated cost of each file.
+        jobs (int): Maximum number of groups.
+
+    Returns:
+        List[List[str]]: The non-empty groups, each sorted, most expensive first.
+    """
+    weighted = sorted(
+        (
+            (sum(costs.get(file, 0.0) for file in component), component)
+            for component in components
+        ),
+        key=lambda e: (-e[0], e[1][0]),
+    )
+    # (cost so far, group index) of every group, the cheapest on top
+    loads = [(0.0, index) for index in range(max(1, jobs))]
+    groups: List[List[str]] = [[] for _ in loads]
+    group_costs = [0.0 for _ in loads]
+    for cost, component in weighted:
+        load, index = heapq.heappop(loads)
+        groups[index].extend(component)
+        group_costs[index] = load + cost
+        heapq.heappush(loads, (load + cost, index))
+
+    ordered = sorted(
+        (index for index, group in enumerate(groups) if group),
+        key=lambda index: -group_costs[index],
+    )
+    return [sorted(groups[index]) for index in ordered]
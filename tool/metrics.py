@@ -0,0 +1,265 @@
+"""
+tool/metrics.py
+
+Exports the metrics of analysis runs in the OpenMetrics text format, either into
+a textfile (e.g. for node-exporter's textfile collector) or over a local HTTP
+endpoint for Prometheus to scrape.
+A run is summarized once when it's recorded, so rendering and serving the
+metrics never touches the results themselves.
+"""
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple, Union
+from pydantic import BaseModel
+from tool.pylint_runner import PylintResult
+from tool.mypy_runner import MypyResult
+from tool.run_stats import RunStats
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+class ToolMetrics(BaseModel):
+    """
+    Summary of a single run, as exported.
+
+    - tool: The tool that was run ("pylint" or "mypy").
+    - path: The analyzed path.
+    - issues: Number of issues per category, summed over the files.
+    - files_with_issues: Number of files with at least one issue.
+    - overall_score: The Pylint score (Pylint only).
+    - run_stats: Statistics of the run (timings, cache, files analyzed), if any.
+    - finished_at: When the run finished (Unix time).
+    """
+
+    tool: str
+    path: str
+    issues: Dict[str, int] = {}
+    files_with_issues: int = 0
+    overall_score: Optional[float] = None
+    run_stats: Optional[RunStats] = None
+    finished_at: float = 0.0
+
+
+def collect_metrics(
+    tool: str,
+    path: str,
+    results: Union[List[PylintResult], List[MypyResult]],
+    run_stats: Optional[RunStats] = None,
+    overall_score: Optional[float] = None,
+    finished_at: Optional[float] = None,
+) -> ToolMetrics:
+    """
+    Summarizes a run for the exporter.
+
+    Args:
+        tool (str): The tool that was run.
+        path (str): The analyzed path, normalized: "./src" and "src" are the same series.
+        results (Union[List[PylintResult], List[MypyResult]]): The results of the run.
+        run_stats (Optional[RunStats]): Statistics of the run.
+        overall_score (Optional[float]): The Pylint score.
+        finished_at (Optional[float]): When the run finished (Unix time), now if None.
+            Results loaded from a snapshot pass the time they were created.
+
+    Returns:
+        ToolMetrics: The summary.
+    """
+    issues: Dict[str, int] = {}
+    files_with_issues = 0
+    for result in results:
+        if result.issues:
+            files_with_issues += 1
+        for category, count in result.message_counts.items():
+            issues[category] = issues.get(category, 0) + count
+
+    return ToolMetrics(
+        tool=tool,
+        path=os.path.normpath(path),
+        issues=issues,
+        files_with_issues=files_with_issues,
+        overall_score=overall_score,
+        run_stats=run_stats,
+        finished_at=time.time() if finished_at is None else finished_at,
+    )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def render_metrics(runs: List[ToolMetrics]) -> str:
+    """
+    Renders the latest run of each (tool, path) in the OpenMetrics text format.
+    The output is also valid for Prometheus' plain text format, which treats
+    the UNIT and EOF lines as comments.
+
+    Args:
+        runs (List[ToolMetrics]): The runs to export.
+
+    Returns:
+        str: The exposition text.
+    """
+    # Metric family -> (type, unit, help, samples)
+    families: Dict[str, Tuple[str, str, str, List[str]]] = {
+        "pylens_issues": ("gauge", "", "Issues reported by the last run, per category.", []),
+        "pylens_files_with_issues": ("gauge", "", "Files with at least one issue.", []),
+        "pylens_files_analyzed": ("gauge", "", "Files checked by the last run.", []),
+        "pylens_pylint_score": ("gauge", "", "Overall Pylint score of the last run.", []),
+        "pylens_run_duration_seconds": (
+            "gauge", "seconds", "Wall time of the last run.", []
+        ),
+        "pylens_phase_duration_seconds": (
+            "gauge", "seconds", "Wall time of each phase of the last run.", []
+        ),
+        "pylens_cache_hit_ratio": (
+            "gauge", "", "Share of cached modules the last run reused.", []
+        ),
+        "pylens_last_run_timestamp_seconds": (
+            "gauge", "seconds", "When the last run finished.", []
+        ),
+        "pylens_run_timed_out": (
+            "gauge", "", "Whether the last run was cut short by its timeout.", []
+        ),
+    }
+
+    def add(family: str, labels: str, value: Union[int, float]):
+        families[family][3].append(f"{family}{{{labels}}} {value}")
+
+    for run in runs:
+        labels = _labels(tool=run.tool, path=run.path)
+        for category, count in sorted(run.issues.items()):
+            add(
+                "pylens_issues",
+                _labels(tool=run.tool, path=run.path, category=category),
+                count,
+            )
+        add("pylens_files_with_issues", labels, run.files_with_issues)
+        if run.overall_score is not None:
+            add("pylens_pylint_score", labels, run.overall_score)
+        add("pylens_last_run_timestamp_seconds", labels, round(run.finished_at, 3))
+
+        stats = run.run_stats
+        if stats is None:
+            continue
+        if stats.files_analyzed is not None:
+            add("pylens_files_analyzed", labels, stats.files_analyzed)
+        if stats.phase_seconds:
+            add(
+                "pylens_run_duration_seconds",
+                labels,
+                round(sum(stats.phase_seconds.values()), 6),
+            )
+        for phase, seconds in sorted(stats.phase_seconds.items()):
+            add(
+                "pylens_phase_duration_seconds",
+                _labels(tool=run.tool, path=run.path, phase=phase),
+                round(seconds, 6),
+            )
+        if stats.cache is not None:
+            add("pylens_cache_hit_ratio", labels, round(stats.cache.hit_rate, 6))
+        add("pylens_run_timed_out", labels, int(stats.timed_out))
+
+    lines = []
+    for family, (metric_type, unit, description, samples) in families.items():
+        if not samples:
+            continue
+        lines.append(f"# TYPE {family} {metric_type}")
+        if unit:
+            lines.append(f"# UNIT {family} {unit}")
+        lines.append(f"# HELP {family} {description}")
+        lines.extend(samples)
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsRegistry:
+    """
+    Keeps the latest run per (tool, path) and publishes it.
+
+    Args:
+        textfile (Optional[str]): File to rewrite with the metrics after every recorded run.
+    """
+
+    def __init__(self, textfile: Optional[str] = None):
+        self.textfile = textfile
+        self._lock = threading.Lock()
+        self._runs: Dict[Tuple[str, str], ToolMetrics] = {}
+
+    def record(self, metrics: ToolMetrics):
+        """
+        Records a run, replacing the previous one of the same tool and path.
+        A failing textfile write is reported but never fails the run.
+        """
+        with self._lock:
+            self._runs[(metrics.tool, metrics.path)] = metrics
+        if self.textfile:
+            try:
+                write_metrics_file(self.textfile, self.render())
+            except OSError as error:
+                print(f"Could not write the metrics file {self.textfile}: {error}")
+
+    def render(self) -> str:
+        """Renders the recorded runs in the OpenMetrics text format."""
+        with self._lock:
+            runs = list(self._runs.values())
+        return render_metrics(runs)
+
+
+def write_metrics_file(file: str, text: str):
+    """
+    Writes the metrics atomically, so collectors never read a half-written file.
+
+    Args:
+        file (str): Path of the metrics file (node-exporter expects a ".prom" suffix).
+        text (str): The exposition text.
+    """
+    temporary = f"{file}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as metrics_file:
+        metrics_file.write(text)
+    os.replace(temporary, file)
+
+
+def start_metrics_server(
+    registry: MetricsRegistry, port: int, host: str = "127.0.0.1"
+) -> ThreadingHTTPServer:
+    """
+    Serves the registry's metrics on http://<host>:<port>/metrics from a daemon thread.
+
+    Args:
+        registry (MetricsRegistry): The registry to serve.
+        port (int): Port to listen on.
+        host (str): Address to bind, local only by default.
+
+    Returns:
+        ThreadingHTTPServer: The running server (`shutdown()` stops it).
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Answers scrapes of /metrics."""
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            pass  # Scrapes would clutter the menus and the server log
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="pylens-metrics", daemon=True
+    ).start()
+    return server
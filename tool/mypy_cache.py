@@ -0,0 +1,180 @@
+"""
+tool/mypy_cache.py
+
+Manages the location and options of Mypy's incremental cache, and measures how
+much of it a run was able to reuse.
+Without an explicit `--cache-dir`, Mypy writes `.mypy_cache` into whatever the
+current working directory happens to be, so runs started from different places
+(or fresh CI checkouts) always start cold.
+"""
+
+import os
+import re
+from typing import FrozenSet, List, Optional
+from pydantic import BaseModel, Field
+from tool.project import project_cache_dir
+
+# Lines of Mypy's verbose log: the size of the import graph, and every SCC (modules
+# importing each other) it checks again instead of loading it from the cache.
+# Mypy 2 says "Scheduling SCC ...", older releases "Processing SCC ...".
+GRAPH_LOG_PATTERN = re.compile(r"^LOG:\s+Loaded graph with (\d+) nodes", re.MULTILINE)
+STALE_SCC_LOG_PATTERN = re.compile(
+    r"^LOG:\s+(?:Scheduling|Processing) SCC (?:singleton|of size \d+) \(([^)]*)\) as (?!fresh)",
+    re.MULTILINE,
+)
+# Lines of Mypy's verbose log naming the file of every module of the import graph,
+# whether it was loaded from the cache or parsed again.
+GRAPH_FILE_LOG_PATTERN = re.compile(
+    r"^LOG:\s+(?:Metadata fresh for \S+: file (.+)|Parsing (.+) \(\S+\))$", re.MULTILINE
+)
+# The same lines, naming the module instead of its file
+GRAPH_MODULE_LOG_PATTERN = re.compile(
+    r"^LOG:\s+(?:Metadata fresh for (\S+): file .+|Parsing .+ \((\S+)\))$", re.MULTILINE
+)
+
+
+class MypyCacheSettings(BaseModel):
+    """
+    Options for the Mypy cache managed by pylens.
+
+    - cache_dir: Explicit cache directory. Defaults to the per-project pylens cache.
+    - sqlite: Whether to use Mypy's SQLite cache backend instead of one file per module.
+    - fine_grained: Whether to also write fine-grained dependencies (used by dmypy).
+    """
+
+    cache_dir: Optional[str] = None
+    sqlite: bool = False
+    fine_grained: bool = False
+
+
+class MypyCacheStats(BaseModel):
+    """
+    How much of the Mypy cache a run reused.
+
+    - cache_dir: The cache directory of the run.
+    - modules: Number of modules in the import graph of the run.
+    - reused: Number of modules Mypy loaded from the cache instead of checking them.
+    - graph_modules: Names of the modules of the import graph (not serialized).
+    - stale_modules: Names of the modules checked again (not serialized).
+    """
+
+    cache_dir: str
+    modules: int
+    reused: int
+    graph_modules: FrozenSet[str] = Field(default=frozenset(), exclude=True, repr=False)
+    stale_modules: FrozenSet[str] = Field(default=frozenset(), exclude=True, repr=False)
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of modules that were loaded from the cache, between 0 and 1."""
+        return self.reused / self.modules if self.modules else 0.0
+
+
+def resolve_cache_dir(path: str, settings: MypyCacheSettings) -> str:
+    """
+    Resolves the cache directory for the analyzed path.
+
+    Args:
+        path (str): Path analyzed with Mypy.
+        settings (MypyCacheSettings): The cache settings.
+
+    Returns:
+        str: The absolute cache directory.
+    """
+    if settings.cache_dir:
+        return os.path.abspath(settings.cache_dir)
+    return project_cache_dir(path, "mypy")
+
+
+def build_cache_args(path: str, settings: MypyCacheSettings) -> List[str]:
+    """
+    Builds the Mypy arguments selecting the managed cache.
+
+    Args:
+        path (str): Path analyzed with Mypy.
+        settings (MypyCacheSettings): The cache settings.
+
+    Returns:
+        List[str]: The cache-related arguments for Mypy.
+    """
+    cache_args = ["--cache-dir", resolve_cache_dir(path, settings)]
+    if settings.sqlite:
+        cache_args.append("--sqlite-cache")
+    if settings.fine_grained:
+        cache_args.append("--cache-fine-grained")
+    return cache_args
+
+
+def read_cache_stats(cache_dir: str, log: str) -> MypyCacheStats:
+    """
+    Computes how much of the cache a run reused from Mypy's verbose log.
+    Mypy decides on its own whether a cache entry is still valid (it compares source
+    hashes when the modification times changed, e.g. after a fresh checkout or a cache
+    restore), and logs every group of modules it has to check again. All other modules
+    of the import graph were loaded from the cache.
+
+    Args:
+        cache_dir (str): The Mypy cache directory.
+        log (str): What Mypy printed to stderr with `--verbose`.
+
+    Returns:
+        MypyCacheStats: The cache statistics of the run.
+    """
+    # Mypy loads the graph a second time, without the cache, when too much of it was missing
+    graphs = GRAPH_LOG_PATTERN.findall(log)
+    modules = int(graphs[-1]) if graphs else 0
+    stale = {
+        module for scc in STALE_SCC_LOG_PATTERN.findall(log) for module in scc.split()
+    }
+    return MypyCacheStats(
+        cache_dir=cache_dir,
+        modules=modules,
+        reused=max(modules - len(stale), 0),
+        graph_modules=frozenset(
+            fresh or parsed for fresh, parsed in GRAPH_MODULE_LOG_PATTERN.findall(log)
+        ),
+        stale_modules=frozenset(stale),
+    )
+
+
+def merge_cache_stats(cache_dir: str, stats: List[MypyCacheStats]) -> MypyCacheStats:
+    """
+    Merges the cache statistics of runs over parts of a project.
+    The import graphs of the parts overlap (the stdlib and shared dependencies are in
+    all of them), so each module is counted once, as reused only if no run checked it.
+
+    Args:
+        cache_dir (str): The cache directory reported for the merged runs.
+        stats (List[MypyCacheStats]): The statistics of the runs.
+
+    Returns:
+        MypyCacheStats: The statistics of the runs as a whole.
+    """
+    graph_modules = frozenset().union(*(s.graph_modules for s in stats))
+    stale_modules = frozenset().union(*(s.stale_modules for s in stats))
+    return MypyCacheStats(
+        cache_dir=cache_dir,
+        modules=len(graph_modules),
+        reused=len(graph_modules - stale_modules),
+        graph_modules=graph_modules,
+        stale_modules=stale_modules,
+    )
+
+
+def read_graph_files(log: str) -> List[str]:
+    """
+    Lists the files of the import graph of a run from Mypy's verbose log, including
+    the modules followed outside the analyzed path (libraries, stubs, ...).
+
+    Args:
+        log (str): What Mypy printed to stderr with `--verbose`.
+
+    Returns:
+        List[str]: The absolute paths of the files, without duplicates.
+    """
+    return sorted(
+        {
+            os.path.abspath(fresh or parsed)
+            for fresh, parsed in GRAPH_FILE_LOG_PATTERN.findall(log)
+        }
+    )
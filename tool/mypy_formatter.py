@@ -4,11 +4,12 @@ mypy_formatter.py
 Formats and displays MyPy results using `rich`, including summary and detailed results.
 """
 
-from typing import List, Dict
+from typing import List, Dict, Optional
 from rich.table import Table
 from rich.console import Console
 from rich.text import Text
 from tool.mypy_runner import MypyResult
+from tool.mypy_cache import MypyCacheStats
 
 console = Console()
 
@@ -39,7 +40,9 @@ def format_code_expression(expression: str, max_width: int = 50) -> Text:
 
 
 def format_summary(
-    results: List[MypyResult], with_numbering: bool = False
+    results: List[MypyResult],
+    with_numbering: bool = False,
+    cache_stats: Optional[MypyCacheStats] = None,
 ) -> Dict[int, str]:
     """
     Formats and displays the summary of MyPy results.
@@ -47,6 +50,7 @@ def format_summary(
     Args:
         results (List[MypyResult]): List of MyPy results.
         with_numbering (bool): If True, adds numbering for files to reference in menus.
+        cache_stats (Optional[MypyCacheStats]): If given, the cache hit rate is shown too.
 
     Returns:
         Dict[int, str]: A mapping of file index to file names for menu selection.
@@ -75,9 +79,24 @@ def format_summary(
         )
 
     console.print(table)
+    if cache_stats is not None:
+        format_cache_stats(cache_stats)
     return file_mapping
 
 
+def format_cache_stats(cache_stats: MypyCacheStats):
+    """
+    Displays how much of the incremental cache a MyPy run reused.
+
+    Args:
+        cache_stats (MypyCacheStats): The cache statistics of the run.
+    """
+    console.print(
+        f"\n[bold green]Cache: {cache_stats.reused}/{cache_stats.modules} modules reused "
+        f"({cache_stats.hit_rate:.1%})[/bold green] [dim]{cache_stats.cache_dir}[/dim]"
+    )
+
+
 def format_detailed_results(results: List[MypyResult]):
     """
     Formats and displays detailed MyPy results.
@@ -94,6 +113,7 @@ def format_detailed_results(results: List[MypyResult]):
         table.add_column("Line", style="dim", justify="right")
         table.add_column("Column", style="dim", justify="right")
         table.add_column("Category", style="bold green", justify="center")
+        table.add_column("Code", style="magenta")
         table.add_column("Message", style="bold white")
         table.add_column(
             "Code Expression", style="italic white", width=50, justify="left"
@@ -110,6 +130,7 @@ def format_detailed_results(results: List[MypyResult]):
                 str(issue.issue_location_start.line),
                 str(issue.issue_location_start.column),
                 issue.category,
+                issue.error_code or "",
                 issue.message,
                 formatted_expression if formatted_expression else "N/A",
             )
@@ -0,0 +1,237 @@
+"""
+tool/mypy_parallel.py
+
+Runs Mypy over independent parts of a project in parallel.
+The project's import graph is split into components that never import each
+other, the components are packed into cost-balanced groups, and every group is
+checked by its own Mypy process. Since no group imports another, no file is
+checked twice and the merged results match a single run's.
+"""
+
+import hashlib
+import io
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from tool.import_graph import (
+    balance_groups,
+    build_import_graph,
+    connected_components,
+    estimate_costs,
+)
+from tool.mypy_cache import MypyCacheSettings, merge_cache_stats, resolve_cache_dir
+from tool.mypy_runner import MypyResult, run_mypy
+from tool.profiling import load_cost_profile
+from tool.project import discover_python_files, module_name_for
+from tool.run_stats import RunStats, timed_phase
+
+
+def read_mypy_excludes(configuration: Optional[str] = None) -> Optional[List[str]]:
+    """
+    Reads the `exclude` patterns of the Mypy configuration, found the way Mypy finds
+    it when no configuration file is given.
+
+    Args:
+        configuration (Optional[str]): Optional configuration file path.
+
+    Returns:
+        Optional[List[str]]: The patterns, None if Mypy can't be imported to read them.
+    """
+    # Imported lazily, like for run_mypy_in_process
+    try:
+        from mypy import config_parser  # pylint: disable=import-outside-toplevel
+        from mypy.options import Options  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+
+    options = Options()
+    # Mypy reports configuration errors itself once it runs
+    config_parser.parse_config_file(
+        options, lambda: None, configuration, io.StringIO(), io.StringIO()
+    )
+    return list(options.exclude)
+
+
+def is_excluded(path: str, file: str, excludes: List[str]) -> bool:
+    """
+    Tells whether Mypy skips the file when it looks for the files under the path.
+    Like Mypy, the patterns are searched in the path of the file and of every
+    directory it walks through, relative to the working directory, with forward
+    slashes (and a trailing one for directories).
+
+    Args:
+        path (str): Directory analyzed with Mypy.
+        file (str): A Python file under the directory.
+        excludes (List[str]): The `exclude` patterns of the Mypy configuration.
+
+    Returns:
+        bool: Whether the file is excluded.
+    """
+    if not excludes:
+        return False
+    subpaths = []
+    directory = path
+    for part in os.path.relpath(os.path.dirname(file), path).split(os.sep):
+        if part != os.curdir:
+            directory = os.path.join(directory, part)
+            subpaths.append(os.path.relpath(directory).replace(os.sep, "/") + "/")
+    subpaths.append(os.path.relpath(file).replace(os.sep, "/"))
+    return any(
+        re.search(exclude, subpath) for subpath in subpaths for exclude in excludes
+    )
+
+
+def plan_mypy_groups(
+    path: str, jobs: int, excludes: Optional[List[str]] = None
+) -> List[List[str]]:
+    """
+    Splits the Python files under the path into at most `jobs` independent groups.
+
+    Args:
+        path (str): Directory to analyze with Mypy.
+        jobs (int): Maximum number of groups.
+        excludes (Optional[List[str]]): The `exclude` patterns of the Mypy configuration,
+            the files they match are left out like a single run would.
+
+    Returns:
+        List[List[str]]: The groups of files, most expensive first.
+    """
+    files = [
+        file
+        for file in discover_python_files(path)
+        if not is_excluded(path, file, excludes or [])
+    ]
+    components = connected_components(build_import_graph(files))
+    costs = estimate_costs(files, load_cost_profile(path, "mypy"))
+    return balance_groups(components, costs, jobs)
+
+
+def _merge_results(
+    groups: List[List[str]], group_results: List[List[MypyResult]]
+) -> List[MypyResult]:
+    """
+    Merges the results of the groups. Should Mypy still have followed an import the
+    static scan missed (e.g. a dynamic import), a file is reported by its own group only.
+    """
+    owners = {
+        os.path.normpath(file): index
+        for index, group in enumerate(groups)
+        for file in group
+    }
+    merged: Dict[str, MypyResult] = {}
+    for index, results in enumerate(group_results):
+        for result in results:
+            file = os.path.normpath(result.file)
+            owner = owners.get(file)
+            if owner == index or (owner is None and file not in merged):
+                merged[file] = result
+    return [merged[file] for file in sorted(merged)]
+
+
+def group_cache_settings(
+    path: str, group: List[str], cache_settings: MypyCacheSettings
+) -> MypyCacheSettings:
+    """
+    Picks the cache of a group. Mypy replaces cache files atomically, so the groups
+    share the project's cache, the same one single runs (and `warm-cache`) fill.
+    A SQLite cache stays locked by a writer until its run ends, so with that backend
+    every group gets a directory of its own, named after its modules: it is found
+    again as long as the group stays the same, whatever its position among the groups.
+
+    Args:
+        path (str): Path analyzed with Mypy.
+        group (List[str]): The files of the group.
+        cache_settings (MypyCacheSettings): The cache settings of the whole run.
+
+    Returns:
+        MypyCacheSettings: The cache settings of the group.
+    """
+    if not cache_settings.sqlite:
+        return cache_settings
+    modules = "\n".join(sorted(module_name_for(file) for file in group))
+    digest = hashlib.sha256(modules.encode()).hexdigest()[:16]
+    return cache_settings.model_copy(
+        update={
+            "cache_dir": os.path.join(
+                resolve_cache_dir(path, cache_settings), "groups", digest
+            )
+        }
+    )
+
+
+def run_mypy_parallel(
+    path: str,
+    configuration: Optional[str] = None,
+    cache_settings: Optional[MypyCacheSettings] = None,
+    run_stats: Optional[RunStats] = None,
+    time_files: bool = False,
+    jobs: Optional[int] = None,
+) -> List[MypyResult]:
+    """
+    Executes Mypy on independent groups of files under the path in parallel.
+    Falls back to a single run for a file, for a single job, when the whole project
+    is one component, or when Mypy can't be imported to read its `exclude` option
+    (the files are passed explicitly, Mypy wouldn't apply it to them).
+
+    Args:
+        path (str): Path to analyze with Mypy.
+        configuration (Optional[str]): Optional configuration file path.
+        cache_settings (Optional[MypyCacheSettings]): Cache options, defaults if None.
+            See group_cache_settings for the cache each group uses.
+        run_stats (Optional[RunStats]): If given, filled in with the statistics of the
+            groups as a whole (see merge_cache_stats).
+        time_files (bool): Whether to measure the time spent on each file (needs run_stats).
+        jobs (Optional[int]): Maximum number of parallel Mypy processes, the CPU count if None.
+
+    Returns:
+        List[MypyResult]: A list of structured Mypy results.
+
+    Raises:
+        FileNotFoundError: If the configuration file doesn't exist or Mypy is not installed.
+        RuntimeError: If a group failed or timed out, its files would be missing.
+    """
+    if configuration and not os.path.exists(configuration):
+        raise FileNotFoundError(f"Configuration file not found: {configuration}")
+
+    cache_settings = cache_settings or MypyCacheSettings()
+    jobs = jobs or os.cpu_count() or 1
+    groups: List[List[str]] = []
+    if jobs > 1 and os.path.isdir(path):
+        with timed_phase(run_stats, "graph"):
+            excludes = read_mypy_excludes(configuration)
+            if excludes is not None:
+                groups = plan_mypy_groups(path, jobs, excludes)
+    if len(groups) <= 1:
+        return run_mypy(path, configuration, cache_settings, run_stats, time_files)
+
+    group_stats = [RunStats(tool="mypy") for _ in groups]
+
+    def check_group(index: int) -> List[MypyResult]:
+        return run_mypy(
+            path,
+            configuration,
+            group_cache_settings(path, groups[index], cache_settings),
+            group_stats[index] if run_stats is not None else None,
+            time_files,
+            targets=groups[index],
+        )
+
+    # The threads only wait for the Mypy processes, which do the actual work
+    with timed_phase(run_stats, "run"):
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            group_results = list(pool.map(check_group, range(len(groups))))
+
+    if run_stats is not None:
+        caches = [stats.cache for stats in group_stats if stats.cache is not None]
+        if caches:
+            run_stats.cache = merge_cache_stats(
+                resolve_cache_dir(path, cache_settings), caches
+            )
+        checked = [s.files_analyzed for s in group_stats if s.files_analyzed is not None]
+        if checked:
+            run_stats.files_analyzed = sum(checked)
+        for stats in group_stats:
+            run_stats.file_seconds.update(stats.file_seconds)
+
+    return _merge_results(groups, group_results)
@@ -5,9 +5,21 @@ Executes Mypy on the provided paths and parses the output into structured data.
 """
 
 import os
-import subprocess
-from typing import List, Dict, Optional
-from pydantic import BaseModel
+import re
+import tempfile
+from typing import Any, List, Dict, Optional, Sequence, Tuple
+from pydantic import BaseModel, field_serializer
+from tool.fast_construct import construct_all
+from tool.mypy_cache import (
+    MypyCacheSettings,
+    build_cache_args,
+    read_cache_stats,
+    read_graph_files,
+    resolve_cache_dir,
+)
+from tool.run_stats import RunStats, timed_phase
+from tool.governor import run_governed
+from tool.project import discover_python_files, module_name_for
 
 
 class CodeLocation(BaseModel):
@@ -30,6 +42,7 @@ class MypyIssue(BaseModel):
     - category: The category of the issue (Error, Note).
     - message: The message describing the issue.
     - code_expression: The code expression associated with the issue.
+    - error_code: The error code Mypy appended to the message (e.g. "arg-type"), if any.
     """
 
     filename: str
@@ -38,6 +51,7 @@ class MypyIssue(BaseModel):
     category: str
     message: str
     code_expression: Optional[str] = None
+    error_code: Optional[str] = None
 
 
 class MypyResult(BaseModel):
@@ -46,24 +60,97 @@ class MypyResult(BaseModel):
     If there are n issues within a file, the class for that file will include n MypyIssue objects.
 
     - file: The name of the file.
-    - issues: A list of MypyIssue objects.
+    - issues: The MypyIssue objects (built on first access for loaded snapshots).
     - message_counts: A dictionary containing the count of issues for each category(for statistics).
     """
 
     file: str
-    issues: List[MypyIssue]
+    issues: Sequence[MypyIssue]
     message_counts: Dict[str, int]
 
+    @field_serializer("issues", mode="wrap")
+    def _serialize_issues(self, issues: Sequence[MypyIssue], handler):
+        return handler(issues if isinstance(issues, list) else list(issues))
+
 
 CATEGORY_MAPPING = {
     "error": "Error",
     "note": "Note",
 }
 
+# Matches the "  [error-code]" suffix Mypy appends to messages with --show-error-codes
+ERROR_CODE_PATTERN = re.compile(r"^(?P<message>.*?)\s*\[(?P<code>[a-z0-9-]+)\]$")
+
+
+def split_error_code(message: str) -> Tuple[str, Optional[str]]:
+    """
+    Splits the trailing error code off a Mypy message.
+
+    Args:
+        message (str): The full message, e.g. 'error: Name "x" is not defined  [name-defined]'.
+
+    Returns:
+        Tuple[str, Optional[str]]: The message without the code, and the code (None if absent).
+    """
+    match = ERROR_CODE_PATTERN.match(message)
+    if not match:
+        return message, None
+    return match.group("message"), match.group("code")
+
+
+# Tokenizes Mypy's text output in a single pass, one match per non-blank line:
+# - issues: "file.py:line:col:end_line:end_col: error: message" (the column and
+#   end location are optional, they depend on the output flags)
+# - context: lines without a location, e.g. 'file.py: note: In function "f":'
+#   or 'file.py: error: Source file found twice under different module names'
+# - summary: "Found 2 errors in 1 file (checked 3 source files)", "Success: ..."
+# - source: indented lines, the source line and caret line --pretty prints below an issue
+# - text: any other line, with --pretty the wrapped rest of a long message
+MYPY_TOKEN_PATTERN = re.compile(
+    r"""
+    ^(?:
+        (?P<file>\S[^\n]*?):(?P<line>\d+)(?::(?P<column>\d+))?
+        (?::(?P<end_line>\d+):(?P<end_column>\d+))?
+        :\ (?P<category>error|note|warning):(?P<message>[^\n]*)
+      | (?P<context>\S[^\n]*?:\ (?:error|note|warning):[^\n]*)
+      | (?P<summary>(?:Found\ \d+\ errors?\ in|Success:\ no\ issues\ found\ in)\ [^\n]*)
+      | (?P<source>[ \t]+\S[^\n]*)
+      | (?P<text>\S[^\n]*)
+    )$
+    """,
+    re.MULTILINE | re.VERBOSE,
+)
+
+# An error code --pretty wrapped onto a line of its own, e.g. " [valid-type]"
+WRAPPED_ERROR_CODE_PATTERN = re.compile(r"^\s?\[[a-z0-9-]+\]$")
+
+
+def _dedent_source(lines: List[str]) -> str:
+    """
+    Joins the source and caret lines of an issue without their common indentation,
+    so the caret stays aligned with the code expression it points at.
+    """
+    indent = min(len(line) - len(line.lstrip()) for line in lines)
+    return "\n".join(line[indent:].rstrip() for line in lines)
+
+
+def _location(
+    locations: Dict[Tuple[str, str], CodeLocation], line: str, column: str
+) -> CodeLocation:
+    """Returns the location, built once per distinct (line, column) of the output."""
+    location = locations.get((line, column))
+    if location is None:
+        location = locations[(line, column)] = CodeLocation(
+            line=int(line), column=int(column)
+        )
+    return location
+
 
 def parse_mypy_output(output: str) -> List[MypyResult]:
     """
     Parses the Mypy output into structured data.
+    Lines without a location (error context, errors about the whole file) and the
+    summary line are skipped.
 
     Args:
         output (str): The raw output from Mypy.
@@ -71,139 +158,400 @@ def parse_mypy_output(output: str) -> List[MypyResult]:
     Returns:
         List[MypyResult]: A list of structured Mypy results.
     """
-    results: Dict[str, List[MypyIssue]] = {}
+    # The issues' fields, the tokenizer already guarantees their types
+    results: Dict[str, List[Dict[str, Any]]] = {}
     message_counts: Dict[str, Dict[str, int]] = {}
-
-    lines = output.splitlines()  # List of lines in the output
-    current_file = None
-    current_issue = None
-    current_code_expression = []
-
-    for line in lines:
-        line = line.strip()
-
-        if not line:
+    locations: Dict[Tuple[str, str], CodeLocation] = {}
+
+    # The issue whose message, source or caret lines may still follow ({} if none)
+    current_issue: Dict[str, Any] = {}
+    source_lines: List[str] = []
+    # Whether unindented lines still continue the current issue's message
+    wrapping = False
+
+    for match in MYPY_TOKEN_PATTERN.finditer(output):
+        (
+            file,
+            line_start,
+            column_start,
+            line_end,
+            column_end,
+            category,
+            message,
+            _,
+            _,
+            source,
+            text,
+        ) = match.groups()
+
+        # The error code alone on a line, wrapped with the space before it, is
+        # still part of the message rather than the issue's source line
+        if source is not None and wrapping and WRAPPED_ERROR_CODE_PATTERN.match(source):
+            text, source = source, None
+
+        if source is not None:
+            # The source line, then the caret line (^~~~) marking the expression
+            if current_issue:
+                source_lines.append(source)
+                wrapping = False
+                if source.lstrip().startswith("^"):
+                    current_issue["code_expression"] = _dedent_source(source_lines)
+                    current_issue = {}
             continue
 
-        # Detect file name and line-column range
-        # It looks like: "file.py:line:col:line:col: category: message"
-        if ":" in line and "error" in line or "note" in line:
-            parts = line.split(":", maxsplit=4)
-            if len(parts) >= 5:
-                # Finalize the previous issue if there are pending code expressions
-                if current_issue and current_code_expression:
-                    current_issue.code_expression = "\n".join(current_code_expression)
-                    current_code_expression.clear()
-
-                # Parsing location and issue details
-                current_file = parts[0]
-                line_start, col_start = parts[1].strip(), parts[2].strip()
-                line_end, col_end = parts[3].strip(), parts[4].split()[0].strip()
-                col_end = col_end.strip(":")  # To remove the trailing colon
-                category = parts[4].split()[1].strip(":")
-                message = parts[4].split(":", maxsplit=1)[1].strip()
-
-                # Create a new issue
-                current_issue = MypyIssue(
-                    filename=current_file,
-                    issue_location_start=CodeLocation(
-                        line=int(line_start), column=int(col_start)
-                    ),
-                    issue_location_end=CodeLocation(
-                        line=int(line_end), column=int(col_end)
-                    ),
-                    category=CATEGORY_MAPPING.get(category, category),
-                    message=message,
-                )
+        if text is not None:
+            if current_issue and wrapping:
+                current_issue["message"] += " " + text.strip()
+            continue
 
-                # Add the issue to the results
-                # If the file is not in the results, add it with an empty list
-                if current_file not in results:
-                    results[current_file] = []
-                    message_counts[current_file] = {
-                        "Error": 0,
-                        "Note": 0,
-                        "Unknown": 0,
-                    }
-                results[current_file].append(current_issue)
-                message_counts[current_file][
-                    CATEGORY_MAPPING.get(category, "Unknown")
-                ] += 1
-
-        # Detect multiline code expressions (lines following an issue)
-        elif current_issue:
-            current_code_expression.append(line)
-    # Finalize any remaining code expression
-    if current_issue and current_code_expression:
-        current_issue.code_expression = "\n".join(current_code_expression)
+        # Any other line ends the current issue
+        if current_issue and source_lines:
+            current_issue["code_expression"] = _dedent_source(source_lines)
+        current_issue = {}
+        source_lines = []
+        wrapping = False
+        if file is None:
+            continue  # Context and summary lines
+
+        start = _location(locations, line_start, column_start or "0")
+        end = (
+            _location(locations, line_end, column_end)
+            if line_end is not None
+            else start
+        )
+        current_issue = {
+            "filename": file,
+            "issue_location_start": start,
+            "issue_location_end": end,
+            "category": CATEGORY_MAPPING.get(category, category),
+            "message": f"{category}:{message}".strip(),  # Keeps the "error: " prefix
+            "code_expression": None,
+            "error_code": None,
+        }
+        wrapping = True
+
+        # Add the issue to the results
+        # If the file is not in the results, add it with an empty list
+        if file not in results:
+            results[file] = []
+            message_counts[file] = {
+                "Error": 0,
+                "Note": 0,
+                "Unknown": 0,
+            }
+        results[file].append(current_issue)
+        message_counts[file][CATEGORY_MAPPING.get(category, "Unknown")] += 1
+
+    if current_issue and source_lines:
+        current_issue["code_expression"] = _dedent_source(source_lines)
+
+    # The error code can only be split off once wrapped messages are complete
+    for issues in results.values():
+        for issue in issues:
+            issue["message"], issue["error_code"] = split_error_code(issue["message"])
 
     # Convert results into a list of MypyResult objects
     return [
-        MypyResult(file=file, issues=issues, message_counts=message_counts[file])
+        MypyResult(
+            file=file,
+            issues=construct_all(MypyIssue, issues),
+            message_counts=message_counts[file],
+        )
         for file, issues in results.items()
     ]
 
 
-def run_mypy(path: str, configuration: Optional[str] = None) -> List[MypyResult]:
+MYPY_FLAGS = [
+    "--strict",
+    "--pretty",
+    "--show-error-context",
+    "--show-column-numbers",
+    "--show-error-codes",
+    "--show-error-end",
+    # The summary line tells type errors from crashes apart (see _check_exit_status)
+    "--error-summary",
+    "--disallow-any-expr",
+    "--disallow-any-decorated",
+    "--disallow-any-explicit",
+    "--disallow-any-generics",
+    "--disallow-untyped-calls",
+    "--disallow-untyped-defs",
+    "--check-untyped-defs",
+    "--warn-redundant-casts",
+    "--warn-unused-ignores",
+    "--warn-unreachable",
+    "--ignore-missing-imports",
+]
+
+
+def build_mypy_args(
+    path: str,
+    configuration: Optional[str] = None,
+    cache_settings: Optional[MypyCacheSettings] = None,
+    timing_stats: Optional[str] = None,
+    targets: Optional[List[str]] = None,
+    verbose: bool = False,
+) -> List[str]:
+    """
+    Builds the Mypy arguments (without the executable) for the given path.
+    The incremental cache always lives in the managed per-project location.
+
+    Args:
+        path (str): Path to analyze with Mypy.
+        configuration (Optional[str]): Optional configuration file path.
+        cache_settings (Optional[MypyCacheSettings]): Cache options, defaults if None.
+        timing_stats (Optional[str]): If given, Mypy writes per-module timings to this file.
+        targets (Optional[List[str]]): Files under the path to check instead of the whole path.
+        verbose (bool): Whether Mypy logs its cache decisions to stderr (see read_cache_stats).
+
+    Returns:
+        List[str]: The arguments for Mypy.
+    """
+    cache_args = build_cache_args(path, cache_settings or MypyCacheSettings())
+    mypy_args = [*MYPY_FLAGS, *cache_args, *(targets or [path])]
+    if timing_stats:
+        mypy_args.insert(0, f"--timing-stats={timing_stats}")
+    if verbose:
+        mypy_args.insert(0, "--verbose")
+    if configuration:
+        mypy_args.append(f"--config-file={configuration}")
+    return mypy_args
+
+
+# Matches Mypy's closing summary line, e.g. "Found 2 errors in 1 file (checked 3 source files)"
+# or "Success: no issues found in 3 source files"
+CHECKED_FILES_PATTERN = re.compile(
+    r"(?:checked|no issues found in) (?P<count>\d+) source files?\)?$", re.MULTILINE
+)
+
+
+def read_checked_files(output: str) -> Optional[int]:
+    """
+    Reads the number of checked files from Mypy's summary line.
+
+    Args:
+        output (str): The raw output from Mypy.
+
+    Returns:
+        Optional[int]: The number of checked files, None if there's no summary line.
+    """
+    match = CHECKED_FILES_PATTERN.search(output)
+    return int(match.group("count")) if match else None
+
+
+def read_timing_stats(timing_stats: str, path: str) -> Dict[str, float]:
+    """
+    Reads the per-module timings Mypy wrote with `--timing-stats` ("<module> <microseconds>"
+    per line) and maps them back to the files under the analyzed path.
+    Modules outside the path (stdlib, dependencies) are left out.
+
+    Args:
+        timing_stats (str): The file Mypy wrote the timings to.
+        path (str): Path analyzed with Mypy.
+
+    Returns:
+        Dict[str, float]: Seconds spent on each file.
+    """
+    files = {
+        module_name_for(file): os.path.normpath(file)
+        for file in discover_python_files(path)
+    }
+    file_seconds: Dict[str, float] = {}
+    with open(timing_stats, encoding="utf-8") as stats:
+        for line in stats:
+            module, _, microseconds = line.strip().rpartition(" ")
+            if module in files and microseconds.isdigit():
+                file_seconds[files[module]] = int(microseconds) / 1_000_000
+    return file_seconds
+
+
+def _new_timing_stats_file() -> str:
+    """Creates an empty temporary file for `--timing-stats`."""
+    handle, timing_stats = tempfile.mkstemp(prefix="pylens-mypy-timing-", suffix=".txt")
+    os.close(handle)
+    return timing_stats
+
+
+def _without_log(stderr: str) -> str:
+    """Drops the lines of Mypy's verbose log from its stderr, leaving the actual errors."""
+    return "\n".join(line for line in stderr.splitlines() if not line.startswith("LOG:"))
+
+
+def _check_exit_status(exit_status: Optional[int], stdout: str, stderr: str):
+    """
+    Makes sure Mypy finished checking. Exit status 1 also covers crashes (an internal
+    error, running out of memory, ...), it only means type errors when Mypy got to
+    print its summary line and no traceback.
+
+    Raises:
+        RuntimeError: If Mypy failed to run.
+    """
+    errors = _without_log(stderr)
+    if exit_status == 0 or (
+        exit_status == 1
+        and read_checked_files(stdout) is not None
+        and "Traceback" not in errors
+        and "MemoryError" not in errors
+    ):
+        return
+    raise RuntimeError(f"Mypy execution failed:\n{errors or stdout}")
+
+
+def _fill_run_stats(
+    run_stats: RunStats,
+    path: str,
+    cache_dir: str,
+    log: str,
+    timing_stats: Optional[str],
+):
+    """Records the cache statistics (and per-file timings, if measured) of a finished run."""
+    with timed_phase(run_stats, "cache"):
+        run_stats.cache = read_cache_stats(cache_dir, log)
+    if timing_stats:
+        run_stats.file_seconds.update(read_timing_stats(timing_stats, path))
+
+
+def run_mypy(
+    path: str,
+    configuration: Optional[str] = None,
+    cache_settings: Optional[MypyCacheSettings] = None,
+    run_stats: Optional[RunStats] = None,
+    time_files: bool = False,
+    targets: Optional[List[str]] = None,
+) -> List[MypyResult]:
     """
     Executes Mypy on the given path and parses the output.
 
     Args:
         path (str): Path to analyze with Mypy.
+        configuration (Optional[str]): Optional configuration file path.
+        cache_settings (Optional[MypyCacheSettings]): Cache options, defaults if None.
+        run_stats (Optional[RunStats]): If given, filled in with the cache statistics and timings.
+        time_files (bool): Whether to measure the time spent on each file (needs run_stats).
+        targets (Optional[List[str]]): Files under the path to check instead of the whole path.
 
     Returns:
         List[MypyResult]: A list of structured Mypy results.
+
+    Raises:
+        FileNotFoundError: If the configuration file doesn't exist or Mypy is not installed.
+        RuntimeError: If Mypy failed to run or timed out.
     """
-    try:
-        # Check if configuration file is actually existing
-        if configuration and not os.path.exists(configuration):
-            raise FileNotFoundError(f"Configuration file not found: {configuration}")
+    # Check if configuration file is actually existing
+    if configuration and not os.path.exists(configuration):
+        raise FileNotFoundError(f"Configuration file not found: {configuration}")
+
+    cache_settings = cache_settings or MypyCacheSettings()
+    cache_dir = resolve_cache_dir(path, cache_settings)
+    timing_stats = (
+        _new_timing_stats_file() if time_files and run_stats is not None else None
+    )
 
+    try:
         # Run Mypy command
         mypy_command = [
             "mypy",
-            "--strict",
-            "--pretty",
-            "--show-error-context",
-            "--show-column-numbers",
-            "--show-error-codes",
-            "--show-error-end",
-            "--disallow-any-expr",
-            "--disallow-any-decorated",
-            "--disallow-any-explicit",
-            "--disallow-any-generics",
-            "--disallow-untyped-calls",
-            "--disallow-untyped-defs",
-            "--check-untyped-defs",
-            "--warn-redundant-casts",
-            "--warn-unused-ignores",
-            "--warn-unreachable",
-            "--ignore-missing-imports",
-            path,
+            *build_mypy_args(
+                path,
+                configuration,
+                cache_settings,
+                timing_stats,
+                targets,
+                verbose=run_stats is not None,
+            ),
         ]
 
-        if configuration:
-            print(f"Using configuration file: {configuration}")
-            mypy_command.append(f"--config-file={configuration}")
+        with timed_phase(run_stats, "run"):
+            result = run_governed(mypy_command)
 
-        result = subprocess.run(
-            mypy_command,
-            capture_output=True,
-            text=True,
-        )
+        # A killed Mypy may not even have printed the errors of the files it checked
+        if result.timed_out:
+            if run_stats is not None:
+                run_stats.timed_out = True
+            raise RuntimeError(
+                f"Mypy timed out after {result.seconds:.1f}s on {path}, no results were kept."
+            )
 
-        if result.returncode not in (
-            0,  # Return code 0 indicates success
-            1,  # Return code 1 indicates type-check errors
-        ):  # Non-zero return code but not typical mypy errors
-            print(f"Mypy execution failed:\n{result.stderr}")
-            return []
+        _check_exit_status(result.returncode, result.stdout, result.stderr)
+
+        if run_stats is not None:
+            _fill_run_stats(run_stats, path, cache_dir, result.stderr, timing_stats)
+            run_stats.files_analyzed = read_checked_files(result.stdout)
 
         # Parse the output
-        return parse_mypy_output(result.stdout)
+        with timed_phase(run_stats, "parse"):
+            return parse_mypy_output(result.stdout)
 
-    except FileNotFoundError:
-        print(
-            "Error: Mypy is not installed or provided configuration file does not exist."
-        )
-        return []
+    except FileNotFoundError as error:
+        raise FileNotFoundError("Mypy is not installed.") from error
+
+    finally:
+        if timing_stats:
+            os.remove(timing_stats)
+
+
+def run_mypy_in_process(
+    path: str,
+    configuration: Optional[str] = None,
+    cache_settings: Optional[MypyCacheSettings] = None,
+    run_stats: Optional[RunStats] = None,
+    time_files: bool = False,
+    graph_files: Optional[List[str]] = None,
+) -> List[MypyResult]:
+    """
+    Runs Mypy inside the current interpreter through `mypy.api`.
+    Mypy and its typeshed stubs stay imported between calls, which is what the
+    long-lived pylens server relies on to answer quickly.
+
+    Args:
+        path (str): Path to analyze with Mypy.
+        configuration (Optional[str]): Optional configuration file path.
+        cache_settings (Optional[MypyCacheSettings]): Cache options, defaults if None.
+        run_stats (Optional[RunStats]): If given, filled in with the cache statistics and timings.
+        time_files (bool): Whether to measure the time spent on each file (needs run_stats).
+        graph_files (Optional[List[str]]): If given, filled in with the files of the
+            import graph Mypy loaded, the analyzed ones and everything they import.
+
+    Returns:
+        List[MypyResult]: A list of structured Mypy results.
+
+    Raises:
+        FileNotFoundError: If the configuration file doesn't exist.
+        RuntimeError: If Mypy failed to run.
+    """
+    # Imported lazily, the subprocess path doesn't need mypy to be importable
+    from mypy import api  # pylint: disable=import-outside-toplevel
+
+    if configuration and not os.path.exists(configuration):
+        raise FileNotFoundError(f"Configuration file not found: {configuration}")
+
+    cache_settings = cache_settings or MypyCacheSettings()
+    cache_dir = resolve_cache_dir(path, cache_settings)
+    timing_stats = (
+        _new_timing_stats_file() if time_files and run_stats is not None else None
+    )
+
+    try:
+        with timed_phase(run_stats, "run"):
+            stdout, stderr, exit_status = api.run(
+                build_mypy_args(
+                    path,
+                    configuration,
+                    cache_settings,
+                    timing_stats,
+                    verbose=run_stats is not None or graph_files is not None,
+                )
+            )
+        _check_exit_status(exit_status, stdout, stderr)
+
+        if run_stats is not None:
+            _fill_run_stats(run_stats, path, cache_dir, stderr, timing_stats)
+            run_stats.files_analyzed = read_checked_files(stdout)
+        if graph_files is not None:
+            graph_files.extend(read_graph_files(stderr))
+    finally:
+        if timing_stats:
+            os.remove(timing_stats)
+
+    with timed_phase(run_stats, "parse"):
+        return parse_mypy_output(stdout)
@@ -0,0 +1,52 @@
+"""
+tool/profile_formatter.py
+
+Displays per-file analysis costs (see profiling.py) using `rich`.
+"""
+
+from typing import Dict
+from rich.table import Table, box
+from rich.console import Console
+from tool.profiling import slowest_files, suggest_exclusions
+
+console = Console()
+
+
+def format_slowest_files(file_seconds: Dict[str, float], limit: int = 20):
+    """
+    Displays the files that took the longest to analyze, and the files worth
+    excluding because they dominate the run time.
+
+    Args:
+        file_seconds (Dict[str, float]): Seconds spent on each file.
+        limit (int): Number of files to show.
+    """
+    total = sum(file_seconds.values())
+    table = Table(
+        title=f"Slowest {limit} Files",
+        show_header=True,
+        header_style="bold magenta",
+        box=box.ROUNDED,
+    )
+    table.add_column("#", justify="right", style="dim")
+    table.add_column("File", style="bold white")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Share", justify="center")
+
+    for idx, (file, seconds) in enumerate(slowest_files(file_seconds, limit), start=1):
+        share = f"{seconds / total:.1%}" if total else "N/A"
+        table.add_row(str(idx), file, f"{seconds:.3f}", share)
+
+    console.print(table)
+    console.print(
+        f"[bold green]Total: {total:.2f}s over {len(file_seconds)} file(s)[/bold green]"
+    )
+
+    suggestions = suggest_exclusions(file_seconds)
+    if suggestions:
+        console.print(
+            "[bold yellow]Consider excluding or splitting these files, "
+            "they dominate the analysis time:[/bold yellow]"
+        )
+        for file in suggestions:
+            console.print(f"  - {file}")
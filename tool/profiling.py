@@ -0,0 +1,245 @@
+"""
+tool/profiling.py
+
+Per-file analysis cost attribution.
+Costs are measured directly where the tool can report them (Pylint in-process,
+Mypy's `--timing-stats`), or derived by bisecting shards of files for plain
+Pylint subprocess runs. They are kept in a per-project cost profile that later
+runs use to schedule expensive files first and to suggest exclusions.
+"""
+
+import os
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from tool.governor import run_governed
+from tool.project import project_cache_dir
+
+
+class CostProfile(BaseModel):
+    """
+    Measured analysis cost of each file of a project for one tool.
+
+    - tool: The tool the costs were measured for ("pylint" or "mypy").
+    - file_seconds: Seconds spent on each file.
+    - method: How the costs were obtained ("timed" or "bisected").
+    - updated_at: When the profile was last updated (Unix time).
+    """
+
+    tool: str
+    file_seconds: Dict[str, float] = {}
+    method: str = "timed"
+    updated_at: float = 0.0
+
+    @property
+    def total_seconds(self) -> float:
+        """The summed cost of all files."""
+        return sum(self.file_seconds.values())
+
+
+def _profile_path(path: str, tool: str) -> str:
+    return os.path.join(project_cache_dir(path, "profiles"), f"{tool}.json")
+
+
+def load_cost_profile(path: str, tool: str) -> Optional[CostProfile]:
+    """
+    Loads the cost profile of the project the path belongs to.
+
+    Args:
+        path (str): A file or directory inside the project.
+        tool (str): The tool of the profile.
+
+    Returns:
+        Optional[CostProfile]: The profile, None if none was saved yet (or it's unreadable).
+    """
+    # Looked up on every Pylint run, it mustn't leave a cache directory behind
+    profile_path = _profile_path(path, tool)
+    if not os.path.exists(profile_path):
+        return None
+    try:
+        with open(profile_path, encoding="utf-8") as profile_file:
+            return CostProfile.model_validate_json(profile_file.read())
+    except (OSError, ValueError):
+        return None
+
+
+def save_cost_profile(path: str, profile: CostProfile) -> CostProfile:
+    """
+    Merges the profile into the saved one (newer measurements win) and saves it.
+
+    Args:
+        path (str): A file or directory inside the project.
+        profile (CostProfile): The newly measured costs.
+
+    Returns:
+        CostProfile: The merged profile that was saved.
+    """
+    previous = load_cost_profile(path, profile.tool)
+    file_seconds = dict(previous.file_seconds) if previous else {}
+    for file, seconds in profile.file_seconds.items():
+        file_seconds[os.path.normpath(file)] = seconds
+    merged = CostProfile(
+        tool=profile.tool,
+        file_seconds=file_seconds,
+        method=profile.method,
+        updated_at=time.time(),
+    )
+
+    # Write to a temporary file first, a crash mustn't leave a truncated profile
+    target = _profile_path(path, profile.tool)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temporary = f"{target}.tmp"
+    with open(temporary, "w", encoding="utf-8") as profile_file:
+        profile_file.write(merged.model_dump_json(indent=2))
+    os.replace(temporary, target)
+    return merged
+
+
+def order_by_cost(files: List[str], profile: Optional[CostProfile]) -> List[str]:
+    """
+    Orders files most expensive first, so long-running files start early.
+    Files missing from the profile are assumed to cost the profile's average.
+
+    Args:
+        files (List[str]): The files to order.
+        profile (Optional[CostProfile]): The cost profile, None keeps the given order.
+
+    Returns:
+        List[str]: The ordered files.
+    """
+    if not profile or not profile.file_seconds:
+        return list(files)
+    average = profile.total_seconds / len(profile.file_seconds)
+    costs = {
+        os.path.normpath(file): seconds for file, seconds in profile.file_seconds.items()
+    }
+    return sorted(files, key=lambda f: -costs.get(os.path.normpath(f), average))
+
+
+def slowest_files(
+    file_seconds: Dict[str, float], limit: int = 20
+) -> List[Tuple[str, float]]:
+    """
+    Returns the most expensive files.
+
+    Args:
+        file_seconds (Dict[str, float]): Seconds spent on each file.
+        limit (int): Maximum number of files to return.
+
+    Returns:
+        List[Tuple[str, float]]: (file, seconds) pairs, slowest first.
+    """
+    return sorted(file_seconds.items(), key=lambda e: (-e[1], e[0]))[:limit]
+
+
+def suggest_exclusions(
+    file_seconds: Dict[str, float], min_share: float = 0.1, limit: int = 5
+) -> List[str]:
+    """
+    Suggests files worth excluding (or splitting) because they dominate the run time,
+    e.g. huge generated modules or files triggering heavy inference.
+
+    Args:
+        file_seconds (Dict[str, float]): Seconds spent on each file.
+        min_share (float): Minimum share of the total cost for a file to be suggested.
+        limit (int): Maximum number of suggestions.
+
+    Returns:
+        List[str]: The suggested files, slowest first.
+    """
+    total = sum(file_seconds.values())
+    # With a handful of files every file takes a large share, that isn't worth reporting
+    if not total or len(file_seconds) * min_share <= 1:
+        return []
+    return [
+        file
+        for file, seconds in slowest_files(file_seconds, limit)
+        if seconds / total >= min_share
+    ]
+
+
+def bisect_costs(
+    files: List[str],
+    run_shard: Callable[[List[str]], float],
+    overhead: float = 0.0,
+    min_shard_seconds: float = 1.0,
+    max_runs: int = 32,
+) -> Dict[str, float]:
+    """
+    Derives per-file costs from timed runs over shards of files.
+    A shard is split in halves and both halves are timed again as long as it's
+    more expensive than `min_shard_seconds`. The cost of a shard that isn't split
+    any further is spread evenly over its files.
+
+    Args:
+        files (List[str]): The files to profile. Ordering them by a previous cost
+            profile first isolates the expensive ones in fewer runs.
+        run_shard (Callable[[List[str]], float]): Analyzes a shard, returns the wall time.
+        overhead (float): Fixed start-up cost of a run, subtracted from every timing.
+        min_shard_seconds (float): Shards cheaper than this aren't split any further.
+        max_runs (int): Maximum number of timed runs.
+
+    Returns:
+        Dict[str, float]: Seconds attributed to each file.
+    """
+    file_seconds: Dict[str, float] = {}
+    if not files:
+        return file_seconds
+
+    # Each pending shard carries the per-file cost of its parent, used if the budget runs out
+    pending: List[Tuple[List[str], float]] = [(list(files), 0.0)]
+    runs = 0
+    while pending:
+        shard, inherited = pending.pop()
+        if runs >= max_runs:
+            for file in shard:
+                file_seconds[file] = inherited
+            continue
+
+        seconds = max(0.0, run_shard(shard) - overhead)
+        runs += 1
+        if len(shard) == 1 or seconds < min_shard_seconds:
+            for file in shard:
+                file_seconds[file] = seconds / len(shard)
+            continue
+
+        middle = len(shard) // 2
+        pending.append((shard[middle:], seconds / len(shard)))
+        pending.append((shard[:middle], seconds / len(shard)))
+
+    return file_seconds
+
+
+def time_pylint_shard(files: List[str], configuration: Optional[str] = None) -> float:
+    """
+    Runs Pylint as a subprocess on the files and measures the wall time.
+
+    Args:
+        files (List[str]): The files of the shard.
+        configuration (Optional[str]): Optional rcfile path.
+
+    Returns:
+        float: The wall time of the run in seconds.
+    """
+    pylint_command = ["pylint", "--jobs=1"]
+    if configuration:
+        pylint_command += ["--rcfile", configuration]
+    return run_governed([*pylint_command, *files]).seconds
+
+
+def measure_pylint_overhead(configuration: Optional[str] = None) -> float:
+    """
+    Measures the fixed start-up cost of a Pylint subprocess by linting an empty file.
+
+    Args:
+        configuration (Optional[str]): Optional rcfile path.
+
+    Returns:
+        float: The wall time of the run in seconds.
+    """
+    with tempfile.TemporaryDirectory(prefix="pylens-") as directory:
+        empty_file = os.path.join(directory, "empty.py")
+        with open(empty_file, "w", encoding="utf-8"):
+            pass
+        return time_pylint_shard([empty_file], configuration)
@@ -0,0 +1,106 @@
+"""
+tool/project.py
+
+Helpers to locate the project a path belongs to, the per-project pylens cache
+directory and the Python files under a path.
+"""
+
+import hashlib
+import os
+from typing import List
+
+# Files or directories marking the root of a project
+PROJECT_MARKERS = ("pyproject.toml", "setup.py", "setup.cfg", ".git")
+
+# Name of the cache directory created at the project root
+CACHE_DIRECTORY_NAME = ".pylens_cache"
+
+
+def find_project_root(path: str) -> str:
+    """
+    Finds the root of the project the path belongs to, i.e. the closest
+    ancestor containing one of PROJECT_MARKERS.
+
+    Args:
+        path (str): A file or directory inside the project.
+
+    Returns:
+        str: The absolute project root. Falls back to the path's own directory.
+    """
+    start = os.path.abspath(path)
+    if not os.path.isdir(start):
+        start = os.path.dirname(start)
+
+    current = start
+    while True:
+        if any(os.path.exists(os.path.join(current, m)) for m in PROJECT_MARKERS):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return start
+        current = parent
+
+
+def project_cache_dir(path: str, *parts: str) -> str:
+    """
+    Returns a pylens cache directory for the project of the path, without creating it.
+    The location is `<project root>/.pylens_cache` unless the PYLENS_CACHE_DIR
+    environment variable points somewhere else. Projects sharing PYLENS_CACHE_DIR
+    each get their own sub-directory, named after the project root.
+
+    Args:
+        path (str): A file or directory inside the project.
+        *parts (str): Sub-directories inside the cache directory (e.g. "mypy").
+
+    Returns:
+        str: The absolute cache directory.
+    """
+    root = find_project_root(path)
+    shared_dir = os.environ.get("PYLENS_CACHE_DIR")
+    if shared_dir:
+        digest = hashlib.sha256(root.encode()).hexdigest()[:12]
+        base = os.path.join(shared_dir, f"{os.path.basename(root) or 'root'}-{digest}")
+    else:
+        base = os.path.join(root, CACHE_DIRECTORY_NAME)
+    return os.path.abspath(os.path.join(base, *parts))
+
+
+def discover_python_files(path: str) -> List[str]:
+    """
+    Lists the Python files under the path, skipping hidden directories
+    (.git, .mypy_cache, ...) and bytecode caches.
+
+    Args:
+        path (str): A directory or a single file.
+
+    Returns:
+        List[str]: The Python files, sorted. A file path is returned as-is.
+    """
+    if not os.path.isdir(path):
+        return [path]
+
+    files: List[str] = []
+    for root, dirs, names in os.walk(path):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d != "__pycache__"]
+        files.extend(os.path.join(root, name) for name in names if name.endswith(".py"))
+    return sorted(files)
+
+
+def module_name_for(file: str) -> str:
+    """
+    Derives the dotted module name Python (and Mypy) uses for the file,
+    walking up through the enclosing packages (directories with an __init__.py).
+
+    Args:
+        file (str): Path of a Python file.
+
+    Returns:
+        str: The module name, e.g. "pkg.sub.mod" for pkg/sub/mod.py.
+    """
+    directory, name = os.path.split(os.path.abspath(file))
+    stem = os.path.splitext(name)[0]
+    parts = [] if stem == "__init__" else [stem]
+    while os.path.exists(os.path.join(directory, "__init__.py")):
+        directory, package = os.path.split(directory)
+        parts.insert(0, package)
+    return ".".join(parts)
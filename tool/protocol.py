@@ -0,0 +1,87 @@
+"""
+tool/protocol.py
+
+Wire format shared by the pylens server (server.py) and its thin client (client.py).
+Every connection carries exactly one request and one response, each encoded as
+a single line of JSON over a Unix domain socket.
+"""
+
+import os
+import socket
+import tempfile
+from typing import List, Optional
+from pydantic import BaseModel
+from tool.pylint_runner import PylintResult
+from tool.mypy_runner import MypyResult
+from tool.mypy_cache import MypyCacheSettings
+from tool.run_stats import RunStats
+
+# One socket per user, so several users on a shared host don't collide.
+DEFAULT_SOCKET_PATH = os.path.join(
+    tempfile.gettempdir(), f"pylens-{os.getuid()}.sock"
+)
+
+SUPPORTED_TOOLS = ("pylint", "mypy")
+
+
+class AnalysisRequest(BaseModel):
+    """
+    A request sent by the client to analyze a path.
+
+    - tool: The code quality tool to use ("pylint" or "mypy").
+    - path: Path to the directory or file to analyze.
+    - configuration: Optional configuration file path for the tool.
+    - cwd: The client's working directory, relative paths are resolved against it.
+    - mypy_cache: Options for the managed Mypy cache.
+    """
+
+    tool: str
+    path: str
+    configuration: Optional[str] = None
+    cwd: str
+    mypy_cache: MypyCacheSettings = MypyCacheSettings()
+
+
+class AnalysisResponse(BaseModel):
+    """
+    The server's answer to an AnalysisRequest.
+
+    - ok: Whether the analysis succeeded.
+    - error: The error message if the analysis failed.
+    - cached: Whether the results were served without re-running the tool.
+    - pylint_results / overall_score: Filled in for Pylint requests.
+    - mypy_results: Filled in for Mypy requests.
+    - run_stats: Statistics of the run, None when the results came from memory.
+    """
+
+    ok: bool
+    error: Optional[str] = None
+    cached: bool = False
+    pylint_results: List[PylintResult] = []
+    overall_score: Optional[float] = None
+    mypy_results: List[MypyResult] = []
+    run_stats: Optional[RunStats] = None
+
+
+def send_line(connection: socket.socket, payload: str):
+    """Sends one newline-terminated message over the connection."""
+    connection.sendall(payload.encode("utf-8") + b"\n")
+
+
+def receive_line(connection: socket.socket) -> str:
+    """
+    Reads one newline-terminated message from the connection.
+
+    Raises:
+        ConnectionError: If the peer closed the connection before a full line arrived.
+    """
+    chunks = []
+    while True:
+        chunk = connection.recv(65536)
+        if not chunk:
+            raise ConnectionError("Connection closed before a full message arrived.")
+        newline = chunk.find(b"\n")
+        if newline != -1:
+            chunks.append(chunk[:newline])
+            return b"".join(chunks).decode("utf-8")
+        chunks.append(chunk)
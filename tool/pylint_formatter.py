@@ -6,7 +6,7 @@ using `rich` for better output formatting.
 Currently, it shows the summary of the results and detailed results for each file.
 """
 
-from typing import List, Dict
+from typing import List, Dict, Optional
 from rich.table import Table, box
 from rich.console import Console
 from tool.pylint_runner import PylintResult
@@ -15,18 +15,22 @@ console = Console()
 
 
 def format_summary(
-    results: List[PylintResult], overall_score: float, with_numbering: bool = False
+    results: List[PylintResult],
+    overall_score: Optional[float],
+    with_numbering: bool = False,
 ) -> Dict[int, str]:
     """
     Formats and displays the summary of pylint results.
 
     Args:
         results (List[PylintResult]): List of pylint results.
-        overall_score (float): The overall score from Pylint.
+        overall_score (Optional[float]): The overall score from Pylint, None if the run
+            timed out before Pylint printed it.
         with_numbering (bool): Whether to number files for selection.
 
     Returns:
-        Dict[int, str]: Mapping of numbers to file names if with_numbering is True.
+        Dict[int, str]: Mapping of numbers to file paths if with_numbering is True
+        (module file names don't tell e.g. d1/util.py and d2/util.py apart).
     """
     file_mapping = {}
     table = Table(
@@ -46,7 +50,7 @@ def format_summary(
 
     for idx, result in enumerate(results, start=1):
         counts = result.message_counts
-        file_mapping[idx] = result.file
+        file_mapping[idx] = result.path or result.file
         table.add_row(
             str(idx) if with_numbering else "",
             result.file,
@@ -59,7 +63,10 @@ def format_summary(
         )
 
     console.print(table)
-    console.print(f"\n[bold green]Overall Score: {overall_score}/10[/bold green]")
+    if overall_score is None:
+        console.print("\n[bold yellow]Overall Score: no score (timed out)[/bold yellow]")
+    else:
+        console.print(f"\n[bold green]Overall Score: {overall_score}/10[/bold green]")
     return file_mapping
 
 
@@ -76,12 +83,14 @@ def format_detailed_results(results: List[PylintResult]):
         table = Table(show_header=True, header_style="bold cyan", box=box.MINIMAL)
         table.add_column("Line", style="dim", justify="right")
         table.add_column("Category", style="bold green", justify="center")
+        table.add_column("Code", style="magenta")
         table.add_column("Message", style="bold white")
 
         for issue in result.issues:
             table.add_row(
                 str(issue.line),
                 issue.category,
+                f"{issue.code} ({issue.symbol})" if issue.symbol else issue.code,
                 issue.message,
             )
 
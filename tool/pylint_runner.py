@@ -7,10 +7,18 @@ Those objects will be used by the output_formatter.py to display the results
 in a more readable format using the rich library.
 """
 
+import glob
+import io
 import os
-import subprocess
-from typing import List, Dict, Tuple, Optional
-from pydantic import BaseModel
+import re
+import time
+from operator import itemgetter
+from typing import Any, List, Dict, Sequence, Tuple, Optional
+from pydantic import BaseModel, field_serializer
+from tool.fast_construct import construct_all
+from tool.run_stats import RunStats, timed_phase
+from tool.governor import run_governed
+from tool.profiling import load_cost_profile, order_by_cost
 
 
 class PylintIssue(BaseModel):
@@ -21,11 +29,15 @@ class PylintIssue(BaseModel):
     - line: The line number where the issue was found.
     - category: The category of the issue (Convention, Refactor, Warning, Error, Fatal).
     - message: The message describing the issue.
+    - code: The message code (e.g. "C0114"), empty if Pylint didn't print one.
+    - symbol: The symbolic name of the message (e.g. "missing-module-docstring").
     """
 
     line: int
     category: str
     message: str
+    code: str = ""
+    symbol: str = ""
 
 
 class PylintResult(BaseModel):
@@ -33,13 +45,19 @@ class PylintResult(BaseModel):
     Stores Pylint result for a single file.
     It includes the following fields:
     - file: The name of the file.
-    - issues: A list of PylintIssue objects.
+    - issues: The PylintIssue objects (built on first access for loaded snapshots).
     - message_counts: A dictionary containing the count of issues for each category.
+    - path: The path of the file as reported by Pylint, if any issue line showed it.
     """
 
     file: str
-    issues: List[PylintIssue]
+    issues: Sequence[PylintIssue]
     message_counts: Dict[str, int]
+    path: Optional[str] = None
+
+    @field_serializer("issues", mode="wrap")
+    def _serialize_issues(self, issues: Sequence[PylintIssue], handler):
+        return handler(issues if isinstance(issues, list) else list(issues))
 
 
 CATEGORY_MAPPING = {
@@ -50,125 +68,386 @@ CATEGORY_MAPPING = {
     "F": "Fatal",
 }
 
+# Number of most expensive files (per the cost profile) handed to Pylint ahead of the path
+EXPENSIVE_FILES_FIRST = 32
+
+# Splits "C0114: Missing module docstring (missing-module-docstring)"
+# into the message code, the message text and the symbol.
+MESSAGE_PATTERN = re.compile(
+    r"^(?P<code>[A-Z]\d{4}): (?P<text>.*?)(?: \((?P<symbol>[a-z0-9-]+)\))?$"
+)
+
+# Tokenizes Pylint's text output in a single pass over the whole output, one match
+# per relevant line (everything else is skipped by the regex engine):
+# - module headers: "************* Module package.module"
+# - issues: "path:line:column: C0114: Missing module docstring (missing-module-docstring)",
+#   split into the code, text and symbol right away in the common case, any other
+#   message is left for split_pylint_message
+# - the score: "Your code has been rated at 5.85/10 (previous run: ...)"
+PYLINT_TOKEN_PATTERN = re.compile(
+    r"""
+    ^(?:
+        \*{13}\ Module\ (?:[^\n]*[ \t])?(?P<module>\S+)[ \t]*
+      | (?P<path>[^:\n]*):[ \t]*(?P<line>\d+)[ \t]*:[^:\n]*:[ \t]*
+        (?:
+            (?P<code>[A-Z]\d{4}):\ (?P<text>[^\n]*)\ \((?P<symbol>[a-z0-9-]+)\)
+          | (?P<message>[^\n]*?)
+        )[ \t]*
+      | Your\ code\ has\ been\ rated\ at\ (?P<score>[^\s/]+)/[^\n]*
+    )$
+    """,
+    re.MULTILINE | re.VERBOSE,
+)
+
+
+def split_pylint_message(message: str) -> Tuple[str, str, str]:
+    """
+    Splits a Pylint message into its code, text and symbol.
+
+    Args:
+        message (str): The message part of an issue line.
+
+    Returns:
+        Tuple[str, str, str]: The code, the text and the symbol.
+        The code and symbol are empty if the message doesn't carry them.
+    """
+    match = MESSAGE_PATTERN.match(message)
+    if not match:
+        return "", message, ""
+    return match.group("code"), match.group("text"), match.group("symbol") or ""
+
+
+def expand_pylint_target(path: str) -> str:
+    """
+    Turns a user-provided path into a target Pylint accepts.
+
+    If path ends with "/"(meaning whole directory), or
+       path ends without "*.py"(meaning a single file),
+    "**/*.py" is appended to the path to include all python files, in the
+    sub-directories too (Pylint expands the glob recursively, skipping hidden ones).
+    Issue: https://stackoverflow.com/questions/48024049/pylint-raises-error-if-directory-doesnt-contain-init-py-file
+
+    Args:
+        path (str): The path given by the user.
+
+    Returns:
+        str: The path (or glob) that will be handed to Pylint.
+    """
+    if path.endswith("/"):
+        return path + "**/*.py"
+    if not path.endswith(".py"):
+        return path + "/**/*.py"
+    return path
+
+
+def pylint_files(path: str) -> List[str]:
+    """Lists the files Pylint checks for the path, sorted."""
+    return sorted(glob.glob(expand_pylint_target(path), recursive=True))
+
+
+def pylint_targets(path: str) -> List[str]:
+    """
+    Lists what to hand to Pylint for a path. With a Pylint cost profile of the
+    project, its most expensive files are listed ahead of the path: Pylint checks
+    its arguments in order (each file once), so its parallel jobs don't end the run
+    on a long file. Only a few are listed, the command line of a large tree would
+    get too long.
+
+    Args:
+        path (str): The path given by the user.
+
+    Returns:
+        List[str]: The targets for Pylint.
+    """
+    target = expand_pylint_target(path)
+    profile = load_cost_profile(path, "pylint")
+    if profile is None or target == path:
+        return [target]
+    return [*order_by_cost(pylint_files(path), profile)[:EXPENSIVE_FILES_FIRST], target]
+
+
+def build_pylint_args(path: str, configuration: Optional[str] = None) -> List[str]:
+    """
+    Builds the Pylint arguments (without the executable) for a single path.
+
+    Args:
+        path (str): Path to inspect.
+        configuration (Optional[str]): Optional rcfile path.
+
+    Returns:
+        List[str]: The arguments for Pylint.
+    """
+    if configuration:
+        return ["--rcfile", configuration, *pylint_targets(path)]
+    return pylint_targets(path)
+
+
+def count_pylint_files(path: str) -> int:
+    """Returns the number of files Pylint checks for the path."""
+    return len(pylint_files(path))
+
+
+def parse_pylint_output(output: str) -> Tuple[List[PylintResult], Optional[float]]:
+    """
+    Parses the text output of Pylint into structured data.
+    Results are keyed by the path of the issue lines: the module headers only name
+    the module, which is the same for e.g. d1/util.py and d2/util.py outside packages.
+
+    Args:
+        output (str): The raw output from Pylint.
+
+    Returns:
+        Tuple[List[PylintResult], Optional[float]]: The Pylint results and the overall score
+        (None if Pylint didn't report one).
+    """
+    results = []
+    overall_score = None
+    # The issues' fields, the tokenizer already guarantees their types
+    files_data: Dict[str, List[Dict[str, Any]]] = {}
+    message_counts: Dict[str, Dict[str, int]] = {}
+    file_names: Dict[str, str] = {}
+    current_file = None
+    current_path = None
+    current_issues: List[Dict[str, Any]] = []
+    current_counts: Dict[str, int] = {}
+
+    for match in PYLINT_TOKEN_PATTERN.finditer(output):
+        module, path, line, code, text, symbol, message, score = match.groups()
+
+        if module is not None:
+            current_file = module + ".py"  # Add extension ".py"
+            current_path = None
+
+        elif line is not None:
+            if current_file is None:
+                continue
+            if path != current_path:
+                current_path = path
+                if path not in files_data:
+                    file_names[path] = current_file
+                    files_data[path] = []
+                    message_counts[path] = {cat: 0 for cat in CATEGORY_MAPPING.values()}
+                current_issues = files_data[path]
+                current_counts = message_counts[path]
+            if code is None:
+                code, text, symbol = split_pylint_message(message)
+            if code:
+                category_name = CATEGORY_MAPPING.get(code[0], "Unknown")
+            else:
+                # Without a message code, the category comes from the message itself
+                head = message.split(":", 1)[0].strip()
+                category_name = CATEGORY_MAPPING.get(head[:1], "Unknown")
+
+            current_issues.append(
+                {
+                    "line": int(line),
+                    "category": category_name,
+                    "message": text,
+                    "code": code,
+                    "symbol": symbol,
+                }
+            )
+            current_counts[category_name] += 1
+
+        elif score is not None:
+            try:
+                overall_score = float(score)
+            except ValueError:
+                pass
+
+    # Collect results
+    for path, issues in files_data.items():
+        results.append(
+            PylintResult(
+                file=file_names[path],
+                issues=construct_all(
+                    PylintIssue, sorted(issues, key=itemgetter("line"))
+                ),  # Sort issues(PylintIssue) by line number(PyLintIssue.line)
+                message_counts=message_counts[path],
+                path=path,
+            )
+        )
+
+    return results, overall_score
+
 
 def run_pylint(
-    paths: List[str], configuration: Optional[str] = None
-) -> Tuple[List[PylintResult], float]:
+    paths: List[str],
+    configuration: Optional[str] = None,
+    run_stats: Optional[RunStats] = None,
+) -> Tuple[List[PylintResult], Optional[float]]:
     """
     Runs Pylint on the provided paths and parses the output.
 
     Args:
         paths (List[str]): List of paths to inspect.
+        configuration (Optional[str]): Optional rcfile path.
+        run_stats (Optional[RunStats]): If given, filled in with the phase timings
+            and whether the run timed out.
 
     Returns:
-        Tuple[List[PylintResult], float]: A list of Pylint results and the overall score.
+        Tuple[List[PylintResult], Optional[float]]: A list of Pylint results and the
+        overall score (None if the run timed out before Pylint printed it).
+
+    Raises:
+        FileNotFoundError: If the rcfile doesn't exist or Pylint is not installed.
+        RuntimeError: If Pylint failed to run, or timed out before reporting any module.
     """
+    # Check if the given configuration file exists
+    if configuration and not os.path.exists(configuration):
+        raise FileNotFoundError(f"Configuration file '{configuration}' not found.")
+
     results = []
     overall_score = None
+    timed_out = False
 
     for path in paths:
         try:
-            # Check if the given configuration file exists
-            if configuration and not os.path.exists(configuration):
-                raise FileNotFoundError(
-                    f"Configuration file '{configuration}' not found."
+            # Run pylint on the path
+            pylint_command = ["pylint", *build_pylint_args(path, configuration)]
+
+            # Unbuffered, so a run killed by the timeout still yields the modules it finished
+            with timed_phase(run_stats, "run"):
+                result = run_governed(
+                    pylint_command, env={**os.environ, "PYTHONUNBUFFERED": "1"}
                 )
+            if result.timed_out:
+                timed_out = True
+            elif result.returncode is not None and result.returncode & 32:
+                # Bit 32 of Pylint's exit code flags a usage error, nothing was checked
+                raise RuntimeError(f"Pylint execution failed:\n{result.stderr}")
 
-            # If path ends with "/"(meaning whole directory), or
-            #    path ends without "*.py"(meaning a single file),
-            # append "*.py" to the path to include all python files
-            # Issue: https://stackoverflow.com/questions/48024049/pylint-raises-error-if-directory-doesnt-contain-init-py-file
-            if path.endswith("/"):
-                path += "*.py"
-            elif not path.endswith(".py"):
-                path += "/*.py"
+            # Parse the output
+            with timed_phase(run_stats, "parse"):
+                path_results, path_score = parse_pylint_output(result.stdout)
+            results.extend(path_results)
+            if path_score is not None:
+                overall_score = path_score
 
-            # Run pylint on the path
-            if configuration:
-                print(f"Using configuration file: {configuration}")
-                pylint_command = ["pylint", "--rcfile", configuration, path]
-            else:
-                pylint_command = ["pylint", path]
+        except FileNotFoundError as error:
+            raise FileNotFoundError("Pylint is not installed.") from error
 
-            result = subprocess.run(pylint_command, capture_output=True, text=True)
+    if run_stats is not None:
+        run_stats.files_analyzed = sum(count_pylint_files(path) for path in paths)
+        run_stats.timed_out = run_stats.timed_out or timed_out
 
-            # Parse the output
-            stdout_lines = result.stdout.splitlines()
-            files_data = {}
-            message_counts = {}
-            current_file = None
-
-            for line in stdout_lines:
-                # Match overall score
-                if "Your code has been rated at" in line:
-                    overall_score = float(line.split("/")[0].split()[-1])
-
-                # Match file headers
-                if line.startswith("************* Module"):
-                    current_file = line.split()[-1] + ".py"  # Add extension ".py"
-                    files_data[current_file] = []
-                    message_counts[current_file] = {
-                        cat: 0 for cat in CATEGORY_MAPPING.values()
-                    }
-
-                # Match issue lines
-                elif current_file and ":" in line:
-                    parts = line.split(":", maxsplit=3)
-                    if len(parts) == 4:
-                        # Obtain the category name from the category letter by parsing each line
-                        _, line_number, _, message = parts
-
-                        # For some reasons, there exists a case that the proper
-                        # data parsing isn't shown due to internal errors within code.
-                        if not line_number.strip().isdigit():
-                            # Skip invalid case for usability
-                            continue
-
-                        # Ensure that the message is nonempty.
-                        if message.strip():
-                            code_parts = message.split(":")
-                            if code_parts and code_parts[0].strip():
-                                code = code_parts[0].strip()
-                                category_letter = (
-                                    code[0]
-                                    if code and code[0] in CATEGORY_MAPPING
-                                    else "U"
-                                )
-                            else:
-                                category_letter = "U"
-                        else:
-                            # If the message is empty, set the category to "Unknown"
-                            # because it was unable to process the data normally.
-                            category_letter = "U"
-
-                        category_name = CATEGORY_MAPPING.get(category_letter, "Unknown")
-
-                        issue = PylintIssue(
-                            line=int(line_number.strip()),
-                            category=category_name,
-                            message=message.strip(),
-                        )
-                        files_data[current_file].append(issue)
-                        message_counts[current_file][category_name] += 1
-
-            # Collect results
-            for file, issues in files_data.items():
-                results.append(
-                    PylintResult(
-                        file=file,
-                        issues=sorted(
-                            issues, key=lambda i: i.line
-                        ),  # Sort issues(PylintIssue) by line number(PyLintIssue.line)
-                        message_counts=message_counts[file],
-                    )
+    # Nothing to show, the caller keeps whatever results it had
+    if timed_out and not results:
+        raise RuntimeError("Pylint timed out before it reported any module.")
+
+    # Pylint crashed (e.g. on a fatal error) before it could score the code,
+    # a run killed by the timeout simply never printed its score
+    if overall_score is None and not timed_out:
+        raise RuntimeError("Pylint didn't report a score, it failed to check the code.")
+
+    return results, overall_score
+
+
+def _timing_reporter(output: io.StringIO):
+    """
+    Creates a text reporter that also measures how long Pylint spends on each module.
+    Pylint announces every module it starts checking through `on_set_current_module`,
+    so a module's cost is the time until the next one (or the end of the run) starts.
+    """
+    # pylint: disable=import-outside-toplevel
+    from pylint.reporters.text import TextReporter
+
+    class TimingTextReporter(TextReporter):
+        """A TextReporter recording the wall time spent on each module."""
+
+        def __init__(self, out: io.StringIO):
+            super().__init__(out)
+            self.file_seconds: Dict[str, float] = {}
+            self._current_file: Optional[str] = None
+            self._started_at = 0.0
+
+        def _stop_clock(self):
+            if self._current_file is not None:
+                elapsed = time.perf_counter() - self._started_at
+                self.file_seconds[self._current_file] = (
+                    self.file_seconds.get(self._current_file, 0.0) + elapsed
                 )
+                self._current_file = None
 
-        except FileNotFoundError:
-            print(
-                "Error: Pylint is not installed or the provided configuration file does not exist."
-            )
+        def on_set_current_module(self, module: str, filepath: Optional[str]) -> None:
+            self._stop_clock()
+            super().on_set_current_module(module, filepath)
+            if filepath:
+                self._current_file = filepath
+                self._started_at = time.perf_counter()
+
+        def on_close(self, stats, previous_stats) -> None:
+            self._stop_clock()
+            super().on_close(stats, previous_stats)
+
+    return TimingTextReporter(output)
+
+
+def run_pylint_in_process(
+    paths: List[str],
+    configuration: Optional[str] = None,
+    run_stats: Optional[RunStats] = None,
+    time_files: bool = False,
+) -> Tuple[List[PylintResult], float]:
+    """
+    Runs Pylint inside the current interpreter instead of a subprocess.
+    Astroid's module cache survives between calls, so repeated runs from a
+    long-lived process (e.g. the pylens server) skip most of the start-up work.
+
+    Args:
+        paths (List[str]): List of paths to inspect.
+        configuration (Optional[str]): Optional rcfile path.
+        run_stats (Optional[RunStats]): If given, filled in with the phase (and per-file) timings.
+        time_files (bool): Whether to measure the time spent on each file.
+            Forces a single job, parallel workers can't be timed per module.
+
+    Returns:
+        Tuple[List[PylintResult], float]: A list of Pylint results and the overall score.
+
+    Raises:
+        FileNotFoundError: If the rcfile doesn't exist.
+        RuntimeError: If Pylint didn't report a score, it failed to check the code.
+    """
+    # Imported lazily, the subprocess path doesn't need pylint to be importable
+    from pylint.lint import Run  # pylint: disable=import-outside-toplevel
+    from pylint.reporters.text import (  # pylint: disable=import-outside-toplevel
+        TextReporter,
+    )
+
+    if configuration and not os.path.exists(configuration):
+        raise FileNotFoundError(f"Configuration file '{configuration}' not found.")
+
+    results = []
+    overall_score = None
+    for path in paths:
+        output = io.StringIO()
+        with timed_phase(run_stats, "run"):
+            if time_files:
+                reporter = _timing_reporter(output)
+                Run(
+                    ["--jobs=1", *build_pylint_args(path, configuration)],
+                    reporter=reporter,
+                    exit=False,
+                )
+                if run_stats is not None:
+                    run_stats.file_seconds.update(reporter.file_seconds)
+            else:
+                Run(
+                    build_pylint_args(path, configuration),
+                    reporter=TextReporter(output),
+                    exit=False,
+                )
+        with timed_phase(run_stats, "parse"):
+            path_results, path_score = parse_pylint_output(output.getvalue())
+        results.extend(path_results)
+        if path_score is not None:
+            overall_score = path_score
+
+    if run_stats is not None:
+        run_stats.files_analyzed = sum(count_pylint_files(path) for path in paths)
 
-    # Generally this can't happen, just to be sure and pass the pyright static anlaysis
-    assert overall_score is not None, "Overall score must be calculated."
+    # Nothing can time out in-process, a missing score means Pylint failed
+    if overall_score is None:
+        raise RuntimeError("Pylint didn't report a score, it failed to check the code.")
 
     return results, overall_score
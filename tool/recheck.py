@@ -0,0 +1,109 @@
+"""
+tool/recheck.py
+
+Splices the results of a single rechecked file into the results of a whole run,
+and updates the Pylint score incrementally instead of re-analyzing everything.
+"""
+
+import os
+from typing import List, Optional, TypeVar, Union
+from tool.pylint_runner import PylintResult
+from tool.mypy_runner import MypyResult
+
+ResultT = TypeVar("ResultT", PylintResult, MypyResult)
+
+# Weights of Pylint's default evaluation:
+# 10.0 - ((5 * error + warning + refactor + convention) / statement) * 10
+PENALTY_WEIGHTS = {"Error": 5, "Warning": 1, "Refactor": 1, "Convention": 1}
+
+
+def result_path(result: Union[PylintResult, MypyResult]) -> str:
+    """
+    Returns the path of the file a result belongs to.
+    Pylint results are named after the module, the path comes from the issue lines.
+    """
+    if isinstance(result, PylintResult):
+        return os.path.normpath(result.path or result.file)
+    return os.path.normpath(result.file)
+
+
+def find_result(results: List[ResultT], file_path: str) -> Optional[ResultT]:
+    """
+    Finds the result of the given file.
+
+    Args:
+        results (List[ResultT]): Results of a run.
+        file_path (str): Path of the file.
+
+    Returns:
+        Optional[ResultT]: The file's result, None if the file has no issues.
+    """
+    file_path = os.path.normpath(file_path)
+    return next((r for r in results if result_path(r) == file_path), None)
+
+
+def splice_results(
+    results: List[ResultT], old: ResultT, new: Optional[ResultT]
+) -> List[ResultT]:
+    """
+    Replaces a file's result with its rechecked one, keeping the order of the files.
+
+    Args:
+        results (List[ResultT]): Results of the whole run.
+        old (ResultT): The file's result before the recheck.
+        new (Optional[ResultT]): The file's result after the recheck, None if it has no issues left.
+
+    Returns:
+        List[ResultT]: The updated results.
+    """
+    spliced = []
+    for result in results:
+        if result is old:
+            if new is not None:
+                spliced.append(new)
+        else:
+            spliced.append(result)
+    return spliced
+
+
+def pylint_penalty(result: PylintResult) -> int:
+    """The weighted issue count Pylint's default evaluation subtracts from the score."""
+    counts = result.message_counts
+    return sum(counts.get(category, 0) * w for category, w in PENALTY_WEIGHTS.items())
+
+
+def rescore_pylint(
+    overall_score: Optional[float],
+    results: List[PylintResult],
+    old: PylintResult,
+    new: Optional[PylintResult],
+) -> Optional[float]:
+    """
+    Estimates the new overall score after a single file was rechecked.
+    The statement count of the run is derived from its score and penalty, and is
+    assumed unchanged by the fix. This holds for Pylint's default evaluation only,
+    a full rerun gives the exact value.
+
+    Args:
+        overall_score (Optional[float]): The score of the whole run before the recheck,
+            None if the run timed out before Pylint printed it.
+        results (List[PylintResult]): Results of the whole run before the recheck.
+        old (PylintResult): The file's result before the recheck.
+        new (Optional[PylintResult]): The file's result after the recheck.
+
+    Returns:
+        Optional[float]: The estimated score, or the given one if it can't be estimated.
+    """
+    # A fatal message or a clamped score hides the statement count
+    if overall_score is None or any(r.message_counts.get("Fatal") for r in results):
+        return overall_score
+    penalty = sum(pylint_penalty(r) for r in results)
+    if penalty == 0 or not 0 < overall_score < 10:
+        return overall_score
+
+    if new is not None and new.message_counts.get("Fatal"):
+        return 0.0
+
+    statements = 10 * penalty / (10 - overall_score)
+    new_penalty = penalty - pylint_penalty(old) + (pylint_penalty(new) if new else 0)
+    return round(max(0.0, 10.0 - new_penalty / statements * 10), 2)
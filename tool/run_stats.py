@@ -0,0 +1,53 @@
+"""
+tool/run_stats.py
+
+Side information about a single analysis run.
+The runners fill in a RunStats object when one is passed to them, which keeps
+their return values (the results themselves) unchanged.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from pydantic import BaseModel
+from tool.mypy_cache import MypyCacheStats
+
+
+class RunStats(BaseModel):
+    """
+    Statistics collected while running a tool.
+
+    - tool: The tool that was run ("pylint" or "mypy").
+    - cache: How much of the incremental cache was reused (Mypy only).
+    - file_seconds: Time spent on each file, when per-file timing was requested.
+    - phase_seconds: Wall time of each phase of the run ("run", "parse", ...).
+    - files_analyzed: Number of files the tool checked, if known.
+    - timed_out: Whether a process was killed for exceeding its timeout (results are incomplete).
+    """
+
+    tool: str
+    cache: Optional[MypyCacheStats] = None
+    file_seconds: Dict[str, float] = {}
+    phase_seconds: Dict[str, float] = {}
+    files_analyzed: Optional[int] = None
+    timed_out: bool = False
+
+
+@contextmanager
+def timed_phase(run_stats: Optional[RunStats], phase: str) -> Iterator[None]:
+    """
+    Adds the wall time of the enclosed block to a phase of the run.
+
+    Args:
+        run_stats (Optional[RunStats]): The statistics to fill in, nothing is recorded if None.
+        phase (str): Name of the phase.
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        if run_stats is not None:
+            elapsed = time.perf_counter() - started_at
+            run_stats.phase_seconds[phase] = (
+                run_stats.phase_seconds.get(phase, 0.0) + elapsed
+            )
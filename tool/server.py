@@ -0,0 +1,439 @@
+"""
+tool/server.py
+
+A persistent pylens server that keeps one warm worker process per tool.
+Each worker imports Pylint/Mypy once and keeps their in-memory caches
+(astroid's module cache, typeshed, ...) alive between requests, so editor
+integrations and git hooks don't pay the interpreter start-up cost every time.
+Requests arrive over a Unix domain socket, see protocol.py for the wire format.
+"""
+
+import abc
+import multiprocessing
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from collections import OrderedDict
+from multiprocessing.connection import Connection
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from pydantic import ValidationError
+from tool.protocol import (
+    DEFAULT_SOCKET_PATH,
+    SUPPORTED_TOOLS,
+    AnalysisRequest,
+    AnalysisResponse,
+    receive_line,
+    send_line,
+)
+from tool.project import discover_python_files
+from tool.metrics import MetricsRegistry, collect_metrics
+from tool.governor import apply_limits, get_default_limits, set_idle_io
+
+# Fingerprint of a tree: absolute file path -> (mtime in ns, size in bytes)
+Fingerprint = Dict[str, Tuple[int, int]]
+
+# Number of (tool, path) pairs a worker keeps the last results of
+MEMO_SIZE = 32
+
+
+def stat_files(files: Iterable[str]) -> Fingerprint:
+    """
+    Stats the files, skipping those that don't exist (anymore).
+
+    Args:
+        files (Iterable[str]): The files to stat.
+
+    Returns:
+        Fingerprint: A mapping of absolute file paths to their (mtime, size).
+    """
+    fingerprint: Fingerprint = {}
+    for file in files:
+        try:
+            stat = os.stat(file)
+        except OSError:
+            continue
+        fingerprint[os.path.abspath(file)] = (stat.st_mtime_ns, stat.st_size)
+    return fingerprint
+
+
+def fingerprint_tree(path: str, configuration: Optional[str] = None) -> Fingerprint:
+    """
+    Stats every Python file under the path (and the configuration file).
+
+    Args:
+        path (str): Path to the directory or file to analyze.
+        configuration (Optional[str]): Optional configuration file path.
+
+    Returns:
+        Fingerprint: A mapping of absolute file paths to their (mtime, size).
+    """
+    candidates = discover_python_files(path)
+    if configuration:
+        candidates.append(configuration)
+    return stat_files(candidates)
+
+
+class _MemoEntry(NamedTuple):
+    """
+    The last results of a (tool, path) pair.
+
+    - request: The whole request, every field of it affects the results.
+    - fingerprint: The tree and the dependencies as they were when the tool ran.
+    - dependencies: Files outside the tree the tool loaded (imported libraries, stubs, ...).
+    - response: The response of the run.
+    """
+
+    request: str
+    fingerprint: Fingerprint
+    dependencies: List[str]
+    response: AnalysisResponse
+
+
+class _Analyzer(abc.ABC):
+    """
+    Runs one tool in-process and memoizes the last response per (tool, path),
+    in a bounded LRU. A response is served again while the request is the same and
+    neither the tree nor the files the tool loaded from outside it changed.
+    """
+
+    def __init__(self):
+        self._memo: "OrderedDict[Tuple[str, str], _MemoEntry]" = OrderedDict()
+
+    def analyze(self, request: AnalysisRequest) -> AnalysisResponse:
+        """Answers the request, re-running the tool only if the files it read changed."""
+        os.chdir(request.cwd)
+        key = (request.tool, os.path.abspath(request.path))
+        request_json = request.model_dump_json()
+        tree = fingerprint_tree(request.path, request.configuration)
+
+        previous = self._memo.pop(key, None)
+        fingerprint = dict(tree)
+        if previous:
+            fingerprint.update(stat_files(previous.dependencies))
+            if previous.request == request_json and previous.fingerprint == fingerprint:
+                self._memo[key] = previous
+                return previous.response.model_copy(
+                    update={"cached": True, "run_stats": None}
+                )
+
+        changed = set(fingerprint.keys())
+        layout_changed = False
+        if previous:
+            changed = {
+                file
+                for file in changed | set(previous.fingerprint.keys())
+                if previous.fingerprint.get(file) != fingerprint.get(file)
+            }
+            layout_changed = fingerprint.keys() != previous.fingerprint.keys()
+        self.invalidate(changed, layout_changed)
+
+        response, loaded_files = self.run(request)
+        dependencies = sorted(
+            file for file in map(os.path.abspath, loaded_files) if file not in tree
+        )
+        # Files loaded for the first time are stated now, the others as of before the run
+        fingerprint.update(
+            stat_files(file for file in dependencies if file not in fingerprint)
+        )
+        self._memo[key] = _MemoEntry(
+            request=request_json,
+            fingerprint={
+                file: stat
+                for file, stat in fingerprint.items()
+                if file in tree or file in dependencies
+            },
+            dependencies=dependencies,
+            response=response,
+        )
+        if len(self._memo) > MEMO_SIZE:
+            self._memo.popitem(last=False)
+        return response
+
+    def invalidate(self, changed_files: Set[str], layout_changed: bool):
+        """
+        Drops in-memory state derived from the changed files.
+
+        Args:
+            changed_files (Set[str]): The files modified, added or removed since the last run.
+            layout_changed (bool): Whether files were added or removed, imports may
+                then resolve to other files than before.
+        """
+
+    @abc.abstractmethod
+    def run(self, request: AnalysisRequest) -> Tuple[AnalysisResponse, List[str]]:
+        """Runs the tool for the request, returns the response and every file it loaded."""
+
+
+class _PylintAnalyzer(_Analyzer):
+    """Keeps Pylint and astroid loaded between requests."""
+
+    def __init__(self):
+        super().__init__()
+        # Pre-warm: importing pylint bootstraps astroid's builtins and brain plugins
+        import pylint.lint  # pylint: disable=import-outside-toplevel,unused-import
+
+    def invalidate(self, changed_files: Set[str], layout_changed: bool):
+        # astroid caches parsed modules by name and would happily hand back
+        # the stale tree of a file that was edited since the previous request.
+        # pylint: disable=import-outside-toplevel
+        from astroid import MANAGER
+        from astroid.context import InferenceContext
+        from astroid.inference_tip import clear_inference_tip_cache
+
+        if layout_changed:
+            # astroid also remembers where every import resolved to, start over
+            MANAGER.clear_cache()
+            return
+        if not changed_files:
+            return
+        for name, module in list(MANAGER.astroid_cache.items()):
+            if module.file and os.path.abspath(module.file) in changed_files:
+                del MANAGER.astroid_cache[name]
+        # The unchanged modules stay parsed, but what was inferred through the
+        # replaced trees goes (`inferred` is the global inference cache)
+        clear_inference_tip_cache()
+        InferenceContext().inferred.clear()
+
+    def run(self, request: AnalysisRequest) -> Tuple[AnalysisResponse, List[str]]:
+        # pylint: disable=import-outside-toplevel
+        from astroid import MANAGER
+        from tool.pylint_runner import run_pylint_in_process
+        from tool.run_stats import RunStats
+
+        run_stats = RunStats(tool="pylint")
+        results, overall_score = run_pylint_in_process(
+            [request.path], configuration=request.configuration, run_stats=run_stats
+        )
+        response = AnalysisResponse(
+            ok=True,
+            pylint_results=results,
+            overall_score=overall_score,
+            run_stats=run_stats,
+        )
+        return response, [
+            module.file for module in MANAGER.astroid_cache.values() if module.file
+        ]
+
+
+class _MypyAnalyzer(_Analyzer):
+    """Keeps Mypy loaded between requests, its incremental cache does the rest."""
+
+    def __init__(self):
+        super().__init__()
+        import mypy.api  # pylint: disable=import-outside-toplevel,unused-import
+
+    def run(self, request: AnalysisRequest) -> Tuple[AnalysisResponse, List[str]]:
+        # pylint: disable=import-outside-toplevel
+        from tool.mypy_runner import run_mypy_in_process
+        from tool.run_stats import RunStats
+
+        run_stats = RunStats(tool="mypy")
+        graph_files: List[str] = []
+        results = run_mypy_in_process(
+            request.path,
+            configuration=request.configuration,
+            cache_settings=request.mypy_cache,
+            run_stats=run_stats,
+            graph_files=graph_files,
+        )
+        response = AnalysisResponse(ok=True, mypy_results=results, run_stats=run_stats)
+        return response, graph_files
+
+
+def _worker_main(tool: str, connection: Connection):
+    """
+    Entry point of a worker process. Serves requests from the pipe until it closes.
+
+    Args:
+        tool (str): The tool this worker is dedicated to.
+        connection (Connection): The worker's end of the pipe.
+    """
+    analyzer = _PylintAnalyzer() if tool == "pylint" else _MypyAnalyzer()
+    while True:
+        try:
+            payload = connection.recv()
+        except EOFError:
+            return
+
+        try:
+            response = analyzer.analyze(AnalysisRequest.model_validate(payload))
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            # Never let one bad request take the warm worker down
+            response = AnalysisResponse(
+                ok=False, error=f"{type(error).__name__}: {error}"
+            )
+        connection.send(response.model_dump())
+
+
+class ToolWorker:
+    """
+    Owns the warm worker process of a single tool.
+    Requests to the same tool are serialized, the tools themselves aren't thread-safe.
+    The worker runs within the default resource limits of the governor, and is
+    restarted when a request exceeds the timeout.
+    """
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self._lock = threading.Lock()
+        self._connection: Optional[Connection] = None
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._start()
+
+    def _start(self):
+        context = multiprocessing.get_context("spawn")
+        self._connection, child_connection = context.Pipe()
+        self._process = context.Process(
+            target=_worker_main,
+            args=(self.tool, child_connection),
+            name=f"pylens-{self.tool}-worker",
+            daemon=True,
+        )
+        self._process.start()
+        child_connection.close()
+
+        limits = get_default_limits()
+        apply_limits(self._process.pid, limits)
+        if limits.idle_io:
+            set_idle_io(self._process.pid)
+
+    def analyze(self, request: AnalysisRequest) -> AnalysisResponse:
+        """Forwards the request to the worker process and waits for its answer."""
+        with self._lock:
+            assert self._connection is not None
+            timeout = get_default_limits().timeout
+            try:
+                self._connection.send(request.model_dump())
+                if not self._connection.poll(timeout):
+                    # The analysis runs in the worker itself, only killing it stops it
+                    self._kill()
+                    self._start()
+                    return AnalysisResponse(
+                        ok=False,
+                        error=f"The {self.tool} analysis timed out after {timeout:g}s.",
+                    )
+                return AnalysisResponse.model_validate(self._connection.recv())
+            except (EOFError, OSError):
+                # The worker died (e.g. killed by the OOM killer), start a fresh one
+                self.stop()
+                self._start()
+                return AnalysisResponse(
+                    ok=False, error=f"The {self.tool} worker crashed and was restarted."
+                )
+
+    def _kill(self):
+        assert self._connection is not None and self._process is not None
+        self._connection.close()
+        self._process.kill()
+        self._process.join()
+
+    def stop(self):
+        """Stops the worker process."""
+        if self._connection is not None:
+            self._connection.close()
+        if self._process is not None:
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.kill()
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """Handles a single client connection: one request, one response."""
+
+    server: "PylensServer"
+
+    def handle(self):
+        try:
+            request = AnalysisRequest.model_validate_json(receive_line(self.request))
+        except (ConnectionError, ValidationError) as error:
+            response = AnalysisResponse(ok=False, error=f"Invalid request: {error}")
+        else:
+            worker = self.server.workers.get(request.tool)
+            if worker is None:
+                response = AnalysisResponse(
+                    ok=False, error=f"Unsupported tool '{request.tool}'."
+                )
+            else:
+                response = worker.analyze(request)
+                if self.server.metrics is not None and response.ok and not response.cached:
+                    self.server.metrics.record(
+                        collect_metrics(
+                            request.tool,
+                            # Clients connect from anywhere, relative paths would collide
+                            os.path.normpath(os.path.join(request.cwd, request.path)),
+                            response.pylint_results or response.mypy_results,
+                            response.run_stats,
+                            response.overall_score,
+                        )
+                    )
+
+        try:
+            send_line(self.request, response.model_dump_json())
+        except OSError:
+            pass  # The client went away, nothing to do
+
+
+class PylensServer(socketserver.ThreadingUnixStreamServer):
+    """A Unix socket server dispatching requests to the warm tool workers."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, metrics: Optional[MetricsRegistry] = None):
+        self.workers = {tool: ToolWorker(tool) for tool in SUPPORTED_TOOLS}
+        self.metrics = metrics
+        super().__init__(socket_path, _RequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        for worker in self.workers.values():
+            worker.stop()
+
+
+def _remove_stale_socket(socket_path: str):
+    """
+    Removes a socket file left behind by a server that didn't shut down cleanly.
+
+    Raises:
+        RuntimeError: If another server is still listening on the socket.
+    """
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.unlink(socket_path)
+    else:
+        raise RuntimeError(f"A pylens server is already listening on {socket_path}")
+    finally:
+        probe.close()
+
+
+def serve(
+    socket_path: str = DEFAULT_SOCKET_PATH, metrics: Optional[MetricsRegistry] = None
+):
+    """
+    Starts the pylens server and blocks until interrupted.
+
+    Args:
+        socket_path (str): Path of the Unix socket to listen on.
+        metrics (Optional[MetricsRegistry]): Registry to export the metrics of every analysis to.
+    """
+    _remove_stale_socket(socket_path)
+    server = PylensServer(socket_path, metrics)
+    os.chmod(socket_path, 0o600)  # Only the owner may submit analyses
+    print(f"pylens server listening on {socket_path} (Ctrl+C to stop)")
+
+    # Shut down cleanly on `kill` too, so the socket file doesn't linger
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
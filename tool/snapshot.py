@@ -0,0 +1,478 @@
+"""
+tool/snapshot.py
+
+Saves the results of a run into a compact binary snapshot and loads them back,
+so results (e.g. of a nightly run) can be reopened without running the tools again.
+
+Layout of a snapshot file:
+- header: magic, format version and tool, uncompressed
+- body (zlib-compressed):
+  - section sizes: string table, metadata, number of locations, results and issues
+  - string table: every distinct string (file names, messages, ...) once, NUL-separated
+  - metadata: JSON of the small parts of the run (score, run stats, aggregates, ...)
+  - location records: (line, column) int32 pairs, every distinct Mypy location once
+  - result records: fixed-width int32 records, one per file
+  - issue records: fixed-width int32 records, strings and locations referenced by index
+"""
+
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from collections.abc import Sequence
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from pydantic import BaseModel
+from tool.pylint_runner import PylintIssue, PylintResult
+from tool.mypy_runner import CodeLocation, MypyIssue, MypyResult
+from tool.aggregation import IssueAggregates
+from tool.fast_construct import construct_all
+from tool.run_stats import RunStats
+
+SNAPSHOT_MAGIC = b"PLNS"
+SNAPSHOT_VERSION = 1
+TOOL_CODES = {"pylint": 0, "mypy": 1}
+
+HEADER = struct.Struct("<4sHB")
+SECTIONS = struct.Struct("<5I")
+
+RESULT_FIELDS = 3  # file, path, number of issues
+PYLINT_ISSUE_FIELDS = 5  # line, category, message, code, symbol
+# filename, start location, end location, category, message, code expression, error code
+MYPY_ISSUE_FIELDS = 7
+
+NO_STRING = -1
+
+
+class Snapshot(BaseModel):
+    """
+    The results of a run as stored in a snapshot.
+
+    - tool: The tool that produced the results ("pylint" or "mypy").
+    - path: The analyzed path, used to rerun the analysis.
+    - configuration: The configuration file of the run, if any.
+    - created_at: When the run finished (Unix time).
+    - pylint_results / overall_score: The Pylint results and score (Pylint only).
+    - mypy_results: The Mypy results (Mypy only).
+    - aggregates: The "top offenders" histograms of the results.
+    - run_stats: Statistics of the run.
+    """
+
+    tool: str
+    path: Optional[str] = None
+    configuration: Optional[str] = None
+    created_at: float = 0.0
+    pylint_results: List[PylintResult] = []
+    overall_score: Optional[float] = None
+    mypy_results: List[MypyResult] = []
+    aggregates: IssueAggregates
+    run_stats: RunStats
+
+
+def _to_bytes(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(data: bytes) -> array:
+    values = array("i")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _records(values: array, width: int):
+    """Iterates over the fixed-width records of a flat array."""
+    iterator = iter(values)
+    return zip(*[iterator] * width)
+
+
+def save_snapshot(file: str, snapshot: Snapshot):
+    """
+    Writes the snapshot to a file.
+
+    Args:
+        file (str): Path of the snapshot file.
+        snapshot (Snapshot): The run to save.
+    """
+    strings: Dict[str, int] = {}
+    locations: Dict[Tuple[int, int], int] = {}
+
+    def intern(value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    def intern_location(location: CodeLocation) -> int:
+        key = (location.line, location.column)
+        index = locations.get(key)
+        if index is None:
+            index = locations[key] = len(locations)
+        return index
+
+    results: List[Any] = (
+        snapshot.pylint_results if snapshot.tool == "pylint" else snapshot.mypy_results
+    )
+    result_records = array("i")
+    issue_records = array("i")
+    for result in results:
+        result_records.extend(
+            (
+                intern(result.file),
+                intern(getattr(result, "path", None)),
+                len(result.issues),
+            )
+        )
+        if snapshot.tool == "pylint":
+            for issue in result.issues:
+                issue_records.extend(
+                    (
+                        issue.line,
+                        intern(issue.category),
+                        intern(issue.message),
+                        intern(issue.code),
+                        intern(issue.symbol),
+                    )
+                )
+        else:
+            for issue in result.issues:
+                issue_records.extend(
+                    (
+                        intern(issue.filename),
+                        intern_location(issue.issue_location_start),
+                        intern_location(issue.issue_location_end),
+                        intern(issue.category),
+                        intern(issue.message),
+                        intern(issue.code_expression),
+                        intern(issue.error_code),
+                    )
+                )
+
+    if any("\0" in value for value in strings):
+        raise ValueError("Results containing NUL characters can't be saved in a snapshot.")
+    string_table = "\0".join(strings).encode("utf-8")
+    metadata = json.dumps(
+        {
+            "path": snapshot.path,
+            "configuration": snapshot.configuration,
+            "created_at": snapshot.created_at or time.time(),
+            "overall_score": snapshot.overall_score,
+            "aggregates": snapshot.aggregates.model_dump(),
+            "run_stats": snapshot.run_stats.model_dump(),
+            "message_counts": [result.message_counts for result in results],
+        }
+    ).encode("utf-8")
+
+    body = b"".join(
+        (
+            SECTIONS.pack(
+                len(string_table),
+                len(metadata),
+                len(locations),
+                len(results),
+                len(issue_records),
+            ),
+            string_table,
+            metadata,
+            _to_bytes(array("i", [value for key in locations for value in key])),
+            _to_bytes(result_records),
+            _to_bytes(issue_records),
+        )
+    )
+
+    # Write to a temporary file first, a crash mustn't leave a truncated snapshot
+    temporary = f"{file}.tmp"
+    with open(temporary, "wb") as snapshot_file:
+        snapshot_file.write(
+            HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, TOOL_CODES[snapshot.tool])
+        )
+        snapshot_file.write(zlib.compress(body, 6))
+    os.replace(temporary, file)
+
+
+def load_snapshot(file: str) -> Snapshot:
+    """
+    Reads a snapshot file.
+
+    Args:
+        file (str): Path of the snapshot file.
+
+    Returns:
+        Snapshot: The saved run.
+
+    Raises:
+        OSError: If the file can't be read.
+        ValueError: If the file isn't a snapshot of a supported version, or is corrupted.
+    """
+    with open(file, "rb") as snapshot_file:
+        data = snapshot_file.read()
+
+    if len(data) < HEADER.size:
+        raise ValueError(f"'{file}' is not a pylens snapshot.")
+    magic, version, tool_code = HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f"'{file}' is not a pylens snapshot.")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version} in '{file}'.")
+    tools = {code: name for name, code in TOOL_CODES.items()}
+    if tool_code not in tools:
+        raise ValueError(f"Unknown tool in snapshot '{file}'.")
+    tool = tools[tool_code]
+
+    try:
+        return _decode_body(tool, zlib.decompress(data[HEADER.size :]))
+    except (
+        zlib.error,
+        struct.error,
+        ValueError,
+        KeyError,
+        IndexError,
+        TypeError,
+    ) as error:
+        raise ValueError(f"Corrupted snapshot '{file}': {error}") from error
+
+
+def _decode_body(tool: str, body: bytes) -> Snapshot:
+    (
+        table_size,
+        metadata_size,
+        location_count,
+        result_count,
+        issue_count,
+    ) = SECTIONS.unpack_from(body)
+    offset = SECTIONS.size
+    # Index -1 (no string) maps to None
+    strings: List[Optional[str]] = [
+        *body[offset : offset + table_size].decode("utf-8").split("\0"),
+        None,
+    ]
+    offset += table_size
+    metadata = json.loads(body[offset : offset + metadata_size])
+    offset += metadata_size
+    location_records = _from_bytes(body[offset : offset + location_count * 8])
+    offset += location_count * 8
+    result_size = result_count * RESULT_FIELDS * 4
+    result_records = _from_bytes(body[offset : offset + result_size])
+    offset += result_size
+    issue_records = _from_bytes(body[offset : offset + issue_count * 4])
+    # The issues are only built when they are read, their records are checked now
+    _check_records(
+        tool,
+        result_records,
+        issue_records,
+        len(location_records) // 2,
+        len(strings),
+    )
+    if len(metadata["message_counts"]) != result_count:
+        raise ValueError("the message counts don't match the results")
+
+    results = [
+        _build_result(tool, fields, counts)
+        for fields, counts in zip(
+            _result_fields(
+                tool, result_records, issue_records, location_records, strings
+            ),
+            metadata["message_counts"],
+        )
+    ]
+
+    return Snapshot.model_construct(
+        tool=tool,
+        path=metadata["path"],
+        configuration=metadata["configuration"],
+        created_at=metadata["created_at"],
+        pylint_results=results if tool == "pylint" else [],
+        overall_score=metadata["overall_score"],
+        mypy_results=results if tool == "mypy" else [],
+        aggregates=IssueAggregates.model_validate(metadata["aggregates"]),
+        run_stats=RunStats.model_validate(metadata["run_stats"]),
+    )
+
+
+def _check_records(
+    tool: str,
+    result_records: array,
+    issue_records: array,
+    location_count: int,
+    string_count: int,
+):
+    """
+    Checks that the records are complete and only reference existing strings and locations.
+
+    Raises:
+        ValueError: If the records are truncated or reference something that doesn't exist.
+    """
+    width = PYLINT_ISSUE_FIELDS if tool == "pylint" else MYPY_ISSUE_FIELDS
+    # Index -1 (no string) is the last entry of the string table
+    string_fields = (1, 2, 3, 4) if tool == "pylint" else (0, 3, 4, 5, 6)
+    location_fields = () if tool == "pylint" else (1, 2)
+    if (
+        len(result_records) % RESULT_FIELDS
+        or len(issue_records) % width
+        or min(result_records[2::RESULT_FIELDS], default=0) < 0
+        or sum(result_records[2::RESULT_FIELDS]) * width != len(issue_records)
+    ):
+        raise ValueError("truncated records")
+
+    for field in (0, 1):
+        _check_indexes(result_records[field::RESULT_FIELDS], NO_STRING, string_count)
+    for field in string_fields:
+        _check_indexes(issue_records[field::width], NO_STRING, string_count)
+    for field in location_fields:
+        _check_indexes(issue_records[field::width], 0, location_count)
+
+
+def _check_indexes(indexes: array, lowest: int, count: int):
+    if indexes and not (lowest <= min(indexes) and max(indexes) < count):
+        raise ValueError("a record references a missing entry")
+
+
+class LazyIssues(Sequence):
+    """
+    The issues of one file of a loaded snapshot, built from its records the first
+    time they are read. Their number is known upfront, so the summaries and the
+    precomputed aggregates never build them: only the files whose details are
+    viewed (or rechecked) pay for their issues. The results' issues are typed as
+    sequences, and dumped as lists.
+
+    Args:
+        count (int): The number of issues.
+        build (Callable[[], List[Any]]): Builds the issues.
+    """
+
+    __slots__ = ("_count", "_build", "_issues")
+
+    def __init__(self, count: int, build: Callable[[], List[Any]]):
+        self._count = count
+        self._build: Optional[Callable[[], List[Any]]] = build
+        self._issues: Optional[List[Any]] = None
+
+    def _built(self) -> List[Any]:
+        if self._issues is None:
+            assert self._build is not None
+            self._issues = self._build()
+            self._build = None
+        return self._issues
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        return self._built()[index]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._built())
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return self._built() == list(other)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return repr(self._built())
+
+
+def _build_result(
+    tool: str, fields: Tuple[str, Optional[str], LazyIssues], counts: Dict[str, int]
+):
+    file, path, issues = fields
+    # Validating would build the issues, the fields come straight from the snapshot
+    if tool == "pylint":
+        return PylintResult.model_construct(
+            file=file, issues=issues, message_counts=counts, path=path
+        )
+    return MypyResult.model_construct(file=file, issues=issues, message_counts=counts)
+
+
+def _result_fields(
+    tool: str,
+    result_records: array,
+    issue_records: array,
+    location_records: array,
+    strings: List[Optional[str]],
+) -> Iterator[Tuple[str, Optional[str], LazyIssues]]:
+    width = PYLINT_ISSUE_FIELDS if tool == "pylint" else MYPY_ISSUE_FIELDS
+    offset = 0
+    for file, path, count in _records(result_records, RESULT_FIELDS):
+        records = issue_records[offset * width : (offset + count) * width]
+        build = (
+            partial(_pylint_issues, records, strings)
+            if tool == "pylint"
+            else partial(_mypy_issues, records, location_records, strings)
+        )
+        offset += count
+        yield strings[file], strings[path], LazyIssues(count, build)
+
+
+def _column(records: array, width: int, field: int, table: Optional[List[Any]] = None):
+    """Returns one field of fixed-width records, resolved through a table if given."""
+    column = records[field::width]
+    return column if table is None else list(map(table.__getitem__, column))
+
+
+def _pylint_issues(records: array, strings: List[Optional[str]]) -> List[PylintIssue]:
+    width = PYLINT_ISSUE_FIELDS
+    return construct_all(
+        PylintIssue,
+        (
+            {
+                "line": line,
+                "category": category,
+                "message": message,
+                "code": code,
+                "symbol": symbol,
+            }
+            for line, category, message, code, symbol in zip(
+                _column(records, width, 0),
+                _column(records, width, 1, strings),
+                _column(records, width, 2, strings),
+                _column(records, width, 3, strings),
+                _column(records, width, 4, strings),
+            )
+        ),
+    )
+
+
+def _mypy_issues(
+    records: array, location_records: array, strings: List[Optional[str]]
+) -> List[MypyIssue]:
+    def location(index: int) -> Dict[str, int]:
+        return {
+            "line": location_records[2 * index],
+            "column": location_records[2 * index + 1],
+        }
+
+    width = MYPY_ISSUE_FIELDS
+    return construct_all(
+        MypyIssue,
+        (
+            {
+                "filename": filename,
+                "issue_location_start": location(start),
+                "issue_location_end": location(end),
+                "category": category,
+                "message": message,
+                "code_expression": code_expression,
+                "error_code": error_code,
+            }
+            for filename, start, end, category, message, code_expression, error_code in zip(
+                _column(records, width, 0, strings),
+                _column(records, width, 1),
+                _column(records, width, 2),
+                _column(records, width, 3, strings),
+                _column(records, width, 4, strings),
+                _column(records, width, 5, strings),
+                _column(records, width, 6, strings),
+            )
+        ),
+    )